@@ -46,36 +46,47 @@ def starting_info(args):
         args["tableid"] = colored("deactivated", "red")
         args["dataset"] = colored("deactivated", "red")
         args["upload"] = 0
-        if args["parquet"]:
-            print(colored("Use parquet mode only together with the --upload flag"
-                          , "red", attrs=['bold']))
-            raise Exception("Set --upload flag")
-            
-        if args["multiprocessing"] or args["parquet"]:
-            print(colored("Make sure to set the upload flag when using parquet mode\n", "red", attrs=['bold']))
-            time.sleep(1)
-            raise Exception("Try to set --upload flag")
 
     else:
         args["targetpath"] = colored("deactivated", "red")
+        args["partition"] = None
+        args["format"] = None
+        args["compress"] = None
         
     # Custom changes
-    if args["parquet"]:
+    if args["parquet"] and args["upload"]:
         print(colored("Parquet format is activated - Files will be converted to parquet "\
                       "format before syncing to the Google cloud\n", "green", attrs=['bold']))
+    
+    elif args["parquet"]:
+        print(colored("Parquet format is activated - Files will be stored as partitioned "\
+                      "parquet dataset in the target path\n", "green", attrs=['bold']))
+        args["bucket"] = None
+        args["uploadthreshold"] = None
+        args["format"] = "parquet"
             
     else:
         args["bucket"] = None
         args["uploadthreshold"] = None
+        args["compression"] = None
+        args["rowgroupsize"] = None
+        args["partition"] = None
         if args["multiprocessing"]:
             print(colored("Multiprocessing was deactivated - only supported with parquet format"
                           , "red", attrs=['bold']))
             args["multiprocessing"] = 0
             
         
+    if args["utxo"] and args["multiprocessing"]:
+        print(colored("Multiprocessing was deactivated - the UTXO store requires parsing in height order"
+                      , "red", attrs=['bold']))
+        args["multiprocessing"] = 0
+
     print("{:<25}{:<13}".format("current wd:", __cwd__))
     non_bools = ["startfile","endfile","blklocation","format","targetpath","credentials",
-                 "project","tableid","dataset","bucket","uploadthreshold"]
+                 "project","tableid","dataset","bucket","uploadthreshold","addresscache",
+                 "flushedges","flushmb","compression","rowgroupsize","partition",
+                 "compress","compresslevel","compressbuffer"]
     
     # Manage bool arguments
     for k, v in zip(args.keys(), args.values()):
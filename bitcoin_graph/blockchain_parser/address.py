@@ -11,16 +11,72 @@
 #
 # This file was altered and the class `UnknownAddress` and `OPReturnaddress` were added.
 
+from collections import OrderedDict
 from bitcoin import base58
-from bitcoin.bech32 import CBech32Data
 from .utils import btc_ripemd160, double_sha256
-from .utils_taproot import from_taproot
-from binascii import b2a_hex
+from .utils_taproot import encode_segwit
+
+
+class AddressCache(object):
+    """Bounded LRU cache mapping (address type, hash or witness program)
+    to the encoded address. A size of 0 disables the cache."""
+
+    def __init__(self, maxsize=2**18):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, key):
+        """Returns the cached address of `key` or None"""
+        address = self._cache.get(key)
+        if address is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        return address
+
+    def put(self, key, address):
+        """Stores `address`, evicting the least recently used entry when full"""
+        if self.maxsize <= 0:
+            return
+        self._cache[key] = address
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def resize(self, maxsize):
+        """Changes the capacity, evicting the oldest entries if needed"""
+        self.maxsize = maxsize
+        while len(self._cache) > max(maxsize, 0):
+            self._cache.popitem(last=False)
+
+    @property
+    def hit_rate(self):
+        """Returns the share of lookups answered from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Returns a one-line summary of the cache statistics"""
+        return "Address cache: {:,} hits, {:,} misses ({:.1%} hit rate), " \
+               "{:,}/{:,} entries".format(self.hits, self.misses,
+                                         self.hit_rate, len(self._cache),
+                                         self.maxsize)
+
+
+# Cache shared by all addresses of this (worker) process
+ADDRESS_CACHE = AddressCache()
 
 
 
 # This object was newly created to manage unknown and invalid addresses
 class UnknownAddress(object):
+    __slots__ = ("_address",)
+
     def __init__(self, address):
         self._address = address
             
@@ -34,6 +90,8 @@ class UnknownAddress(object):
     
 # This object was newly created to manage OP_RETURN addresses
 class OPReturnAddress(object):
+    __slots__ = ("_address",)
+
     def __init__(self, address):
         self._address = address.lower()
             
@@ -48,6 +106,8 @@ class OPReturnAddress(object):
 class Address(object):
     """Represents a bitcoin address"""
 
+    __slots__ = ("_hash", "public_key", "_address", "type", "_segwit_version")
+
     def __init__(self, hash, public_key, address, type, segwit_version):
         self._hash = hash
         self.public_key = public_key
@@ -80,6 +140,20 @@ class Address(object):
         """Constructs an Address object from a bech32m script."""
         return cls(hash, None, None, "bech32m", segwit_version)
 
+    @classmethod
+    def from_template(cls, script_type, data):
+        """Constructs an Address object from the hash, public key or
+        witness program found in a standard script of type `script_type`"""
+        if script_type == "p2pk":
+            return cls.from_public_key(data)
+        if script_type == "p2pkh":
+            return cls.from_ripemd160(data)
+        if script_type == "p2sh":
+            return cls.from_ripemd160(data, type="p2sh")
+        if script_type == "p2tr":
+            return cls.from_bech32m(data, 1)
+        return cls.from_bech32(data, 0)
+
     @property
     def hash(self):
         """Returns the RIPEMD-160 hash corresponding to this address"""
@@ -95,17 +169,19 @@ class Address(object):
         otherwise using base58
         """
         if self._address is None:
-            if self.type == "bech32m":
-                tweaked_pubkey = b2a_hex(self.hash).decode("ascii")
-                self._address = from_taproot(tweaked_pubkey)
-            elif self.type != "bech32":
+            key = (self.type, self._segwit_version, self.hash)
+            self._address = ADDRESS_CACHE.get(key)
+            if self._address is not None:
+                return self._address
+
+            if self.type in ("bech32", "bech32m"):
+                self._address = encode_segwit(self._segwit_version, self._hash)
+            else:
                 version = b'\x00' if self.type == "normal" else b'\x05'
                 checksum = double_sha256(version + self.hash)
 
                 self._address = base58.encode(version + self.hash + checksum[:4])
-            else:
-                bech_encoded = CBech32Data.from_bytes(self._segwit_version, self._hash)
-                self._address = str(bech_encoded)
+            ADDRESS_CACHE.put(key, self._address)
 
         return self._address
 
@@ -9,52 +9,68 @@
 # modified, propagated, or distributed except according to the terms contained
 # in the LICENSE file.
 
+import struct
+
 from .transaction import Transaction
 from .block_header import BlockHeader
-from .utils import format_hash, decode_varint, double_sha256
+from .undo import read_block_undo
+from .utils import format_hash, decode_varint, read_varint, double_sha256, \
+    DecodeError
 
 
-def get_block_transactions(raw_hex):
-    """Given the raw hexadecimal representation of a block,
-    yields the block's transactions
+def iter_block_transactions(raw_hex):
+    """Given the raw representation of a block, yields every transaction
+    together with its offset and size inside the block.
+    Each transaction is decoded exactly once, malformed data raises
+    a DecodeError.
     """
-    # Skipping the header
-    transaction_data = raw_hex[80:]
+    buf = memoryview(raw_hex)
 
-    # Decoding the number of transactions, offset is the size of
-    # the varint (1 to 9 bytes)
-    n_transactions, offset = decode_varint(transaction_data)
+    # Skipping the header and decoding the number of transactions
+    try:
+        n_transactions, offset = read_varint(buf, 80)
+    except IndexError:
+        raise DecodeError("Block of %d bytes has no transaction count"
+                          % len(buf))
 
     for i in range(n_transactions):
-        # Try from 1024 (1KiB) -> 1073741824 (1GiB) slice widths
-        for j in range(0, 20):
-            try:
-                offset_e = offset + (1024 * 2 ** j)
-                transaction = Transaction.from_hex(
-                    transaction_data[offset:offset_e])
-                yield transaction
-                break
-            except:
-                continue
+        try:
+            transaction = Transaction(buf, offset)
+        except (IndexError, struct.error, DecodeError) as e:
+            raise DecodeError("Transaction %d/%d at offset %d of a %d bytes "
+                              "block could not be decoded (%s)"
+                              % (i, n_transactions, offset, len(buf), e))
+        yield transaction, offset, transaction.size
 
         # Skipping to the next transaction
         offset += transaction.size
 
 
+def get_block_transactions(raw_hex):
+    """Given the raw hexadecimal representation of a block,
+    yields the block's transactions
+    """
+    for transaction, _, _ in iter_block_transactions(raw_hex):
+        yield transaction
+
+
 class Block(object):
     """
     Represents a Bitcoin block, contains its header and its transactions.
     """
 
-    def __init__(self, raw_hex, height=None, blk_file=None):
+    __slots__ = ("hex", "_hash", "_transactions", "_header",
+                 "_n_transactions", "height", "blk_file", "undo")
+
+    def __init__(self, raw_hex, height=None, blk_file=None, undo=None):
         self.hex = raw_hex
         self._hash = None
         self._transactions = None
         self._header = None
         self._n_transactions = None
-        self.size = len(raw_hex)
         self.height = height
         self.blk_file = blk_file
+        self.undo = undo  # Raw undo data of the block from the rev file
 
     def __repr__(self):
         return "Block(%s)" % self.hash
@@ -64,6 +80,11 @@ class Block(object):
         """Builds a block object from its bytes representation"""
         return cls(raw_hex)
 
+    @property
+    def size(self):
+        """Returns the size of the block in bytes"""
+        return len(self.hex)
+
     @property
     def hash(self):
         """Returns the block's hash (double sha256 of its 80 bytes header"""
@@ -82,6 +103,22 @@ class Block(object):
 
         return self._n_transactions
 
+    @property
+    def spent_outputs(self):
+        """Returns the (height, is_coinbase, value, script) of the outputs
+        spent by every transaction but the coinbase or None if the undo
+        data of the block is unknown"""
+        if self.undo is None:
+            return None
+        return read_block_undo(self.undo)
+
+    def iter_transactions(self):
+        """Yields the block's transactions one by one without building
+        the `transactions` list"""
+        if self._transactions is not None:
+            return iter(self._transactions)
+        return get_block_transactions(self.hex)
+
     @property
     def transactions(self):
         """Returns a list of the block's transactions represented
@@ -21,6 +21,9 @@ from .utils import decode_uint32, format_hash
 class BlockHeader(object):
     """Represents a block header"""
 
+    __slots__ = ("hex", "_version", "_previous_block_hash", "_merkle_root",
+                 "_timestamp", "_bits", "_nonce", "_difficulty")
+
     def __init__(self, raw_hex):
         self._version = None
         self._previous_block_hash = None
@@ -12,19 +12,68 @@
 # This file was altered in many ways in comparison to the file which it was
 # forked from. Primarily most of the logic moved into the Parser file.
 # The ordered block method was completely abondoned to use the programm
-# without leveldb installed.
+# without leveldb installed. The LevelDB indexes of bitcoind can optionally
+# be read with the pure-Python reader in `leveldb.py`.
 
 import os
 import mmap
 import struct
 import stat
+import hashlib
+import numpy as np
+from contextlib import closing
 
 from .block import Block
+from .index import DBBlockIndex, DBTransactionIndex, BLOCK_HAVE_DATA
+from .leveldb import LevelDB
+from .undo import match_undo
+from .utils import read_varint, format_hash
 
 
 # Constant separating blocks in the .blk files
 BITCOIN_CONSTANT = b"\xf9\xbe\xb4\xd9"
 
+# One row per block of the sidecar index written for every .blk file,
+# hashes are kept in internal byte order
+BLOCK_INDEX_DTYPE = np.dtype([("hash", "V32"),
+                              ("prev_hash", "V32"),
+                              ("offset", "<u8"),
+                              ("size", "<u4"),
+                              ("timestamp", "<u4"),
+                              ("bits", "<u4"),
+                              ("n_tx", "<u4")])
+
+# Layout of the 80 bytes block header
+HEADER_DTYPE = np.dtype([("version", "<u4"),
+                         ("prev_hash", "V32"),
+                         ("merkle_root", "V32"),
+                         ("timestamp", "<u4"),
+                         ("bits", "<u4"),
+                         ("nonce", "<u4")])
+
+# One row per block found by the header-only scan
+HEADER_SCAN_DTYPE = np.dtype([("offset", "<u8"), ("size", "<u4")]
+                             + HEADER_DTYPE.descr)
+
+# One row per block of the main chain, `file` is the number of the .blk
+# file (blk00042.dat => 42) holding the block
+CHAIN_DTYPE = np.dtype([("height", "<u4"),
+                        ("file", "<u4"),
+                        ("offset", "<u8"),
+                        ("size", "<u4"),
+                        ("timestamp", "<u4"),
+                        ("hash", "V32")])
+
+_NULL_HASH = bytes(32)
+
+# Status flags of blocks marked as invalid in bitcoind's block index
+BLOCK_FAILED_MASK = 32 | 64
+
+# One row per transaction of the txid index written for every .blk file,
+# sorted by `prefix`, the first 8 bytes of the txid in internal byte order,
+# `offset` is the offset of the block containing the transaction
+TXID_INDEX_DTYPE = np.dtype([("prefix", "<u8"), ("offset", "<u8")])
+
 
 def get_files(path):
     """
@@ -39,40 +88,386 @@ def get_files(path):
     return sorted(files)
 
 
+def map_file(f):
+    """Memory maps the opened file `f` read-only"""
+    if os.name == 'nt':
+        size = os.path.getsize(f.name)
+        return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+    # Unix-only call, will not work on Windows, see python doc.
+    return mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ)
+
+
+# Obfuscation keys of the block directories, see `xor_key`
+_XOR_KEYS = {}
+
+# Number of bytes de-obfuscated at once
+XOR_CHUNK_SIZE = 1 << 24
+
+
+class DeobfuscatedFile(bytearray):
+    """In-memory content of an obfuscated file, mimics the closable mmap"""
+
+    def close(self):
+        pass
+
+
+def xor_key(directory):
+    """
+    Returns the 8 bytes key the .blk and rev files in `directory` are
+    obfuscated with (stored in xor.dat by bitcoind since v28) or None if
+    the files are not obfuscated
+    """
+    if directory not in _XOR_KEYS:
+        try:
+            with open(os.path.join(directory, "xor.dat"), "rb") as f:
+                key = f.read(8)
+        except OSError:
+            key = None
+        _XOR_KEYS[directory] = key if key and any(key) else None
+    return _XOR_KEYS[directory]
+
+
+def deobfuscate(raw_data, key, offset=0):
+    """
+    XORs the content of a file with its repeated 8 bytes `key`. The file is
+    processed in chunks of 64 bit words, so every chunk is a single NumPy
+    operation. If `raw_data` is a range of the file starting at `offset`,
+    the key is rotated accordingly. Returns a DeobfuscatedFile.
+    """
+    shift = offset % 8
+    key = key[shift:] + key[:shift]
+    length = len(raw_data)
+    out = DeobfuscatedFile(length)
+    src = np.frombuffer(raw_data, dtype=np.uint8, count=length)
+    dst = np.frombuffer(out, dtype=np.uint8)
+    words = length // 8 * 8
+    key_word = np.frombuffer(key, dtype="<u8")[0]
+    for start in range(0, words, XOR_CHUNK_SIZE):
+        end = min(start + XOR_CHUNK_SIZE, words)
+        np.bitwise_xor(src[start:end].view("<u8"), key_word,
+                       out=dst[start:end].view("<u8"))
+    for i in range(words, length):
+        out[i] = src[i] ^ key[i % 8]
+    return out
+
+
+class ObfuscatedFile(object):
+    """
+    Memory mapped obfuscated file, only the ranges taken by slicing are
+    de-obfuscated. Supports the subset of the mmap interface used to scan
+    .blk files (`len`, slices, `find` and `close`).
+    """
+
+    def __init__(self, raw_data, key):
+        self._raw_data = raw_data
+        self._key = key
+
+    def __len__(self):
+        return len(self._raw_data)
+
+    def __getitem__(self, item):
+        start, stop, _ = item.indices(len(self._raw_data))
+        stop = max(start, stop)
+        return deobfuscate(self._raw_data[start:stop], self._key, start)
+
+    def find(self, sub, start=0):
+        """Returns the lowest offset of `sub` from `start` on or -1"""
+        length = len(self._raw_data)
+        while start < length:
+            end = min(start + XOR_CHUNK_SIZE, length)
+            # Overlap the chunks, so matches across their borders are found
+            pos = self[start:end + len(sub) - 1].find(sub)
+            if pos >= 0:
+                return start + pos
+            start = end
+        return -1
+
+    def close(self):
+        self._raw_data.close()
+
+
+def open_blk_file(blockfile, ranges=False):
+    """
+    Memory maps the .blk (or rev) file `blockfile` read-only. Obfuscated
+    files are de-obfuscated into memory instead, or, if only some `ranges`
+    of the file are read, returned as ObfuscatedFile. The returned object
+    has to be closed like a mmap.
+    """
+    with open(blockfile, "rb") as f:
+        raw_data = map_file(f)
+    key = xor_key(os.path.dirname(os.path.abspath(blockfile)))
+    if key is None:
+        return raw_data
+    if ranges:
+        return ObfuscatedFile(raw_data, key)
+    data = deobfuscate(raw_data, key)
+    raw_data.close()
+    return data
+
+
+def close_blk_file(raw_data, view):
+    """
+    Releases the memoryview `view` (if any) of the opened .blk file
+    `raw_data` and closes it. If views of its blocks are still alive, the file is
+    released together with them.
+    """
+    if view is not None:
+        view.release()
+    try:
+        raw_data.close()
+    except BufferError:
+        pass
+
+
+def locate_blocks(raw_data):
+    """
+    Given the content of a .blk file, yields the (offset, size) pair of
+    every block contained in it, offset pointing behind the 8 bytes of
+    magic and size. Known blocks are skipped by their size and gaps are
+    crossed with `find`. Recent blk files are preallocated, so once no
+    further magic can be found the rest is the zero padded tail and the
+    scan stops.
+    """
+    length = len(raw_data)
+    offset = raw_data.find(BITCOIN_CONSTANT)
+    while 0 <= offset <= length - 8:
+        size = struct.unpack("<I", raw_data[offset+4:offset+8])[0]
+        start = offset + 8
+        if start + size > length:
+            # Truncated last block, e.g. the file is currently written to
+            break
+        yield start, size
+
+        offset = start + size
+        if raw_data[offset:offset+4] != BITCOIN_CONSTANT:
+            offset = raw_data.find(BITCOIN_CONSTANT, offset)
+
+
 def get_blocks(blockfile):
     """
     Given the name of a .blk file, for every block contained in the file,
-    yields its raw hexadecimal value
+    yields a zero-copy memoryview of its raw bytes
     """
-    with open(blockfile, "rb") as f:
-        if os.name == 'nt':
-            size = os.path.getsize(f.name)
-            raw_data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
-        else:
-            # Unix-only call, will not work on Windows, see python doc.
-            raw_data = mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ)
-        length = len(raw_data)
-        offset = 0
-        while offset < (length - 4):
-            if raw_data[offset:offset+4] == BITCOIN_CONSTANT:
-                offset += 4
-                size = struct.unpack("<I", raw_data[offset:offset+4])[0]
-                offset += 4 + size
-                yield raw_data[offset-size:offset]
-            else:
-                offset += 1
+    raw_data = open_blk_file(blockfile)
+    view = memoryview(raw_data)
+    for offset, size in locate_blocks(raw_data):
+        yield view[offset:offset+size]
+    close_blk_file(raw_data, view)
+
+
+def get_blocks_at(blockfile, index):
+    """
+    Given the name of a .blk file and rows of its block index,
+    yields a zero-copy memoryview of every indexed block. Blocks of
+    obfuscated files are de-obfuscated one at a time.
+    """
+    raw_data = open_blk_file(blockfile, ranges=True)
+    if isinstance(raw_data, ObfuscatedFile):
+        for offset, size in zip(index["offset"].tolist(), index["size"].tolist()):
+            yield memoryview(raw_data[offset:offset+size])
         raw_data.close()
-        
+        return
+    view = memoryview(raw_data)
+    for offset, size in zip(index["offset"].tolist(), index["size"].tolist()):
+        yield view[offset:offset+size]
+    close_blk_file(raw_data, view)
+
+
+def read_headers(blockfile):
+    """
+    Header-only scan of a .blk file: reads just the 80 bytes header of
+    every block and returns them decoded as NumPy structured array
+    together with the offset and size of the blocks, see HEADER_SCAN_DTYPE
+    """
+    raw_data = open_blk_file(blockfile, ranges=True)
+    locations = list(locate_blocks(raw_data))
+    raw_headers = [raw_data[offset:offset+80] for offset, _ in locations]
+    raw_data.close()
+    return decode_headers(locations, raw_headers)
+
+
+def decode_headers(locations, raw_headers):
+    """
+    Returns the header scan (see HEADER_SCAN_DTYPE) of the blocks at the
+    (offset, size) `locations` with the 80 bytes `raw_headers`
+    """
+    headers = np.frombuffer(b"".join(raw_headers), dtype=HEADER_DTYPE)
+    scan = np.empty(len(headers), dtype=HEADER_SCAN_DTYPE)
+    scan["offset"] = [offset for offset, _ in locations]
+    scan["size"] = [size for _, size in locations]
+    for field in HEADER_DTYPE.names:
+        scan[field] = headers[field]
+    return scan
+
+
+def select_window(blocks, start_ts=None, end_ts=None):
+    """
+    Returns the rows of `blocks` (a header scan or a block index) whose
+    timestamp lies within [start_ts, end_ts]. Block timestamps are not
+    monotonic, hence the rows are filtered and not bisected.
+    """
+    mask = np.ones(len(blocks), dtype=bool)
+    if start_ts is not None:
+        mask &= blocks["timestamp"] >= start_ts
+    if end_ts is not None:
+        mask &= blocks["timestamp"] <= end_ts
+    return blocks[mask]
+
+
+def index_blocks(blockfile):
+    """
+    Scans a .blk file and returns its block index, see BLOCK_INDEX_DTYPE
+    """
+    raw_data = open_blk_file(blockfile, ranges=True)
+    locations = list(locate_blocks(raw_data))
+    # The header and the transaction count (a varint of up to 9 bytes)
+    # of every block are read at once
+    heads = [raw_data[offset:offset+min(size, 89)] for offset, size in locations]
+    raw_data.close()
+
+    scan = decode_headers(locations, [head[:80] for head in heads])
+    index = np.empty(len(scan), dtype=BLOCK_INDEX_DTYPE)
+    for field in ("prev_hash", "offset", "size", "timestamp", "bits"):
+        index[field] = scan[field]
+
+    sha256 = hashlib.sha256
+    for i, (head, (_, size)) in enumerate(zip(heads, locations)):
+        index[i]["hash"] = sha256(sha256(head[:80]).digest()).digest()
+        index[i]["n_tx"] = read_varint(head, 80)[0] if size > 80 else 0
+    return index
+
+
+def txid_prefix(txid):
+    """Returns the txid index prefix of the hex encoded `txid`"""
+    return int.from_bytes(bytes.fromhex(txid)[:-9:-1], "little")
+
+
+def bits_to_work(bits):
+    """
+    Returns the expected number of hashes needed to find a block with the
+    compact difficulty target `bits`, i.e. 2**256 / (target + 1)
+    """
+    exponent, mantissa = bits >> 24, bits & 0x007fffff
+    if exponent <= 3:
+        target = mantissa >> (8 * (3 - exponent))
+    else:
+        target = mantissa << (8 * (exponent - 3))
+    return (1 << 256) // (target + 1)
+
+
+def build_chain(indexes):
+    """
+    Reconstructs the main chain from the block indexes of the .blk files,
+    given as dictionary mapping the files to their index. Blocks are linked
+    by their previous hash and the chain is the one ending in the tip with
+    the most accumulated work. Stale blocks and blocks not connected to the
+    genesis block are dropped. Returns the main chain ordered by height,
+    see CHAIN_DTYPE.
+    """
+    files = [int(os.path.basename(f)[3:8]) for f in indexes]
+    blocks = [index for index in indexes.values()]
+    if not blocks or sum(len(index) for index in blocks) == 0:
+        return np.empty(0, dtype=CHAIN_DTYPE)
+    file_nr = np.concatenate([np.full(len(index), nr, dtype="<u4")
+                              for nr, index in zip(files, blocks)])
+    blocks = np.concatenate(blocks)
+
+    hashes = [h.tobytes() for h in blocks["hash"]]
+    prev_hashes = [h.tobytes() for h in blocks["prev_hash"]]
+    position = {h: i for i, h in enumerate(hashes)}
+    parent = [position.get(h, -1) for h in prev_hashes]
+    work = {bits: bits_to_work(bits) for bits in set(blocks["bits"].tolist())}
+    bits = blocks["bits"].tolist()
+
+    # Height and accumulated work of every block, -1 if not computed yet
+    # and None if the block is not connected to the genesis block
+    height, chainwork = [-1] * len(hashes), [None] * len(hashes)
+    for i in range(len(hashes)):
+        path, j = [], i
+        while j != -1 and height[j] == -1:
+            path.append(j)
+            j = parent[j]
+        if j == -1:
+            # Reached a root, only the genesis block has no previous block
+            root = path.pop()
+            if prev_hashes[root] == _NULL_HASH:
+                height[root], chainwork[root] = 0, work[bits[root]]
+            else:
+                height[root] = None
+            j = root
+        for k in reversed(path):
+            if height[j] is None:
+                height[k] = None
+            else:
+                height[k] = height[j] + 1
+                chainwork[k] = chainwork[j] + work[bits[k]]
+            j = k
+
+    connected = [i for i in range(len(hashes)) if height[i] is not None]
+    if not connected:
+        return np.empty(0, dtype=CHAIN_DTYPE)
+    # First seen block with the most work wins ties, like bitcoind does
+    tip = max(connected, key=lambda i: chainwork[i])
+
+    main = []
+    while tip != -1:
+        main.append(tip)
+        tip = parent[tip]
+    main = np.array(main[::-1], dtype=np.int64)
+
+    chain = np.empty(len(main), dtype=CHAIN_DTYPE)
+    chain["height"] = np.arange(len(main))
+    chain["file"] = file_nr[main]
+    for field in ("offset", "size", "timestamp", "hash"):
+        chain[field] = blocks[field][main]
+    return chain
+
+
+# Number of .blk files kept open while iterating over the main chain
+CHAIN_OPEN_FILES = 2
+
+
+def get_chain_blocks(path, chain):
+    """
+    Given the directory of the .blk files and rows of the main chain,
+    yields a zero-copy memoryview of every block in the order of the rows.
+    Blocks of the chain are spread over neighbouring files, only the
+    CHAIN_OPEN_FILES most recently used files are kept open. Blocks of
+    obfuscated files are de-obfuscated one at a time.
+    """
+    files = {}      # (raw data, view) of the open files, least recently used first
+    for nr, offset, size in zip(chain["file"].tolist(),
+                                chain["offset"].tolist(),
+                                chain["size"].tolist()):
+        if nr in files:
+            files[nr] = files.pop(nr)
+        else:
+            if len(files) >= CHAIN_OPEN_FILES:
+                close_blk_file(*files.pop(next(iter(files))))
+            raw_data = open_blk_file(os.path.join(path, "blk%05d.dat" % nr), ranges=True)
+            view = None if isinstance(raw_data, ObfuscatedFile) else memoryview(raw_data)
+            files[nr] = raw_data, view
+        raw_data, view = files[nr]
+        if view is None:
+            yield memoryview(raw_data[offset:offset+size])
+        else:
+            yield view[offset:offset+size]
+    for raw_data, view in files.values():
+        close_blk_file(raw_data, view)
+
 
 class Blockchain(object):
     """Represents the blockchain contained in the series of .blk files
     maintained by bitcoind.
     """
 
-    def __init__(self, path):
+    def __init__(self, path, index_path=None):
         self.path = path
         self.blockIndexes = None
-        self.indexPath = None
+        self.chain = None
+        self.txIndex = None
+        # Directory of the sidecar block index files
+        self.indexPath = index_path or os.path.join(path, "..", ".blkindex")
 
     def get_blk_files(self, sF, eF):
         blk_files = get_files(self.path)
@@ -81,9 +476,215 @@ class Blockchain(object):
             blk_files = blk_files[:blk_files.index(self.path + "/" + eF)+1]
         return blk_files
         
-    def get_unordered_blocks(self, blk_file):
+    def _index_file(self, blk_file):
+        return os.path.join(self.indexPath,
+                            os.path.basename(blk_file) + ".idx.npz")
+
+    def load_index(self, blk_file):
+        """Returns the block index of `blk_file` or None if it was not
+        built yet or the file changed (size or mtime) since then.
+        """
+        try:
+            with np.load(self._index_file(blk_file)) as index:
+                blocks, file_stat = index["blocks"], index["stat"]
+        except (OSError, KeyError, ValueError):
+            return None
+        if blocks.dtype != BLOCK_INDEX_DTYPE:
+            # Written by an older version
+            return None
+        st = os.stat(blk_file)
+        if file_stat.tolist() != [st.st_size, st.st_mtime_ns]:
+            return None
+        return blocks
+
+    def get_index(self, blk_file):
+        """Returns the block index of `blk_file`, (re)building and storing
+        it if it is missing or outdated.
+        """
+        blocks = self.load_index(blk_file)
+        if blocks is not None:
+            return blocks
+
+        st = os.stat(blk_file)
+        blocks = index_blocks(blk_file)
+        if not os.path.isdir(self.indexPath):
+            os.makedirs(self.indexPath, exist_ok=True)
+        index_file = self._index_file(blk_file)
+        # Write to a temporary file first, so readers never see partial indexes
+        with open(index_file + ".tmp", "wb") as f:
+            np.savez(f, blocks=blocks,
+                     stat=np.array([st.st_size, st.st_mtime_ns], dtype=np.int64))
+        os.replace(index_file + ".tmp", index_file)
+        return blocks
+
+    def build_index(self, blk_files=None):
+        """Builds the sidecar block index of every .blk file (or of the
+        given `blk_files`). Only new or changed files are scanned.
+        Returns a dictionary mapping the files to their index.
+        """
+        if blk_files is None:
+            blk_files = get_files(self.path)
+        return {blk_file: self.get_index(blk_file) for blk_file in blk_files}
+
+    def get_chain(self):
+        """Returns the main chain ordered by height (see `build_chain`),
+        built from the sidecar block indexes of all .blk files.
+        """
+        if self.chain is None:
+            self.chain = build_chain(self.build_index())
+        return self.chain
+
+    def get_db_block_index(self, db_path=None):
+        """Returns the DBBlockIndex of every block stored in the LevelDB
+        block index of bitcoind (`blocks/index` by default)
+        """
+        db = LevelDB(db_path or os.path.join(self.path, "index"))
+        return [DBBlockIndex(format_hash(key[1:]), value)
+                for key, value in db.iterate(b"b")]
+
+    def get_db_chain(self, db_path=None):
+        """Same as `get_chain` but reads the blocks from the LevelDB
+        block index of bitcoind instead of scanning the .blk files
+        """
+        db = LevelDB(db_path or os.path.join(self.path, "index"))
+        rows = {}
+        for key, value in db.iterate(b"b"):
+            block = DBBlockIndex(format_hash(key[1:]), value)
+            if not block.status & BLOCK_HAVE_DATA or block.status & BLOCK_FAILED_MASK:
+                continue
+            header = value[-80:]
+            rows.setdefault(block.file, []).append(
+                (key[1:], header[4:36], block.data_pos, 0,
+                 struct.unpack_from("<I", header, 68)[0],
+                 struct.unpack_from("<I", header, 72)[0], block.n_tx))
+
+        indexes = {}
+        for nr, blocks in rows.items():
+            index = np.array(blocks, dtype=BLOCK_INDEX_DTYPE)
+            blk_file = os.path.join(self.path, "blk%05d.dat" % nr)
+            # The size of a block is stored right in front of it
+            raw_data = open_blk_file(blk_file, ranges=True)
+            index["size"] = [struct.unpack("<I", raw_data[offset-4:offset])[0]
+                             for offset in index["offset"].tolist()]
+            raw_data.close()
+            indexes[blk_file] = index
+        return build_chain(indexes)
+
+    def get_db_transaction(self, txid, db_path=None):
+        """Returns the DBTransactionIndex of `txid` from the LevelDB
+        transaction index of bitcoind (requires -txindex) or None if the
+        transaction is not indexed. By default `indexes/txindex` is used,
+        falling back to `blocks/index` of older versions.
+        """
+        if self.txIndex is None:
+            db_path = db_path or os.path.join(self.path, "..", "indexes", "txindex")
+            if not os.path.isdir(db_path):
+                db_path = os.path.join(self.path, "index")
+            self.txIndex = LevelDB(db_path)
+        value = self.txIndex.get(b"t" + bytes.fromhex(txid)[::-1])
+        if value is None:
+            return None
+        return DBTransactionIndex(txid, value)
+
+    def get_ordered_blocks(self, chain=None):
+        """Yields the blocks of the main chain (or of the given rows of
+        it) ordered by height. Stale blocks are not included.
+        """
+        if chain is None:
+            chain = self.get_chain()
+        raw_blocks = get_chain_blocks(self.path, chain)
+        for raw_block, height, nr in zip(raw_blocks, chain["height"].tolist(),
+                                         chain["file"].tolist()):
+            yield Block(raw_block, height, "blk%05d.dat" % nr)
+
+    def _txid_file(self, blk_file):
+        return os.path.join(self.indexPath,
+                            os.path.basename(blk_file) + ".txids.npy")
+
+    def load_txid_index(self, blk_file):
+        """Returns the memory mapped txid index of `blk_file` or None if it
+        was not built yet or the file was modified after building it.
+        """
+        txid_file = self._txid_file(blk_file)
+        try:
+            if os.stat(txid_file).st_mtime_ns < os.stat(blk_file).st_mtime_ns:
+                return None
+            return np.load(txid_file, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def save_txid_index(self, blk_file, prefixes, offsets):
+        """Stores the txid index of `blk_file`, given the txid prefixes of
+        all its transactions and the offsets of their blocks
+        """
+        txids = np.empty(len(prefixes), dtype=TXID_INDEX_DTYPE)
+        txids["prefix"] = prefixes
+        txids["offset"] = offsets
+        txids.sort(order=["prefix", "offset"])
+        if not os.path.isdir(self.indexPath):
+            os.makedirs(self.indexPath, exist_ok=True)
+        txid_file = self._txid_file(blk_file)
+        with open(txid_file + ".tmp", "wb") as f:
+            np.save(f, txids)
+        os.replace(txid_file + ".tmp", txid_file)
+
+    def find_transaction(self, txid, blk_files=None):
+        """Looks up `txid` in the txid indexes of the given .blk files (all
+        by default) and returns the first .blk file and the offset of the
+        first block that may contain it, or None. Files without txid index
+        are skipped. As only prefixes are stored, the block can contain
+        another transaction with the same prefix.
+        """
+        prefix = txid_prefix(txid)
+        if blk_files is None:
+            blk_files = get_files(self.path)
+        for blk_file in blk_files:
+            txids = self.load_txid_index(blk_file)
+            if txids is None:
+                continue
+            prefixes = txids["prefix"]
+            i = np.searchsorted(prefixes, prefix)
+            if i < len(prefixes) and prefixes[i] == prefix:
+                return blk_file, int(txids["offset"][i])
+        return None
+
+    def get_block_undo(self, blk_file):
+        """Returns the undo data of the blocks of `blk_file` stored in the
+        rev file of the same number, as dictionary mapping the offsets of
+        the blocks to their undo data (see `undo.match_undo`)
+        """
+        rev_file = os.path.join(os.path.dirname(blk_file),
+                                "rev" + os.path.basename(blk_file)[3:])
+        if not os.path.isfile(rev_file):
+            return {}
+        with closing(open_blk_file(rev_file)) as raw_data:
+            return match_undo(raw_data, self.get_index(blk_file))
+
+    def get_undo(self, index, blk_file=None):
+        """Returns the undo data of the blocks given as rows of the block
+        index of `blk_file` or of the main chain, in the order of the rows.
+        Blocks without undo data get None.
+        """
+        if "file" in index.dtype.names:
+            blk_files = ["blk%05d.dat" % nr for nr in index["file"].tolist()]
+        else:
+            blk_files = [os.path.basename(blk_file)] * len(index)
+        undo, result = {}, []
+        for name, offset in zip(blk_files, index["offset"].tolist()):
+            if name not in undo:
+                undo[name] = self.get_block_undo(os.path.join(self.path, name))
+            result.append(undo[name].get(offset))
+        return result
+
+    def get_unordered_blocks(self, blk_file, index=None):
         """Yields the blocks contained in a .blk file as is,
         without ordering them according to height.
+        If rows of the block `index` are given, only these blocks are
+        read by seeking to their offsets.
         """
-        for raw_block in get_blocks(blk_file):
+        if index is None:
+            raw_blocks = get_blocks(blk_file)
+        else:
+            raw_blocks = get_blocks_at(blk_file, index)
+        for raw_block in raw_blocks:
             yield Block(raw_block)
@@ -0,0 +1,200 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Columnar decoder that reads the blocks of a .blk file straight into NumPy
+# structured arrays, without creating Transaction, Input, Output or Script
+# objects for standard scripts.
+
+import hashlib
+import numpy as np
+
+from .blockchain import get_blocks, get_blocks_at
+from .output import Output
+from .address import Address
+from .script import classify_script, TEMPLATE_PROGRAMS
+from .undo import read_block_undo, spent_address
+from .utils import read_varint, UINT32, UINT64
+
+
+# Script types, the `script_type` columns store the index into this tuple
+SCRIPT_TYPES = ("p2pkh", "p2pk", "p2sh", "p2ms", "OP_RETURN", "p2wpkh",
+                "p2wsh", "p2tr", "invalid", "unknown")
+SCRIPT_TYPE_CODES = {t: i for i, t in enumerate(SCRIPT_TYPES)}
+
+# One row per transaction
+TX_DTYPE = np.dtype([("block", "<u4"),       # Number of the decoded block
+                     ("ts", "<u4"),          # Timestamp of the block
+                     ("txid", "V32"),        # Txid in internal byte order
+                     ("n_inputs", "<u4"),
+                     ("n_outputs", "<u4")])
+
+# One row per input, `tx` is the row of the transaction in the tx table
+INPUT_DTYPE = np.dtype([("tx", "<u4"),
+                        ("prev_txid", "V32"),
+                        ("vout", "<u4")])
+
+# One row per output. `program` holds the hash160 (p2pkh, p2sh, p2wpkh,
+# p2pk and p2ms, left aligned) or the 32 bytes witness program (p2wsh, p2tr)
+OUTPUT_DTYPE = np.dtype([("tx", "<u4"),
+                         ("index", "<u4"),
+                         ("value", "<u8"),
+                         ("script_type", "u1"),
+                         ("program", "V32")])
+
+_NO_PROGRAM = bytes(32)
+
+
+def _classify(script):
+    """Returns the script type, program and address of a standard output
+    script or None if the script needs the object layer"""
+    script_type = classify_script(script)
+    if script_type in TEMPLATE_PROGRAMS:
+        start, end = TEMPLATE_PROGRAMS[script_type]
+        data = bytes(script[start:end])
+        address = Address.from_template(script_type, data)
+        return script_type, address.hash, address.address
+    if script_type == "invalid":
+        return script_type, _NO_PROGRAM, "invalid"
+    if script_type == "OP_RETURN":
+        return script_type, _NO_PROGRAM, "op_return"
+    return None
+
+
+def decode_blocks(raw_blocks, undo=None):
+    """Decodes the given raw blocks into columns and returns a dictionary
+    holding the `txs`, `inputs` and `outputs` structured arrays together
+    with the `txids` (hex) and `addresses` of the outputs as object arrays.
+    Outputs without any address (e.g. 0-of-n multisigs) have None as address.
+    If the undo data of the blocks is given (aligned with `raw_blocks`), the
+    address and value of the output spent by every input are added as
+    `input_addresses` and `input_values`, None if unknown.
+    """
+    txs, inputs, outputs, addresses = [], [], [], []
+    input_addresses, input_values = [], []
+    sha256 = hashlib.sha256
+    for block, raw_block in enumerate(raw_blocks):
+        buf = memoryview(raw_block)
+        ts = UINT32.unpack_from(buf, 68)[0]
+        spent = None
+        if undo is not None and undo[block] is not None:
+            spent = read_block_undo(undo[block])
+        n_transactions, pos = read_varint(buf, 80)
+        for tx_nr in range(n_transactions):
+            tx = len(txs)
+            start = pos
+            pos += 4
+            is_segwit = buf[pos] == 0 and buf[pos+1] == 1
+            if is_segwit:
+                pos += 2
+
+            n_inputs, pos = read_varint(buf, pos)
+            for input_nr in range(n_inputs):
+                inputs.append((tx, buf[pos:pos+32].tobytes(),
+                               UINT32.unpack_from(buf, pos+32)[0]))
+                if undo is not None:
+                    if spent is None or tx_nr == 0:
+                        input_addresses.append(None)
+                        input_values.append(None)
+                    else:
+                        _, _, value, script = spent[tx_nr-1][input_nr]
+                        input_addresses.append(spent_address(value, script))
+                        input_values.append(value)
+                script_length, pos = read_varint(buf, pos+36)
+                pos += script_length + 4
+
+            n_outputs, pos = read_varint(buf, pos)
+            for index in range(n_outputs):
+                value = UINT64.unpack_from(buf, pos)[0]
+                script_length, script_start = read_varint(buf, pos+8)
+                end = script_start + script_length
+                match = _classify(buf[script_start:end])
+                if match is None:
+                    # Non standard script, use the object layer
+                    output = Output(buf, pos)
+                    if output.addresses:
+                        address = output.addresses[0]
+                        program = getattr(address, "hash", None)
+                        if not isinstance(program, bytes):
+                            program = _NO_PROGRAM
+                        match = output.type, program, address.address
+                    else:
+                        match = output.type, _NO_PROGRAM, None
+                script_type, program, address = match
+                outputs.append((tx, index, value,
+                                SCRIPT_TYPE_CODES[script_type], program))
+                addresses.append(address)
+                pos = end
+
+            if is_segwit:
+                legacy_end = pos
+                for _ in range(n_inputs):
+                    n_witnesses, pos = read_varint(buf, pos)
+                    for _ in range(n_witnesses):
+                        component_length, pos = read_varint(buf, pos)
+                        pos += component_length
+                h = sha256(buf[start:start+4])
+                h.update(buf[start+6:legacy_end])
+                h.update(buf[pos:pos+4])
+            else:
+                h = sha256(buf[start:pos+4])
+            pos += 4
+            txs.append((block, ts, sha256(h.digest()).digest(), n_inputs,
+                        n_outputs))
+
+    txs = np.array(txs, dtype=TX_DTYPE)
+    columns = {
+        "txs": txs,
+        "inputs": np.array(inputs, dtype=INPUT_DTYPE),
+        "outputs": np.array(outputs, dtype=OUTPUT_DTYPE),
+        "txids": np.array([t.tobytes()[::-1].hex() for t in txs["txid"]],
+                          dtype=object),
+        "addresses": np.array(addresses, dtype=object),
+    }
+    if undo is not None:
+        columns["input_addresses"] = np.array(input_addresses, dtype=object)
+        columns["input_values"] = np.array(input_values, dtype=object)
+    return columns
+
+
+def decode_blk_file(blk_file, index=None):
+    """Decodes all blocks of a .blk file into columns, see `decode_blocks`.
+    If rows of the block `index` are given, only these blocks are read.
+    """
+    if index is None:
+        raw_blocks = get_blocks(blk_file)
+    else:
+        raw_blocks = get_blocks_at(blk_file, index)
+    return decode_blocks(raw_blocks)
+
+
+def select_txs(columns, start=0, stop=None):
+    """Returns the columns restricted to the transactions start:stop"""
+    txs = columns["txs"]
+    stop = len(txs) if stop is None else stop
+    inputs, outputs = columns["inputs"], columns["outputs"]
+    # Inputs and outputs are stored in the order of their transactions
+    in_start, in_stop = np.searchsorted(inputs["tx"], [start, stop]).tolist()
+    out_start, out_stop = np.searchsorted(outputs["tx"], [start, stop]).tolist()
+    inputs = inputs[in_start:in_stop].copy()
+    outputs = outputs[out_start:out_stop].copy()
+    inputs["tx"] -= start
+    outputs["tx"] -= start
+    selected = {
+        "txs": txs[start:stop],
+        "inputs": inputs,
+        "outputs": outputs,
+        "txids": columns["txids"][start:stop],
+        "addresses": columns["addresses"][out_start:out_stop],
+    }
+    for key in ("input_addresses", "input_values"):
+        if key in columns:
+            selected[key] = columns[key][in_start:in_stop]
+    return selected
@@ -9,27 +9,35 @@
 # modified, propagated, or distributed except according to the terms contained
 # in the LICENSE file.
 
-from .utils import decode_varint, decode_uint32, format_hash
+from .utils import read_varint, format_hash, UINT32
 from .script import Script
 
 
 class Input(object):
-    """Represents a transaction input"""
+    """Represents a transaction input.
+    Only the (buffer, start, end) span of the input is stored,
+    all fields are decoded lazily from the shared buffer.
+    """
 
-    def __init__(self, raw_hex):
+    __slots__ = ("_buf", "_start", "_script_start", "_end",
+                 "_transaction_hash", "_transaction_index", "_script",
+                 "_sequence_number", "_witnesses")
+
+    def __init__(self, raw_hex, offset=0):
         self._transaction_hash = None
         self._transaction_index = None
         self._script = None
         self._sequence_number = None
-        self._witnesses = []
-
-        self._script_length, varint_length = decode_varint(raw_hex[36:])
-        self._script_start = 36 + varint_length
+        self._witnesses = None
 
-        self.size = self._script_start + self._script_length + 4
-        self.hex = raw_hex[:self.size]
+        self._buf = raw_hex
+        self._start = offset
+        script_length, self._script_start = read_varint(raw_hex, offset + 36)
+        self._end = self._script_start + script_length + 4
 
     def add_witness(self, witness):
+        if self._witnesses is None:
+            self._witnesses = []
         self._witnesses.append(witness)
 
     @classmethod
@@ -39,12 +47,24 @@ class Input(object):
     def __repr__(self):
         return "Input(%s,%d)" % (self.transaction_hash, self.transaction_index)
 
+    @property
+    def hex(self):
+        """Returns the raw bytes of this input (a view into the buffer)"""
+        return self._buf[self._start:self._end]
+
+    @property
+    def size(self):
+        """Returns the size of the input in bytes"""
+        return self._end - self._start
+
     @property
     def transaction_hash(self):
         """Returns the hash of the transaction containing the output
         redeemed by this input"""
         if self._transaction_hash is None:
-            self._transaction_hash = format_hash(self.hex[:32])
+            self._transaction_hash = format_hash(
+                self._buf[self._start:self._start + 32]
+            )
         return self._transaction_hash
 
     @property
@@ -52,27 +72,29 @@ class Input(object):
         """Returns the index of the output inside the transaction that is
         redeemed by this input"""
         if self._transaction_index is None:
-            self._transaction_index = decode_uint32(self.hex[32:36])
+            self._transaction_index = UINT32.unpack_from(self._buf,
+                                                         self._start + 32)[0]
         return self._transaction_index
 
     @property
     def sequence_number(self):
         """Returns the input's sequence number"""
         if self._sequence_number is None:
-            self._sequence_number = decode_uint32(
-                self.hex[self.size-4:self.size]
-            )
+            self._sequence_number = UINT32.unpack_from(self._buf,
+                                                       self._end - 4)[0]
         return self._sequence_number
 
     @property
     def script(self):
         """Returns a Script object representing the redeem script"""
         if self._script is None:
-            end = self._script_start + self._script_length
-            self._script = Script.from_hex(self.hex[self._script_start:end])
+            self._script = Script.from_hex(
+                bytes(self._buf[self._script_start:self._end - 4])
+            )
         return self._script
 
     @property
     def witnesses(self):
-        """Return a list of witness data attached to this input, empty if non segwit"""
-        return self._witnesses
+        """Return a list of witness data attached to this input, empty if non segwit
+        or if the transaction was decoded without its witnesses"""
+        return self._witnesses or []
@@ -0,0 +1,368 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Dependency free, read-only reader for the LevelDB databases maintained by
+# bitcoind (blocks/index and indexes/txindex). It reads the MANIFEST to find
+# the live tables, the .ldb/.sst tables (including snappy compressed blocks)
+# and the .log file holding the most recent writes.
+
+import os
+import mmap
+import heapq
+import struct
+from bisect import bisect_left
+
+
+class LevelDBError(Exception):
+    """Raised if a LevelDB file is malformed or unsupported"""
+
+
+# Value types of internal keys
+TYPE_DELETION = 0
+TYPE_VALUE = 1
+
+# Log files are split into blocks of 32KiB, each record has a 7 bytes header
+LOG_BLOCK_SIZE = 32768
+LOG_FULL, LOG_FIRST, LOG_MIDDLE, LOG_LAST = 1, 2, 3, 4
+
+# Magic number at the end of every table
+TABLE_MAGIC = 0xdb4775248b80fb57
+
+# Compression types of table blocks
+NO_COMPRESSION = 0
+SNAPPY_COMPRESSION = 1
+
+# Tags of the version edits stored in the MANIFEST
+TAG_LOG_NUMBER = 2
+TAG_NEXT_FILE_NUMBER = 3
+TAG_LAST_SEQUENCE = 4
+TAG_COMPACT_POINTER = 5
+TAG_DELETED_FILE = 6
+TAG_NEW_FILE = 7
+TAG_PREV_LOG_NUMBER = 9
+TAG_COMPARATOR = 1
+
+# Key under which bitcoind stores the key values of a database are XORed with
+OBFUSCATE_KEY = b"\x0e\x00obfuscate_key"
+
+
+def read_uvarint(buf, offset):
+    """Reads a LevelDB (protobuf style) varint from `buf` at `offset`
+    and returns the value and the offset behind it"""
+    value = shift = 0
+    while True:
+        byte = buf[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def read_slice(buf, offset):
+    """Reads a length prefixed byte string"""
+    length, offset = read_uvarint(buf, offset)
+    return bytes(buf[offset:offset+length]), offset + length
+
+
+def snappy_decompress(data):
+    """Decompresses a raw snappy block (no framing format)"""
+    length, pos = read_uvarint(data, 0)
+    out = bytearray()
+    end = len(data)
+    while pos < end:
+        tag = data[pos]
+        pos += 1
+        kind = tag & 3
+        if kind == 0:
+            # Literal, lengths above 60 are stored in the next 1-4 bytes
+            size = tag >> 2
+            if size >= 60:
+                n_bytes = size - 59
+                size = int.from_bytes(data[pos:pos+n_bytes], "little")
+                pos += n_bytes
+            size += 1
+            out += data[pos:pos+size]
+            pos += size
+            continue
+        if kind == 1:
+            size = 4 + ((tag >> 2) & 7)
+            offset = ((tag >> 5) << 8) | data[pos]
+            pos += 1
+        elif kind == 2:
+            size = (tag >> 2) + 1
+            offset = data[pos] | data[pos+1] << 8
+            pos += 2
+        else:
+            size = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos+4], "little")
+            pos += 4
+        if offset == 0 or offset > len(out):
+            raise LevelDBError("Invalid snappy copy offset")
+        start = len(out) - offset
+        if offset >= size:
+            out += out[start:start+size]
+        else:
+            # Overlapping copy, repeats the last `offset` bytes
+            while size > 0:
+                chunk = out[start:start+min(offset, size)]
+                out += chunk
+                size -= len(chunk)
+    if len(out) != length:
+        raise LevelDBError("Snappy block has the wrong length")
+    return bytes(out)
+
+
+def read_log_records(path):
+    """Yields the records of a LevelDB log file (also used for the MANIFEST),
+    reassembling records split over several blocks"""
+    with open(path, "rb") as f:
+        data = f.read()
+    record = None
+    pos = 0
+    while pos + 7 <= len(data):
+        block_left = LOG_BLOCK_SIZE - pos % LOG_BLOCK_SIZE
+        if block_left < 7:
+            # Trailer of a block, too small for a header
+            pos += block_left
+            continue
+        length, kind = struct.unpack_from("<HB", data, pos + 4)
+        pos += 7
+        if pos + length > len(data):
+            # Truncated record, e.g. the file is currently written to
+            break
+        fragment = data[pos:pos+length]
+        pos += length
+        if kind == 0 and length == 0:
+            # Zero padding of preallocated files
+            pos += block_left - 7
+            continue
+        if kind == LOG_FULL:
+            yield fragment
+            record = None
+        elif kind == LOG_FIRST:
+            record = bytearray(fragment)
+        elif kind == LOG_MIDDLE and record is not None:
+            record += fragment
+        elif kind == LOG_LAST and record is not None:
+            record += fragment
+            yield bytes(record)
+            record = None
+
+
+def read_write_batch(record):
+    """Yields (key, sequence, type, value) of every entry of the
+    write batch stored in a log record"""
+    sequence, count = struct.unpack_from("<QI", record, 0)
+    pos = 12
+    for i in range(count):
+        kind = record[pos]
+        key, pos = read_slice(record, pos + 1)
+        if kind == TYPE_VALUE:
+            value, pos = read_slice(record, pos)
+        else:
+            value = None
+        yield key, sequence + i, kind, value
+
+
+def split_internal_key(internal_key):
+    """Splits an internal key into user key, sequence number and type"""
+    tag = int.from_bytes(internal_key[-8:], "little")
+    return internal_key[:-8], tag >> 8, tag & 0xff
+
+
+def read_block_entries(block):
+    """Yields the (key, value) pairs of a table block, expanding
+    the prefix compressed keys"""
+    n_restarts = struct.unpack_from("<I", block, len(block) - 4)[0]
+    end = len(block) - 4 - 4 * n_restarts
+    key = b""
+    pos = 0
+    while pos < end:
+        shared, pos = read_uvarint(block, pos)
+        non_shared, pos = read_uvarint(block, pos)
+        value_length, pos = read_uvarint(block, pos)
+        key = key[:shared] + bytes(block[pos:pos+non_shared])
+        pos += non_shared
+        yield key, block[pos:pos+value_length]
+        pos += value_length
+
+
+class Table(object):
+    """A sorted string table (.ldb or .sst file)"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < 48:
+            raise LevelDBError("Table too short: %s" % path)
+        footer = self.data[-48:]
+        if struct.unpack_from("<Q", footer, 40)[0] != TABLE_MAGIC:
+            raise LevelDBError("Not a table: %s" % path)
+        _, pos = self._read_handle(footer, 0)  # metaindex, not needed
+        index_handle, _ = self._read_handle(footer, pos)
+        index = list(read_block_entries(self._read_block(index_handle)))
+        # User key of the last entry of every data block and its handle
+        self.index_keys = [key[:-8] for key, _ in index]
+        self.index_handles = [self._read_handle(handle, 0)[0]
+                              for _, handle in index]
+
+    @staticmethod
+    def _read_handle(buf, pos):
+        offset, pos = read_uvarint(buf, pos)
+        size, pos = read_uvarint(buf, pos)
+        return (offset, size), pos
+
+    def _read_block(self, handle):
+        offset, size = handle
+        block = self.data[offset:offset+size]
+        compression = self.data[offset+size]
+        if compression == SNAPPY_COMPRESSION:
+            return snappy_decompress(block)
+        if compression != NO_COMPRESSION:
+            raise LevelDBError("Unsupported compression %d" % compression)
+        return block
+
+    def iterate(self, start=b""):
+        """Yields (user key, sequence, type, value) of all entries with a
+        user key >= `start`, ordered by key and newest entry first"""
+        first = bisect_left(self.index_keys, start)
+        for handle in self.index_handles[first:]:
+            for internal_key, value in read_block_entries(self._read_block(handle)):
+                key, sequence, kind = split_internal_key(internal_key)
+                if key >= start:
+                    yield key, sequence, kind, bytes(value)
+
+
+class LevelDB(object):
+    """Read-only view of a LevelDB database directory.
+    Table contents are merged with the log file, newest entries win.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isfile(os.path.join(path, "CURRENT")):
+            raise LevelDBError("No LevelDB database found at %s" % path)
+        self._tables = {}
+        self.files, log_number = self._read_manifest()
+
+        # The log files not yet compacted into tables form the memtable
+        self.memtable = []
+        logs = [f for f in os.listdir(path) if f.endswith(".log")]
+        for log in sorted(logs, key=lambda f: int(f[:-4])):
+            if int(log[:-4]) < log_number:
+                continue
+            for record in read_log_records(os.path.join(path, log)):
+                self.memtable.extend(read_write_batch(record))
+        self.memtable.sort(key=lambda e: (e[0], -e[1]))
+        self.memtable_keys = [e[0] for e in self.memtable]
+
+        obfuscate_key = self.get(OBFUSCATE_KEY, obfuscated=False)
+        self.obfuscate_key = obfuscate_key[1:] if obfuscate_key else None
+        if self.obfuscate_key and not any(self.obfuscate_key):
+            self.obfuscate_key = None
+
+    def _read_manifest(self):
+        """Replays the version edits of the current MANIFEST and returns
+        the live table files as list of (level, number, smallest user key,
+        largest user key) together with the log number"""
+        with open(os.path.join(self.path, "CURRENT")) as f:
+            manifest = os.path.join(self.path, f.read().strip())
+        files, log_number = {}, 0
+        for record in read_log_records(manifest):
+            pos = 0
+            while pos < len(record):
+                tag, pos = read_uvarint(record, pos)
+                if tag == TAG_COMPARATOR:
+                    comparator, pos = read_slice(record, pos)
+                    if comparator != b"leveldb.BytewiseComparator":
+                        raise LevelDBError("Unsupported comparator %s" % comparator)
+                elif tag == TAG_LOG_NUMBER:
+                    log_number, pos = read_uvarint(record, pos)
+                elif tag in (TAG_NEXT_FILE_NUMBER, TAG_LAST_SEQUENCE,
+                             TAG_PREV_LOG_NUMBER):
+                    _, pos = read_uvarint(record, pos)
+                elif tag == TAG_COMPACT_POINTER:
+                    _, pos = read_uvarint(record, pos)
+                    _, pos = read_slice(record, pos)
+                elif tag == TAG_DELETED_FILE:
+                    level, pos = read_uvarint(record, pos)
+                    number, pos = read_uvarint(record, pos)
+                    files.pop(number, None)
+                elif tag == TAG_NEW_FILE:
+                    level, pos = read_uvarint(record, pos)
+                    number, pos = read_uvarint(record, pos)
+                    _, pos = read_uvarint(record, pos)  # file size
+                    smallest, pos = read_slice(record, pos)
+                    largest, pos = read_slice(record, pos)
+                    files[number] = (level, number, smallest[:-8], largest[:-8])
+                else:
+                    raise LevelDBError("Unknown MANIFEST tag %d" % tag)
+        # Level 0 tables may overlap, newer (higher numbered) tables first
+        return sorted(files.values(), key=lambda f: (f[0], -f[1])), log_number
+
+    def _table(self, number):
+        if number not in self._tables:
+            for ext in (".ldb", ".sst"):
+                path = os.path.join(self.path, "%06d%s" % (number, ext))
+                if os.path.isfile(path):
+                    self._tables[number] = Table(path)
+                    break
+            else:
+                raise LevelDBError("Missing table %06d" % number)
+        return self._tables[number]
+
+    def _deobfuscate(self, value):
+        key = self.obfuscate_key
+        if key is None or value is None:
+            return value
+        key = (key * (len(value) // len(key) + 1))[:len(value)]
+        return bytes(a ^ b for a, b in zip(value, key))
+
+    def get(self, key, obfuscated=True):
+        """Returns the value stored under `key` or None"""
+        i = bisect_left(self.memtable_keys, key)
+        if i < len(self.memtable) and self.memtable[i][0] == key:
+            value = self.memtable[i][3]
+            return self._deobfuscate(value) if obfuscated else value
+
+        # Tables of lower levels hold newer entries
+        for level, number, smallest, largest in self.files:
+            if not smallest <= key <= largest:
+                continue
+            for entry_key, _, kind, value in self._table(number).iterate(key):
+                if entry_key != key:
+                    break
+                if kind == TYPE_DELETION:
+                    return None
+                return self._deobfuscate(value) if obfuscated else value
+        return None
+
+    def iterate(self, prefix=b""):
+        """Yields the (key, value) pairs of all live entries whose key
+        starts with `prefix`, ordered by key"""
+        sources = [(e for e in self.memtable[bisect_left(self.memtable_keys, prefix):])]
+        for level, number, smallest, largest in self.files:
+            if largest >= prefix and (smallest[:len(prefix)] <= prefix):
+                sources.append(self._table(number).iterate(prefix))
+        entries = heapq.merge(*sources, key=lambda e: (e[0], -e[1]))
+
+        last_key = None
+        for key, _, kind, value in entries:
+            if not key.startswith(prefix):
+                break
+            if key == last_key:
+                # Older version of an already seen key
+                continue
+            last_key = key
+            if kind == TYPE_VALUE:
+                yield key, self._deobfuscate(value)
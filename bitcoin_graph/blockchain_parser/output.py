@@ -13,25 +13,31 @@
 # addresses. This is needed to ensure that the same number of addresses and values 
 # are collected. 
 
-from .utils import decode_varint, decode_uint64
-from .script import Script
+from .utils import read_varint, UINT64
+from .script import Script, classify_script, TEMPLATE_PROGRAMS
 from .address import Address, UnknownAddress, OPReturnAddress
 
 
 class Output(object):
-    """Represents a Transaction output"""
+    """Represents a Transaction output.
+    Only the (buffer, start, end) span of the output is stored,
+    the value and the script are decoded lazily from the shared buffer.
+    """
 
-    def __init__(self, raw_hex):
+    __slots__ = ("_buf", "_start", "_script_start", "_end", "_value",
+                 "_script", "_addresses", "_type", "_standard")
+
+    def __init__(self, raw_hex, offset=0):
         self._value = None
         self._script = None
         self._addresses = None
+        self._type = None
+        self._standard = False
 
-        script_length, varint_size = decode_varint(raw_hex[8:])
-        script_start = 8 + varint_size
-
-        self._script_hex = raw_hex[script_start:script_start+script_length]
-        self.size = script_start + script_length
-        self._value_hex = raw_hex[:8]
+        self._buf = raw_hex
+        self._start = offset
+        script_length, self._script_start = read_varint(raw_hex, offset + 8)
+        self._end = self._script_start + script_length
 
     @classmethod
     def from_hex(cls, hex_):
@@ -40,18 +46,28 @@ class Output(object):
     def __repr__(self):
         return "Output(satoshis=%d)" % self.value
 
+    @property
+    def size(self):
+        """Returns the size of the output in bytes"""
+        return self._end - self._start
+
     @property
     def value(self):
         """Returns the value of the output expressed in satoshis"""
         if self._value is None:
-            self._value = decode_uint64(self._value_hex)
+            self._value = UINT64.unpack_from(self._buf, self._start)[0]
         return self._value
 
+    @property
+    def script_hex(self):
+        """Returns the raw bytes of the output's script"""
+        return self._buf[self._script_start:self._end]
+
     @property
     def script(self):
         """Returns the output's script as a Script object"""
         if self._script is None:
-            self._script = Script.from_hex(self._script_hex)
+            self._script = Script.from_hex(bytes(self.script_hex))
         return self._script
     
 
@@ -62,36 +78,43 @@ class Output(object):
         """
         if self._addresses is None:
             self._addresses = []
-            if self.type == "p2pk":
+            # The type decides whether the script matched a template
+            script_type = self.type
+            if self._standard and script_type in TEMPLATE_PROGRAMS:
+                # Take the data straight from the template
+                start, end = TEMPLATE_PROGRAMS[script_type]
+                data = bytes(self.script_hex[start:end])
+                self._addresses.append(Address.from_template(script_type, data))
+            elif script_type == "p2pk":
                 address = Address.from_public_key(self.script.operations[0])
                 self._addresses.append(address)
-            elif self.type == "p2pkh":
+            elif script_type == "p2pkh":
                 address = Address.from_ripemd160(self.script.operations[2])
                 self._addresses.append(address)
-            elif self.type == "p2sh":
+            elif script_type == "p2sh":
                 address = Address.from_ripemd160(self.script.operations[1],
                                                  type="p2sh")
                 self._addresses.append(address)
-            elif self.type == "p2ms":
+            elif script_type == "p2ms":
                 n = self.script.operations[-2]
                 for operation in self.script.operations[1:1+n]:
                     self._addresses.append(Address.from_public_key(operation))
                     # Break to only take one of the multisig addresses
                     break
-            elif self.type == "p2wpkh":
+            elif script_type == "p2wpkh":
                 address = Address.from_bech32(self.script.operations[1], 0)
                 self._addresses.append(address)
-            elif self.type == "p2wsh":
+            elif script_type == "p2wsh":
                 address = Address.from_bech32(self.script.operations[1], 0)
                 self._addresses.append(address)
-            elif self.type == "p2tr":
+            elif script_type == "p2tr":
                 address = Address.from_bech32m(self.script.operations[1], 1)
                 self._addresses.append(address)
-            elif self.type in ["OP_RETURN"]:
-                opreturnaddress = OPReturnAddress(self.type)
+            elif script_type in ["OP_RETURN"]:
+                opreturnaddress = OPReturnAddress(script_type)
                 self._addresses.append(opreturnaddress)
-            elif self.type in ["invalid", "unknown"]:
-                unknownAddress = UnknownAddress(self.type)
+            elif script_type in ["invalid", "unknown"]:
+                unknownAddress = UnknownAddress(script_type)
                 self._addresses.append(unknownAddress)
             else:
                 unknownAddress = UnknownAddress("undefined")
@@ -128,7 +151,19 @@ class Output(object):
 
     @property
     def type(self):
-        """Returns the output's script type as a string"""
+        """Returns the output's script type as a string.
+        Standard scripts are recognized by their byte templates,
+        only the others get tokenized. The type is computed once.
+        """
+        if self._type is None:
+            self._type = classify_script(self.script_hex)
+            self._standard = self._type is not None
+            if self._type is None:
+                self._type = self._tokenized_type()
+        return self._type
+
+    def _tokenized_type(self):
+        """Returns the script type found by the CScript based checks"""
         # Fix for issue 11
         if not self.script.script.is_valid():
             return "invalid"
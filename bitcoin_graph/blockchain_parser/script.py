@@ -11,7 +11,6 @@
 
 from bitcoin.core.script import *
 from binascii import b2a_hex
-from .utils_taproot import from_taproot
 
 
 def is_public_key(hex_data):
@@ -33,16 +32,108 @@ def is_public_key(hex_data):
     return False
 
 
+# Slice of the hash, public key or witness program in the standard templates
+TEMPLATE_PROGRAMS = {
+    "p2pkh": (3, 23),
+    "p2sh": (2, 22),
+    "p2wpkh": (2, 22),
+    "p2wsh": (2, 34),
+    "p2tr": (2, 34),
+    "p2pk": (1, -1),
+}
+
+
+def pushes_fit(script):
+    """Given the raw bytes of a script, returns whether all of its pushes
+    are complete. This is what CScript.is_valid checks, without
+    tokenizing the script.
+    """
+    i, length = 0, len(script)
+    while i < length:
+        opcode = script[i]
+        i += 1
+        if opcode > OP_PUSHDATA4:
+            continue
+        if opcode < OP_PUSHDATA1:
+            size = opcode
+        elif opcode == OP_PUSHDATA1:
+            if i >= length:
+                return False
+            size = script[i]
+            i += 1
+        elif opcode == OP_PUSHDATA2:
+            if i + 1 >= length:
+                return False
+            size = script[i] | script[i+1] << 8
+            i += 2
+        else:
+            if i + 3 >= length:
+                return False
+            size = script[i] | script[i+1] << 8 | script[i+2] << 16 \
+                | script[i+3] << 24
+            i += 4
+        i += size
+        if i > length:
+            return False
+    return True
+
+
+def classify_script(script):
+    """Given the raw bytes of an output script, returns its type if it
+    matches one of the standard templates (p2pkh, p2sh, p2wpkh, p2wsh,
+    p2tr, p2pk), is an OP_RETURN or is invalid. Returns None for any other
+    script, these need the full CScript tokenization.
+    """
+    length = len(script)
+    if not length:
+        return None
+    first = script[0]
+
+    if length == 25:
+        if first == OP_DUP and script[1] == OP_HASH160 \
+                and script[2] == 0x14 and script[23] == OP_EQUALVERIFY \
+                and script[24] == OP_CHECKSIG:
+            return "p2pkh"
+    elif length == 22:
+        if first == OP_0 and script[1] == 0x14:
+            return "p2wpkh"
+    elif length == 23:
+        if first == OP_HASH160 and script[1] == 0x14 \
+                and script[22] == OP_EQUAL:
+            return "p2sh"
+    elif length == 34:
+        if script[1] == 0x20:
+            if first == OP_0:
+                return "p2wsh"
+            if first == OP_1:
+                return "p2tr"
+    elif length == 35:
+        if first == 0x21 and script[1] in (2, 3) \
+                and script[34] == OP_CHECKSIG:
+            return "p2pk"
+    elif length == 67:
+        if first == 0x41 and script[1] == 4 and script[66] == OP_CHECKSIG:
+            return "p2pk"
+
+    if not pushes_fit(script):
+        return "invalid"
+
+    if first == OP_RETURN:
+        return "OP_RETURN"
+
+    return None
+
+
 class Script(object):
     """Represents a bitcoin script contained in an input or output"""
 
+    __slots__ = ("hex", "_script", "_value", "_operations")
+
     def __init__(self, raw_hex):
         self.hex = raw_hex
         self._script = None
-        self._type = None
         self._value = None
         self._operations = None
-        self._addresses = None
 
     @classmethod
     def from_hex(cls, hex_):
@@ -109,11 +200,12 @@ class Script(object):
         return self.script.is_witness_v0_keyhash()
 
     def is_p2tr(self):
-        if len(self.operations) > 1 and type(self.operations[1]) == bytes:
-            taproot = from_taproot(b2a_hex(self.operations[1]).decode("ascii"))
-            return self.operations[0] == 1 \
-                and isinstance(taproot, str) \
-                and taproot.startswith("bc1p")
+        # Any version 1 push that encodes to a valid bech32m address,
+        # checked by the program length instead of encoding it
+        return len(self.operations) > 1 \
+            and self.operations[0] == 1 \
+            and type(self.operations[1]) == bytes \
+            and 2 <= len(self.operations[1]) <= 40
     
     def is_pubkey(self):
         return len(self.operations) == 2 \
@@ -10,8 +10,9 @@
 # in the LICENSE file.
 
 from math import ceil
+import hashlib
 
-from .utils import decode_varint, decode_uint32, double_sha256, format_hash
+from .utils import read_varint, double_sha256, format_hash, UINT32, DecodeError
 from .input import Input
 from .output import Output
 
@@ -21,65 +22,73 @@ def bip69_sort(data):
 
 
 class Transaction(object):
-    """Represents a bitcoin transaction"""
+    """Represents a bitcoin transaction.
 
-    def __init__(self, raw_hex):
+    The transaction is decoded in place: `raw_hex` is wrapped into a single
+    memoryview and walked using integer offsets, starting at `offset`.
+    Inputs and outputs only reference their span of that buffer.
+    Witness data is skipped unless `witnesses` is set.
+    """
+
+    __slots__ = ("_buf", "_start", "_end", "_hash", "_txid", "inputs",
+                 "outputs", "_version", "_locktime", "n_inputs", "n_outputs",
+                 "is_segwit", "_offset_before_tx_witnesses")
+
+    def __init__(self, raw_hex, offset=0, witnesses=False):
         self._hash = None
         self._txid = None
         self.inputs = None
         self.outputs = None
         self._version = None
         self._locktime = None
-        self._size = None
         self.n_inputs = 0
         self.n_outputs = 0
         self.is_segwit = False
+        self._offset_before_tx_witnesses = None
 
-        offset = 4
+        buf = raw_hex if type(raw_hex) == memoryview else memoryview(raw_hex)
+        self._buf = buf
+        self._start = offset
+        pos = offset + 4
 
         # adds basic support for segwit transactions
         #   - https://bitcoincore.org/en/segwit_wallet_dev/
         #   - https://en.bitcoin.it/wiki/Protocol_documentation#BlockTransactions
-        if b'\x00\x01' == raw_hex[offset:offset + 2]:
+        if buf[pos] == 0 and buf[pos + 1] == 1:
             self.is_segwit = True
-            offset += 2
+            pos += 2
 
-        self.n_inputs, varint_size = decode_varint(raw_hex[offset:])
-        offset += varint_size
+        self.n_inputs, pos = read_varint(buf, pos)
 
         self.inputs = []
         for i in range(self.n_inputs):
-            input = Input.from_hex(raw_hex[offset:])
-            offset += input.size
+            input = Input(buf, pos)
+            pos = input._end
             self.inputs.append(input)
 
-        self.n_outputs, varint_size = decode_varint(raw_hex[offset:])
-        offset += varint_size
+        self.n_outputs, pos = read_varint(buf, pos)
 
         self.outputs = []
         for i in range(self.n_outputs):
-            output = Output.from_hex(raw_hex[offset:])
-            offset += output.size
+            output = Output(buf, pos)
+            pos = output._end
             self.outputs.append(output)
 
         if self.is_segwit:
-            self._offset_before_tx_witnesses = offset
+            self._offset_before_tx_witnesses = pos - offset
             for inp in self.inputs:
-                tx_witnesses_n, varint_size = decode_varint(raw_hex[offset:])
-                offset += varint_size
+                tx_witnesses_n, pos = read_varint(buf, pos)
                 for j in range(tx_witnesses_n):
-                    component_length, varint_size = decode_varint(
-                        raw_hex[offset:])
-                    offset += varint_size
-                    witness = raw_hex[offset:offset + component_length]
-                    inp.add_witness(witness)
-                    offset += component_length
+                    component_length, pos = read_varint(buf, pos)
+                    if witnesses:
+                        inp.add_witness(
+                            buf[pos:pos + component_length].tobytes())
+                    pos += component_length
 
-        self._size = offset + 4
-        self.hex = raw_hex[:self._size]
+        self._end = pos + 4
 
-        if self._size != len(self.hex):
-            raise Exception("Incomplete transaction!")
+        if self._end > len(buf):
+            raise DecodeError("Incomplete transaction!")
 
     def __repr__(self):
         return "Transaction(%s)" % self.hash
@@ -88,18 +97,23 @@ class Transaction(object):
     def from_hex(cls, hex):
         return cls(hex)
 
+    @property
+    def hex(self):
+        """Returns the raw bytes of the transaction (a view into the buffer)"""
+        return self._buf[self._start:self._end]
+
     @property
     def version(self):
         """Returns the transaction's version number"""
         if self._version is None:
-            self._version = decode_uint32(self.hex[:4])
+            self._version = UINT32.unpack_from(self._buf, self._start)[0]
         return self._version
 
     @property
     def locktime(self):
         """Returns the transaction's locktime as an int"""
         if self._locktime is None:
-            self._locktime = decode_uint32(self.hex[-4:])
+            self._locktime = UINT32.unpack_from(self._buf, self._end - 4)[0]
         return self._locktime
 
     @property
@@ -115,23 +129,24 @@ class Transaction(object):
     def size(self):
         """Returns the transactions size in bytes including the size of the
         witness data if there is any."""
-        return self._size
+        return self._end - self._start
 
     @property
     def vsize(self):
         """Returns the transaction size in virtual bytes."""
+        size = self.size
         if not self.is_segwit:
-            return self._size
+            return size
         else:
             # the witness is the last element in a transaction before the
             # 4 byte locktime and self._offset_before_tx_witnesses is the
             # position where the witness starts
-            witness_size = self._size - self._offset_before_tx_witnesses - 4
+            witness_size = size - self._offset_before_tx_witnesses - 4
 
             # size of the transaction without the segwit marker (2 bytes) and
             # the witness
-            stripped_size = self._size - (2 + witness_size)
-            weight = stripped_size * 3 + self._size
+            stripped_size = size - (2 + witness_size)
+            weight = stripped_size * 3 + size
 
             # vsize is weight / 4 rounded up
             return ceil(weight / 4)
@@ -144,12 +159,13 @@ class Transaction(object):
             # segwit transactions have two transaction ids/hashes, txid and wtxid
             # txid is a hash of all of the legacy transaction fields only
             if self.is_segwit:
-                txid_data = self.hex[:4] + self.hex[
-                                           6:self._offset_before_tx_witnesses] + self.hex[
-                                                                                 -4:]
+                start, buf = self._start, self._buf
+                h = hashlib.sha256(buf[start:start + 4])
+                h.update(buf[start + 6:start + self._offset_before_tx_witnesses])
+                h.update(buf[self._end - 4:self._end])
+                self._txid = format_hash(hashlib.sha256(h.digest()).digest())
             else:
-                txid_data = self.hex
-            self._txid = format_hash(double_sha256(txid_data))
+                self._txid = format_hash(double_sha256(self.hex))
 
         return self._txid
 
@@ -0,0 +1,186 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Decoder for the undo data bitcoind stores in the rev*.dat files. For every
+# block, the undo data contains the outputs spent by its transactions, which
+# allows to resolve the address and value of inputs without a UTXO set.
+
+import hashlib
+
+from .output import Output
+from .address import Address
+from .script import classify_script, TEMPLATE_PROGRAMS
+from .utils import read_varint, UINT32
+
+
+# Constant separating the undo records in the rev files
+BITCOIN_CONSTANT = b"\xf9\xbe\xb4\xd9"
+
+# Parameters of the secp256k1 curve, y^2 = x^3 + 7 (mod p)
+SECP256K1_P = 2**256 - 2**32 - 977
+
+
+def read_core_varint(buf, offset):
+    """Reads the VARINT format of src/serialize.h of bitcoin core used by
+    the undo data and returns the value and the offset behind it"""
+    n = 0
+    while True:
+        data = buf[offset]
+        offset += 1
+        n = (n << 7) | (data & 0x7f)
+        if data & 0x80 == 0:
+            return n, offset
+        n += 1
+
+
+def decompress_amount(x):
+    """Inverse of bitcoin core's CompressAmount"""
+    if x == 0:
+        return 0
+    x -= 1
+    e, x = x % 10, x // 10
+    if e < 9:
+        d, x = x % 9 + 1, x // 9
+        n = x * 10 + d
+    else:
+        n = x + 1
+    return n * 10 ** e
+
+
+def decompress_pubkey(n_size, x):
+    """Restores the uncompressed public key from its x coordinate,
+    `n_size` (4 or 5) encodes the parity of y"""
+    x = int.from_bytes(x, "big")
+    y = pow((x * x * x + 7) % SECP256K1_P, (SECP256K1_P + 1) // 4, SECP256K1_P)
+    if y & 1 != n_size & 1:
+        y = SECP256K1_P - y
+    return b"\x04" + x.to_bytes(32, "big") + y.to_bytes(32, "big")
+
+
+def decompress_script(buf, offset):
+    """Reads a script compressed by bitcoin core's ScriptCompression and
+    returns the script and the offset behind it"""
+    n_size, offset = read_core_varint(buf, offset)
+    if n_size == 0:
+        # P2PKH
+        return b"\x76\xa9\x14" + bytes(buf[offset:offset+20]) + b"\x88\xac", offset + 20
+    if n_size == 1:
+        # P2SH
+        return b"\xa9\x14" + bytes(buf[offset:offset+20]) + b"\x87", offset + 20
+    if n_size in (2, 3):
+        # P2PK with compressed public key
+        return b"\x21" + bytes([n_size]) + bytes(buf[offset:offset+32]) + b"\xac", offset + 32
+    if n_size in (4, 5):
+        # P2PK with uncompressed public key
+        pubkey = decompress_pubkey(n_size, buf[offset:offset+32])
+        return b"\x41" + pubkey + b"\xac", offset + 32
+    n_size -= 6
+    return bytes(buf[offset:offset+n_size]), offset + n_size
+
+
+def read_block_undo(buf, offset=0):
+    """Decodes the undo data of a block. Returns a list with an entry for
+    every transaction but the coinbase, holding the (height, is_coinbase,
+    value, script) of the outputs spent by its inputs."""
+    n_txs, offset = read_varint(buf, offset)
+    block_undo = []
+    for _ in range(n_txs):
+        n_inputs, offset = read_varint(buf, offset)
+        tx_undo = []
+        for _ in range(n_inputs):
+            code, offset = read_core_varint(buf, offset)
+            height = code >> 1
+            if height > 0:
+                # Unused version of older undo formats
+                _, offset = read_core_varint(buf, offset)
+            amount, offset = read_core_varint(buf, offset)
+            script, offset = decompress_script(buf, offset)
+            tx_undo.append((height, bool(code & 1), decompress_amount(amount), script))
+        block_undo.append(tx_undo)
+    return block_undo
+
+
+def spent_output(value, script):
+    """Builds an Output object from the value and script of a spent output"""
+    length = len(script)
+    if length < 0xfd:
+        prefix = bytes([length])
+    else:
+        prefix = b"\xfd" + length.to_bytes(2, "little")
+    return Output(value.to_bytes(8, "little") + prefix + script)
+
+
+def spent_address(value, script):
+    """Returns the (first) address of a spent output or None"""
+    script_type = classify_script(script)
+    if script_type in TEMPLATE_PROGRAMS:
+        start, end = TEMPLATE_PROGRAMS[script_type]
+        return Address.from_template(script_type, script[start:end]).address
+    addresses = spent_output(value, script).addresses
+    return addresses[0].address if addresses else None
+
+
+def locate_undo(raw_data):
+    """Given the content of a rev file, yields the (offset, size) pair of
+    every undo record, offset pointing behind the 8 bytes of magic and size.
+    Every record is followed by its 32 bytes checksum."""
+    length = len(raw_data)
+    offset = raw_data.find(BITCOIN_CONSTANT)
+    while 0 <= offset <= length - 8:
+        size = UINT32.unpack_from(raw_data, offset + 4)[0]
+        start = offset + 8
+        if start + size + 32 > length:
+            break
+        yield start, size
+
+        offset = start + size + 32
+        if raw_data[offset:offset+4] != BITCOIN_CONSTANT:
+            offset = raw_data.find(BITCOIN_CONSTANT, offset)
+
+
+def match_undo(raw_data, blocks):
+    """Assigns the undo records of a rev file to the blocks of the matching
+    blk file. The checksum of a record is the double sha256 of the hash of
+    the previous block and the undo data. `blocks` are rows of the block
+    index. Returns a dictionary mapping the block offsets to their undo
+    data. Blocks without undo data (e.g. stale blocks) are missing.
+    """
+    sha256 = hashlib.sha256
+    undo = {}
+    with memoryview(raw_data) as view:
+        # Records by their checksum and, per number of transactions they
+        # undo, the records not assigned yet in the order of the rev file
+        checksums, pending = {}, {}
+        for offset, size in locate_undo(raw_data):
+            checksums[bytes(view[offset+size:offset+size+32])] = (offset, size)
+            pending.setdefault(read_varint(view, offset)[0], {})[offset] = size
+
+        # Records are written in the order the blocks got connected, which
+        # mostly is the order of the blk file, so the first pending record
+        # usually matches. Records with the same content (e.g. of blocks
+        # without transactions besides the coinbase) are told apart by
+        # looking up the checksum.
+        for offset, prev_hash, n_tx in zip(blocks["offset"].tolist(),
+                                           [p.tobytes() for p in blocks["prev_hash"]],
+                                           blocks["n_tx"].tolist()):
+            candidates = pending.get(n_tx - 1, {})
+            for start, size in candidates.items():
+                h = sha256(prev_hash)
+                h.update(view[start:start+size])
+                record = checksums.get(sha256(h.digest()).digest())
+                if record is not None:
+                    break
+            else:
+                continue
+            start, size = record
+            candidates.pop(start, None)
+            undo[offset] = bytes(view[start:start+size])
+    return undo
@@ -13,6 +13,15 @@ from binascii import hexlify
 import hashlib
 import struct
 
+# Precompiled readers used by the offset based decoders
+UINT16 = struct.Struct("<H")
+UINT32 = struct.Struct("<I")
+UINT64 = struct.Struct("<Q")
+
+
+class DecodeError(Exception):
+    """Raised when raw block data can not be decoded"""
+
 
 def btc_ripemd160(data):
     h1 = hashlib.sha256(data).digest()
@@ -26,7 +35,7 @@ def double_sha256(data):
 
 
 def format_hash(hash_):
-    return str(hexlify(hash_[::-1]).decode("utf-8"))
+    return str(hexlify(bytes(hash_)[::-1]).decode("utf-8"))
 
 
 def decode_uint32(data):
@@ -59,3 +68,19 @@ def decode_varint(data):
 
     size = struct.calcsize(format_)
     return struct.unpack(format_, data[1:size+1])[0], size + 1
+
+
+def read_varint(buf, offset):
+    """Decodes the varint found at `offset` of `buf` without slicing it.
+    Returns the decoded value and the offset right behind the varint.
+    """
+    size = buf[offset]
+
+    if size < 253:
+        return size, offset + 1
+
+    if size == 253:
+        return UINT16.unpack_from(buf, offset + 1)[0], offset + 3
+    if size == 254:
+        return UINT32.unpack_from(buf, offset + 1)[0], offset + 5
+    return UINT64.unpack_from(buf, offset + 1)[0], offset + 9
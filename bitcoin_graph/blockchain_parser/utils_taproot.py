@@ -24,20 +24,32 @@ class Encoding(Enum):
     
 CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
 BECH32M_CONST = 0x2bc830a3
+GENERATOR = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
 
+# XOR of the generators selected by the 5 top bits of the checksum state
+POLYMOD_TABLE = [0] * 32
+for top in range(32):
+    for i in range(5):
+        if (top >> i) & 1:
+            POLYMOD_TABLE[top] ^= GENERATOR[i]
 
-def bech32_polymod(values):
-    """Internal function that computes the Bech32 checksum."""
-    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
-    chk = 1
+# Translation table from 5 bit values to the bech32 characters
+CHARSET_TABLE = bytes.maketrans(bytes(range(32)), CHARSET.encode("ascii"))
+
+
+def bech32_polymod_step(chk, values):
+    """Feeds `values` into the checksum state `chk` using the precomputed table."""
+    table = POLYMOD_TABLE
     for value in values:
-        top = chk >> 25
-        chk = (chk & 0x1ffffff) << 5 ^ value
-        for i in range(5):
-            chk ^= generator[i] if ((top >> i) & 1) else 0
+        chk = (chk & 0x1ffffff) << 5 ^ value ^ table[chk >> 25]
     return chk
 
 
+def bech32_polymod(values):
+    """Internal function that computes the Bech32 checksum."""
+    return bech32_polymod_step(1, values)
+
+
 def bech32_hrp_expand(hrp):
     """Expand the HRP into values for checksum computation."""
     return [ord(x) >> 5 for x in hrp] + [0] + [ord(x) & 31 for x in hrp]
@@ -127,6 +139,54 @@ def decode(hrp, addr):
     return (data[0], decoded)
 
 
+_hrp_states = {}
+
+
+def bech32_hrp_state(hrp):
+    """Returns the (cached) checksum state after feeding the expanded HRP."""
+    state = _hrp_states.get(hrp)
+    if state is None:
+        state = _hrp_states[hrp] = bech32_polymod(bech32_hrp_expand(hrp))
+    return state
+
+
+def program_to_5bit(witprog):
+    """Direct 8 -> 5 bit conversion (with padding) of a witness program."""
+    bits = len(witprog) * 8
+    pad = -bits % 5
+    n = int.from_bytes(witprog, "big") << pad
+    return [n >> shift & 31 for shift in range(bits + pad - 5, -1, -5)]
+
+
+def encode_segwit(witver, witprog, hrp="bc"):
+    """Encode a witness program as bech32 (version 0) or bech32m (version 1+)
+    address. Unlike `encode`, the result is not verified by decoding it."""
+    data = [witver] + program_to_5bit(witprog)
+    const = 1 if witver == 0 else BECH32M_CONST
+    chk = bech32_polymod_step(bech32_hrp_state(hrp), data)
+    chk = bech32_polymod_step(chk, (0, 0, 0, 0, 0, 0)) ^ const
+    data += [chk >> 25 & 31, chk >> 20 & 31, chk >> 15 & 31,
+             chk >> 10 & 31, chk >> 5 & 31, chk & 31]
+    return hrp + "1" + bytes(data).translate(CHARSET_TABLE).decode("ascii")
+
+
+def encode_batch(witprogs, witver=1, hrp="bc"):
+    """Encode a list of witness programs of the same version in one call."""
+    state = bech32_hrp_state(hrp)
+    const = 1 if witver == 0 else BECH32M_CONST
+    prefix = hrp + "1"
+    step = bech32_polymod_step
+    addresses = []
+    for witprog in witprogs:
+        data = [witver] + program_to_5bit(witprog)
+        chk = step(step(state, data), (0, 0, 0, 0, 0, 0)) ^ const
+        data += [chk >> 25 & 31, chk >> 20 & 31, chk >> 15 & 31,
+                 chk >> 10 & 31, chk >> 5 & 31, chk & 31]
+        addresses.append(prefix + bytes(data).translate(CHARSET_TABLE)
+                         .decode("ascii"))
+    return addresses
+
+
 def encode(witprog):
     hrp, witver = "bc", 1
     """Encode a segwit address."""
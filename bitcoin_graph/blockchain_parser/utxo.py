@@ -0,0 +1,266 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Compact UTXO store used to resolve the address and value of inputs while
+# parsing the main chain in height order, for datadirs without rev files.
+# Unspent outputs are kept in a NumPy hash table with open addressing
+# (linear probing), keyed by a 64 bits outpoint key derived from the first
+# 8 bytes of the txid and the vout. Every entry takes 49 bytes, so the
+# mainnet UTXO set fits into memory at a load factor of at most 0.75.
+
+import os
+import numpy as np
+
+from .address import Address
+from .columnar import SCRIPT_TYPES, SCRIPT_TYPE_CODES
+
+
+# One row per slot of the hash table, `program` as in the columnar outputs
+UTXO_DTYPE = np.dtype([("key", "<u8"),           # Outpoint key, see `outpoint_keys`
+                       ("script_type", "u1"),
+                       ("value", "<u8"),
+                       ("program", "V32")])
+
+# Reserved keys of empty slots and of slots of spent outputs (tombstones)
+EMPTY, DELETED = 0, 1
+
+# Maximum share of used slots (including tombstones) before growing
+MAX_LOAD = 0.75
+
+# Slots rehashed at once while growing, bounds the additional memory
+REHASH_CHUNK = 1 << 22
+
+_VOUT_MIX = np.uint64(0x9E3779B97F4A7C15)
+_SLOT_MIX = np.uint64(0xD6E8FEB86659FD93)
+_NO_PROGRAM = bytes(32)
+_OP_RETURN = SCRIPT_TYPE_CODES["OP_RETURN"]
+
+
+def txid_prefixes(txids):
+    """Returns the first 8 bytes (internal byte order) of the given V32
+    txids as uint64, the same prefixes the txid index uses"""
+    return np.frombuffer(txids.tobytes(), dtype="<u8").reshape(-1, 4)[:, 0]
+
+
+def outpoint_keys(prefixes, vouts):
+    """Combines txid prefixes and vouts into 64 bits outpoint keys,
+    avoiding the reserved keys"""
+    keys = prefixes ^ (vouts.astype(np.uint64) * _VOUT_MIX)
+    keys[keys <= DELETED] += np.uint64(2)
+    return keys
+
+
+def program_address(script_type, program):
+    """Returns the (first) address of an output given its script type and
+    program as stored by the columnar decoder, or None"""
+    if script_type in ("p2pkh", "p2pk", "p2ms"):
+        if program == _NO_PROGRAM:
+            return None
+        return Address.from_ripemd160(program[:20]).address
+    if script_type == "p2sh":
+        return Address.from_ripemd160(program[:20], type="p2sh").address
+    if script_type == "p2wpkh":
+        return Address.from_bech32(program[:20], 0).address
+    if script_type == "p2wsh":
+        return Address.from_bech32(program, 0).address
+    if script_type == "p2tr":
+        return Address.from_bech32m(program, 1).address
+    if script_type == "OP_RETURN":
+        return "op_return"
+    return script_type
+
+
+def spent_columns(spent):
+    """Returns the addresses and values of the `spent` outputs (as returned
+    by `UTXOStore.update`) as object arrays, None for unknown outputs"""
+    addresses = np.full(len(spent), None, dtype=object)
+    values = np.full(len(spent), None, dtype=object)
+    found = np.flatnonzero(spent["key"] != EMPTY)
+    if len(found):
+        spent = spent[found]
+        values[found] = spent["value"].tolist()
+        addresses[found] = [program_address(SCRIPT_TYPES[script_type], program.tobytes())
+                            for script_type, program in zip(spent["script_type"].tolist(),
+                                                            spent["program"])]
+    return addresses, values
+
+
+class UTXOStore(object):
+    """Set of unspent outputs, updated block by block in height order.
+    `height` and `tip` are the height and hash of the last applied block,
+    `height` is None while an update is in progress.
+    """
+
+    def __init__(self, path, capacity=1 << 20):
+        self.path = path
+        self.table = np.zeros(capacity, dtype=UTXO_DTYPE)
+        self.count = 0          # Unspent outputs
+        self.deleted = 0        # Tombstones
+        self.height = -1
+        self.tip = None
+
+    @classmethod
+    def load(cls, path):
+        """Returns the last snapshot stored in the directory `path` or an
+        empty store"""
+        store = cls(path)
+        try:
+            with np.load(store._snapshot_file()) as snapshot:
+                table, meta, tip = snapshot["table"], snapshot["meta"], snapshot["tip"]
+        except (OSError, KeyError, ValueError):
+            return store
+        if table.dtype != UTXO_DTYPE:
+            # Written by an older version
+            return store
+        store.table = table
+        store.height, store.count, store.deleted = meta.tolist()
+        store.tip = tip.tobytes()
+        return store
+
+    def _snapshot_file(self):
+        return os.path.join(self.path, "utxo.npz")
+
+    def save(self):
+        """Stores a snapshot of the store, so a restarted parser continues
+        at the last applied block instead of replaying the chain"""
+        if self.height is None:
+            # Interrupted update
+            return False
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, exist_ok=True)
+        snapshot_file = self._snapshot_file()
+        # Write to a temporary file first, so a crash keeps the last snapshot
+        with open(snapshot_file + ".tmp", "wb") as f:
+            np.savez(f, table=self.table,
+                     meta=np.array([self.height, self.count, self.deleted], dtype=np.int64),
+                     tip=np.frombuffer(self.tip or b"", dtype=np.uint8))
+        os.replace(snapshot_file + ".tmp", snapshot_file)
+        return True
+
+    def reset(self):
+        """Empties the store"""
+        self.table = np.zeros(1 << 20, dtype=UTXO_DTYPE)
+        self.count, self.deleted = 0, 0
+        self.height, self.tip = -1, None
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.table)
+
+    def _home(self, keys):
+        shift = np.uint64(64 - (self.capacity.bit_length() - 1))
+        return ((keys * _SLOT_MIX) >> shift).astype(np.int64)
+
+    def _find(self, keys):
+        """Returns the slots holding `keys`, -1 for missing keys"""
+        table_keys = self.table["key"]
+        mask = self.capacity - 1
+        found = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        slots = self._home(keys)
+        while len(pending):
+            current = table_keys[slots]
+            hit = current == keys[pending]
+            found[pending[hit]] = slots[hit]
+            more = ~hit & (current != EMPTY)
+            pending, slots = pending[more], (slots[more] + 1) & mask
+        return found
+
+    def _insert(self, rows):
+        """Inserts `rows` with unique keys which are not in the table yet"""
+        table_keys = self.table["key"]
+        mask = self.capacity - 1
+        pending = np.arange(len(rows))
+        slots = self._home(rows["key"])
+        while len(pending):
+            current = table_keys[slots]
+            free = np.flatnonzero(current <= DELETED)
+            # Several keys might probe the same free slot, the first one wins
+            _, first = np.unique(slots[free], return_index=True)
+            won = free[first]
+            self.deleted -= int(np.count_nonzero(current[won] == DELETED))
+            self.table[slots[won]] = rows[pending[won]]
+            lost = np.ones(len(pending), dtype=bool)
+            lost[won] = False
+            pending, slots = pending[lost], (slots[lost] + 1) & mask
+        self.count += len(rows)
+
+    def _grow(self, n):
+        """Makes room for `n` additional outputs, doubling the capacity or
+        just dropping the tombstones"""
+        if self.count + self.deleted + n <= self.capacity * MAX_LOAD:
+            return
+        capacity = self.capacity
+        while self.count + n > capacity * MAX_LOAD:
+            capacity *= 2
+        old = self.table
+        self.table = np.zeros(capacity, dtype=UTXO_DTYPE)
+        self.count, self.deleted = 0, 0
+        for start in range(0, len(old), REHASH_CHUNK):
+            chunk = old[start:start+REHASH_CHUNK]
+            self._insert(chunk[chunk["key"] > DELETED])
+
+    def add(self, rows):
+        """Adds the unspent outputs `rows`, replacing outputs with the same
+        key (e.g. the duplicated coinbase transactions of BIP30)"""
+        # Keep the last of duplicated keys
+        _, last = np.unique(rows["key"][::-1], return_index=True)
+        rows = rows[::-1][last]
+        slots = self._find(rows["key"])
+        exists = slots >= 0
+        self.table[slots[exists]] = rows[exists]
+        rows = rows[~exists]
+        self._grow(len(rows))
+        self._insert(rows)
+
+    def spend(self, keys):
+        """Removes the outputs with the given `keys` and returns them, rows
+        of unknown outputs have the key EMPTY"""
+        spent = np.zeros(len(keys), dtype=UTXO_DTYPE)
+        slots = self._find(keys)
+        hit = np.flatnonzero(slots >= 0)
+        spent[hit] = self.table[slots[hit]]
+        slots = np.unique(slots[hit])
+        self.table["key"][slots] = DELETED
+        self.count -= len(slots)
+        self.deleted += len(slots)
+        return spent
+
+    def update(self, columns, height, tip):
+        """Applies the blocks decoded into `columns` (see `decode_blocks`),
+        the last one with `height` and hash `tip`: adds their spendable
+        outputs and spends the outputs referenced by their inputs. Returns
+        the spent outputs aligned with the inputs, see `spend`.
+        """
+        self.height = None
+        txs, inputs, outputs = columns["txs"], columns["inputs"], columns["outputs"]
+
+        # Outputs first, inputs may spend outputs of the same blocks
+        outputs = outputs[outputs["script_type"] != _OP_RETURN]
+        rows = np.zeros(len(outputs), dtype=UTXO_DTYPE)
+        rows["key"] = outpoint_keys(txid_prefixes(txs["txid"])[outputs["tx"]],
+                                    outputs["index"])
+        rows["script_type"] = outputs["script_type"]
+        rows["value"] = outputs["value"]
+        rows["program"] = outputs["program"]
+        self.add(rows)
+
+        prefixes = txid_prefixes(inputs["prev_txid"])
+        coinbase = (prefixes == 0) & (inputs["vout"] == 0xffffffff)
+        spent = np.zeros(len(inputs), dtype=UTXO_DTYPE)
+        spendings = np.flatnonzero(~coinbase)
+        spent[spendings] = self.spend(outpoint_keys(prefixes[spendings],
+                                                    inputs["vout"][spendings]))
+        self.height, self.tip = height, tip
+        return spent
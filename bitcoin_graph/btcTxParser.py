@@ -20,12 +20,30 @@ import os
 import sys
 import time
 import shutil
+import multiprocessing
 from datetime import datetime
 import numpy as np
-from bitcoin_graph.blockchain_parser.blockchain import Blockchain
+from bitcoin_graph.blockchain_parser.blockchain import Blockchain, read_headers, select_window, get_chain_blocks, txid_prefix, \
+                                                      get_blocks, get_blocks_at
+from bitcoin_graph.blockchain_parser.columnar import decode_blocks, select_txs, SCRIPT_TYPES
+from bitcoin_graph.blockchain_parser.undo import spent_address
+from bitcoin_graph.blockchain_parser.utxo import UTXOStore, UTXO_DTYPE, spent_columns
+from bitcoin_graph.blockchain_parser.address import ADDRESS_CACHE
 from bitcoin_graph.uploader import Uploader, _print
+from bitcoin_graph.dictionary import IdEncoder
+from bitcoin_graph.edgebuffer import EdgeBuffer, Tables, STRING
 from bitcoin_graph.logger import BlkLogger
-from bitcoin_graph.helpers import _print, save_edge_list, file_number, print_output_header
+from bitcoin_graph.parquetwriter import ParquetDataset, IpcFiles
+from bitcoin_graph.compressedcsv import CompressedCsv
+from bitcoin_graph.helpers import _print, save_edge_list, file_number, print_output_header, edge_count, now
+
+
+# Seconds between two snapshots of the UTXO store
+UTXO_SNAPSHOT_INTERVAL = 30 * 60
+
+# Approximate size of a column value of the columnar engine (8 bytes numbers
+# and object pointers), used to split blk files into batches of edges
+COLUMN_BYTES = 8
 
 
 # ----------
@@ -38,9 +56,15 @@ class BtcTxParser:
                  targetpath=None, endTS=None, iC=None, upload=False, 
                  credentials=None, dataset=None, table_id=None, project=None, 
                  cvalue=None, cblk=None, use_parquet=False, 
-                 upload_threshold=None, bucket=None, multi_p=False
+                 upload_threshold=None, bucket=None, multi_p=False, columnar=False,
+                 address_cache=None, use_index=False, startTS=None, ordered=False,
+                 leveldb=False, prevouts=False, utxo=False, encode=False,
+                 normalized=False, flush_edges=None, flush_mb=None,
+                 compression="snappy", row_group_size=None, partition="blk",
+                 output_format="csv", compress=None, compress_level=None, compress_buffer=None
                 ):
         self.creationTime = datetime.now()      # Creation time of `this`
+        self.startTS      = startTS             # Timestamp of first block
         self.endTS        = endTS               # Timestamp of last block
         self.dl           = dl                  # Data location where blk files are stored
         self.targetpath   = targetpath          # Path to store a list of raw edges as csv
@@ -51,6 +75,32 @@ class BtcTxParser:
         self.cblk         = cblk                # Bool to activate collection blk file numbers
         self.multi_p      = multi_p             # Bool to activate multiprocessing
         self.use_parquet = use_parquet         # Use parquet format
+        self.columnar     = columnar or utxo    # Decode blk files into columns, the UTXO store works on them
+        self.use_index    = use_index           # Use the sidecar block index
+        self.utxo         = utxo                # Resolve inputs with an own UTXO store
+        self.ordered      = ordered or utxo     # Parse the main chain ordered by height
+        self.cheight      = self.ordered        # Bool to activate collecting block heights
+        self.leveldb      = leveldb             # Use the LevelDB indexes of bitcoind
+        self.cprevout     = prevouts or utxo    # Bool to activate collecting input addresses and values
+        self.cencode      = encode              # Bool to activate encoding txids and addresses to IDs
+        self.normalized   = normalized          # Save transaction, input and output tables instead of edges
+        self.flushEdges   = None                # Edges buffered before a batch is saved
+        self.flushBytes   = None                # Bytes buffered before a batch is saved
+        self.flushed      = 0                   # Edges of the current blk file saved in batches
+        self.flushedTs    = None                # Timestamps of the first and last saved batch
+        self.seek         = None                # Block containing the start tx
+        self.seekEnd      = None                # Block containing the end tx
+        self.fileTxids    = None                # Txids collected for the txid index
+        self.localWriter  = None                # Local parquet dataset or Arrow IPC streams instead of csv
+        self.csvWriter    = None                # Writer of compressed csv files
+        self.done         = multiprocessing.Value("i", 0)  # Blk files completed by all workers
+        self.progress     = 0                   # Completed blk files when the current one was done
+        if address_cache is not None:
+            ADDRESS_CACHE.resize(int(address_cache))  # Size of the address LRU cache
+        if flush_edges:
+            self.flushEdges = int(flush_edges)
+        if flush_mb:
+            self.flushBytes = int(float(flush_mb) * 2**20)
         if self.upload:
             self.creds       = credentials         # Path to google credentials json
             self.project     = project
@@ -66,46 +116,526 @@ class BtcTxParser:
                                         pthreshold = self.parq_thres,
                                         bucket     = self.bucket,
                                         multi_p    = self.multi_p,
-                                        loc        = self.dl
+                                        loc        = self.dl,
+                                        compression    = compression,
+                                        row_group_size = row_group_size
                                        ) # BigQuery uploader
+        elif self.use_parquet:
+            # Local parquet dataset instead of the csv output
+            self.localWriter = ParquetDataset(os.path.join(self.targetpath or ".", "output", now),
+                                              partition      = partition,
+                                              compression    = compression,
+                                              row_group_size = row_group_size)
+        elif output_format == "arrow":
+            self.localWriter = IpcFiles(os.path.join(self.targetpath or ".", "output", now))
+        if compress and not self.upload:
+            self.csvWriter = CompressedCsv(compress, compress_level, compress_buffer)
+        if self.cencode:
+            # Values written to the dictionary tables of the target
+            if self.upload:
+                target = os.path.join(os.path.expanduser(self.dl), "..", ".dictionary",
+                                      "{}.{}.{}".format(project, dataset, table_id))
+            else:
+                target = '{}/output/{}/dictionary/.known'.format(self.targetpath, now)
+            self.encoder  = IdEncoder(target)
 
         # Timestamp to datetime object
+        self.startTS_s, self.endTS_s = None, None
+        if self.startTS:
+            self.startTS=datetime.fromtimestamp(int(self.startTS))
+            # Earliest block timestamp passing the `start timestamp` check
+            self.startTS_s = int((self.startTS - datetime(1970, 1, 1)).total_seconds())
         if self.endTS:
             self.endTS=datetime.fromtimestamp(int(self.endTS))     
+            # Latest block timestamp passing the `end timestamp` check
+            self.endTS_s = int((self.endTS - datetime(1970, 1, 1)).total_seconds())
         
+        # Main chain reconstructed from the block headers. Blocks are assigned
+        # to the latest blk file up to their height, such that every blk file
+        # continues the heights of the previous one
+        if self.ordered:
+            print("Reconstructing main chain...")
+            blockchain = Blockchain(os.path.expanduser(self.dl))
+            if self.leveldb:
+                self.chain = blockchain.get_db_chain()
+            else:
+                self.chain = blockchain.get_chain()
+            self.chainFile = np.maximum.accumulate(self.chain["file"])
+
+        # Unspent outputs, continuing at the last snapshot
+        if self.utxo:
+            self.utxos = UTXOStore.load(os.path.join(os.path.expanduser(self.dl), "..", ".utxo"))
+            self.utxoSaved = time.time()
+            if self.utxos.height >= 0:
+                rows = self.chain[self.chain["height"] == self.utxos.height]
+                if len(rows) == 0 or rows["hash"][0].tobytes() != self.utxos.tip:
+                    print("UTXO snapshot is not part of the main chain, rebuilding it...")
+                    self.utxos.reset()
+                else:
+                    print(f"UTXO snapshot loaded at height {self.utxos.height}")
+
         print("Btc Tx-Parser successfully initialized")
     
     
+    def _edgeBuffer(self):
+        '''Returns an empty edge buffer with the columns of the edges'''
+        columns = [("ts", "I"), ("tx_id", STRING), ("input_tx_id", STRING), ("vout", "I")]
+        if self.cprevout:
+            columns += [("input_address", STRING), ("input_value", "q")]
+        columns += [("output_to", STRING), ("output_index", "I")]
+        if self.cvalue:
+            columns += [("value", "q"), ("script_type", STRING)]
+        if self.cheight:
+            columns += [("height", "i")]
+        return EdgeBuffer(columns)
+
     def _buildEdge(self, u, v, values, scripts):
-        '''Build edge by looping over the inputs `u` and the outputs `v`
-           and creating edges with every combination.
+        '''Build edges by combining the inputs `u` with the outputs `v`,
+           appending whole columns per input to the edge buffer.
         '''
+        if not isinstance(self.edge_list, EdgeBuffer):
+            self.edge_list = self._edgeBuffer()
+        edges = self.edge_list
+        n = len(v)
+        if n == 0:
+            return None
+        
+        # Every input gets an edge to every output
+        tx_id = edges.add("tx_id", self.currTxID)
+        outputs = [edges.add("output_to", _v) for _v in v]
+        indices = list(range(n))
+        if self.cvalue:
+            script_types = [edges.add("script_type", s) for s in scripts]
         for _u in set(u):
-            for _index, _v in enumerate(v):
-
-                # Collecting values
-                if self.cvalue:
-                    self.edge_list.append((self.currBl_s,
-                                           self.currTxID,
-                                           _u, 
-                                           _v, 
-                                           _index, 
-                                           values[_index],
-                                           scripts[_index]))
-
-                # ...no values    
-                else:
-                    self.edge_list.append((self.currBl_s,
-                                           self.currTxID,
-                                           _u, 
-                                           _v, 
-                                           _index))
+            edges.extend("ts", [self.currBl_s] * n)
+            edges.extend("tx_id", [tx_id] * n)
+            _u = self._outpoint(_u)
+            edges.extend("input_tx_id", [edges.add("input_tx_id", _u[0])] * n)
+            edges.extend("vout", [_u[1]] * n)
+            if self.cprevout:
+                edges.extend("input_address", [edges.add("input_address", _u[2])] * n)
+                edges.extend("input_value", [_u[3]] * n)
+            edges.extend("output_to", outputs)
+            edges.extend("output_index", indices)
+
+            # Collecting values
+            if self.cvalue:
+                edges.extend("value", values)
+                edges.extend("script_type", script_types)
+            if self.cheight:
+                edges.extend("height", [self.currBlHeight] * n)
         return None
 
+    def _outpoint(self, u):
+        '''Returns the input `u` as (txid, vout[, address, value]) tuple,
+           coinbase inputs are represented by "0"
+        '''
+        if u == "0":
+            return ("0", 0, "0", 0) if self.cprevout else ("0", 0)
+        return u
+
+    def _tableBuffers(self):
+        '''Returns empty buffers of the normalized tables'''
+        transactions = [("ts", "I"), ("tx_id", STRING), ("n_inputs", "I"), ("n_outputs", "I")]
+        if self.cheight:
+            transactions += [("height", "i")]
+        inputs = [("tx_id", STRING), ("input_index", "I"), ("input_tx_id", STRING), ("vout", "I")]
+        if self.cprevout:
+            inputs += [("input_address", STRING), ("input_value", "q")]
+        outputs = [("tx_id", STRING), ("output_index", "I"), ("output_to", STRING),
+                   ("value", "q"), ("script_type", STRING)]
+        return Tables(transactions=EdgeBuffer(transactions),
+                      inputs=EdgeBuffer(inputs),
+                      outputs=EdgeBuffer(outputs))
+
+    def _buildTables(self, u, outputs):
+        '''Normalized counterpart of `_buildEdge`. Appends the current
+           transaction, its inputs `u` and its `outputs` (objects) to the
+           transaction, input and output tables, one row each.
+        '''
+        if not isinstance(self.edge_list, Tables):
+            self.edge_list = self._tableBuffers()
+        txs, ins, outs = (self.edge_list[name] for name in ("transactions", "inputs", "outputs"))
+        n, m = len(u), len(outputs)
+
+        txs.extend("ts", [self.currBl_s])
+        txs.extend("tx_id", [txs.add("tx_id", self.currTxID)])
+        txs.extend("n_inputs", [n])
+        txs.extend("n_outputs", [m])
+        if self.cheight:
+            txs.extend("height", [self.currBlHeight])
+
+        u = [self._outpoint(_u) for _u in u]
+        ins.extend("tx_id", [ins.add("tx_id", self.currTxID)] * n)
+        ins.extend("input_index", list(range(n)))
+        ins.extend("input_tx_id", [ins.add("input_tx_id", _u[0]) for _u in u])
+        ins.extend("vout", [_u[1] for _u in u])
+        if self.cprevout:
+            ins.extend("input_address", [ins.add("input_address", _u[2]) for _u in u])
+            ins.extend("input_value", [_u[3] for _u in u])
+
+        # Outputs without any address (e.g. 0-of-n multisigs) are kept without address
+        outs.extend("tx_id", [outs.add("tx_id", self.currTxID)] * m)
+        outs.extend("output_index", list(range(m)))
+        outs.extend("output_to", [outs.add("output_to", o.addresses[0].address if o.addresses else None)
+                                  for o in outputs])
+        outs.extend("value", [o.value for o in outputs])
+        outs.extend("script_type", [outs.add("script_type", o.type) for o in outputs])
+        return None
+
+    def _flushDue(self):
+        '''Returns True if the buffered edges reached the number of edges
+           or bytes after which they are saved as a batch
+        '''
+        if self.flushEdges and edge_count(self.edge_list) >= self.flushEdges:
+            return True
+        if self.flushBytes:
+            buffers = self.edge_list.values() if isinstance(self.edge_list, Tables) else [self.edge_list]
+            return sum(b.nbytes for b in buffers) >= self.flushBytes
+        return False
+
+    def _columnarBatches(self, columns):
+        '''Returns the (start, stop) ranges of the transactions of the
+           decoded `columns` whose edges (or table rows) stay within the
+           flush limits, a single range if there are no limits.
+        '''
+        txs = columns["txs"]
+        if not (self.flushEdges or self.flushBytes) or len(txs) == 0:
+            return [(0, len(txs))]
+        n_inputs = txs["n_inputs"].astype(np.int64)
+        if self.normalized:
+            rows = 1 + n_inputs + txs["n_outputs"]
+            width = 6
+        else:
+            has_address = np.not_equal(columns["addresses"], None)
+            rows = n_inputs * np.bincount(columns["outputs"]["tx"][has_address], minlength=len(txs))
+            width = 6 + 2 * bool(self.cprevout) + 2 * bool(self.cvalue) + bool(self.cheight)
+        limits = [self.flushEdges or np.inf]
+        if self.flushBytes:
+            limits.append(self.flushBytes // (width * COLUMN_BYTES))
+        limit = max(min(limits), 1)
+
+        # A single transaction exceeding the limit is a batch of its own
+        cumulated = np.cumsum(rows)
+        batches, start = [], 0
+        while start < len(txs):
+            base = cumulated[start-1] if start else 0
+            stop = int(np.searchsorted(cumulated, base + limit, side="right"))
+            stop = max(stop, start + 1)
+            batches.append((start, stop))
+            start = stop
+        return batches
+
+    def _columnarOutpoints(self, inputs):
+        '''Returns the hex txids and vouts of the outpoints of the columnar
+           `inputs` and the mask of coinbase inputs, which are "0" and 0
+        '''
+        prev_txids = np.array([p.tobytes()[::-1].hex() for p in inputs["prev_txid"]], dtype=object)
+        vouts = inputs["vout"].astype(np.int64)
+        coinbase = prev_txids == "0" * 64
+        prev_txids[coinbase] = "0"
+        vouts[coinbase] = 0
+        return prev_txids, vouts, coinbase
+
+    def _buildColumnarTables(self, columns):
+        '''Vectorized counterpart of `_buildTables` for the columnar engine'''
+        txs, inputs, outputs = columns["txs"], columns["inputs"], columns["outputs"]
+        txids = columns["txids"]
+        prev_txids, vouts, coinbase = self._columnarOutpoints(inputs)
+        n_inputs = txs["n_inputs"].astype(np.int64)
+        first_input = np.cumsum(n_inputs) - n_inputs
+
+        transactions = {"ts"        : txs["ts"],
+                        "tx_id"     : txids,
+                        "n_inputs"  : txs["n_inputs"],
+                        "n_outputs" : txs["n_outputs"]}
+        if self.cheight:
+            transactions["height"] = self.blockHeights[txs["block"]]
+
+        ins = {"tx_id"       : txids[inputs["tx"]],
+               "input_index" : np.arange(len(inputs)) - first_input[inputs["tx"]],
+               "input_tx_id" : prev_txids,
+               "vout"        : vouts}
+        if self.cprevout:
+            ins["input_address"] = columns["input_addresses"].copy()
+            ins["input_value"] = columns["input_values"].copy()
+            ins["input_address"][coinbase] = "0"
+            ins["input_value"][coinbase] = 0
+
+        outs = {"tx_id"        : txids[outputs["tx"]],
+                "output_index" : outputs["index"],
+                "output_to"    : columns["addresses"],
+                "value"        : outputs["value"],
+                "script_type"  : np.array(SCRIPT_TYPES, dtype=object)[outputs["script_type"]]}
+        self.edge_list = Tables(transactions=transactions, inputs=ins, outputs=outs)
+        return None
+
+    def _buildColumnarEdges(self, columns):
+        '''Vectorized counterpart of `_buildEdge` for the columnar engine.
+           Builds the edges of every input with every output address of
+           the decoded `columns` and stores them as dictionary of columns.
+        '''
+        txs, inputs = columns["txs"], columns["inputs"]
+        has_address = np.not_equal(columns["addresses"], None)
+        outputs = columns["outputs"][has_address]
+        addresses = columns["addresses"][has_address]
+
+        # Number of output addresses per tx and row of the first one
+        n_out = np.bincount(outputs["tx"], minlength=len(txs))
+        out_start = np.cumsum(n_out) - n_out
+
+        # Every input is repeated once per output address of its tx
+        per_input = n_out[inputs["tx"]]
+        in_idx = np.repeat(np.arange(len(inputs)), per_input)
+        rank = np.arange(len(in_idx)) - np.repeat(np.cumsum(per_input) - per_input, per_input)
+        out_idx = np.repeat(out_start[inputs["tx"]], per_input) + rank
+        tx = inputs["tx"][in_idx]
+
+        # Coinbase inputs are represented by "0"
+        prev_txids, vouts, coinbase = self._columnarOutpoints(inputs)
+
+        self.edge_list = {"ts"           : txs["ts"][tx],
+                          "tx_id"        : columns["txids"][tx],
+                          "input_tx_id"  : prev_txids[in_idx],
+                          "vout"         : vouts[in_idx]}
+        if self.cprevout:
+            input_addresses = columns["input_addresses"].copy()
+            input_values = columns["input_values"].copy()
+            input_addresses[coinbase] = "0"
+            input_values[coinbase] = 0
+            self.edge_list["input_address"] = input_addresses[in_idx]
+            self.edge_list["input_value"] = input_values[in_idx]
+        self.edge_list["output_to"] = addresses[out_idx]
+        self.edge_list["output_index"] = rank
+        if self.cvalue:
+            self.edge_list["value"] = outputs["value"][out_idx]
+            self.edge_list["script_type"] = np.array(SCRIPT_TYPES, dtype=object)[outputs["script_type"][out_idx]]
+        if self.cheight:
+            self.edge_list["height"] = self.blockHeights[txs["block"][tx]]
+        return None
+
+    def _selectBlocks(self, blockchain, blk_file):
+        '''Returns the rows of the sidecar block index (or of a header-only
+           scan) of `blk_file` with the blocks within the [start, end]
+           timestamp window or None if all blocks need to be parsed.
+        '''
+        seek_file = self.seek is not None and self.seek[0] == self.fn
+        seek_file |= self.seekEnd is not None and self.seekEnd[0] == self.fn
+        if self.ordered:
+            index = self.chain[self.chainFile == self.fn]
+        elif self.use_index:
+            index = blockchain.get_index(blk_file)
+        elif self.startTS or self.endTS or seek_file:
+            index = read_headers(blk_file)
+        elif self.cprevout:
+            # Undo data is assigned to the blocks by their offset
+            index = blockchain.get_index(blk_file)
+        else:
+            return None
+
+        # Skip the blocks in front of the block containing the start tx
+        # and behind the block containing the end tx
+        if self.seek is not None:
+            if self.ordered:
+                index = index[index["height"] >= self.seek[2]]
+            elif self.seek[0] == self.fn:
+                index = index[index["offset"] >= self.seek[1]]
+        if self.seekEnd is not None:
+            if self.ordered:
+                index = index[index["height"] <= self.seekEnd[2]]
+            elif self.seekEnd[0] == self.fn:
+                index = index[index["offset"] <= self.seekEnd[1]]
+        return select_window(index, self.startTS_s, self.endTS_s)
+
+    def _seekTx(self, blockchain, txid, blk_files):
+        '''Looks up the block containing `txid` in the txindex of bitcoind
+           (--leveldb) or in the txid indexes of the blk files (--index).
+           Returns the blk file number, the offset and the height (ordered
+           mode only) of the block or None if the tx is not indexed.
+        '''
+        location = None
+        if self.leveldb:
+            tx = blockchain.get_db_transaction(txid)
+            if tx is not None:
+                location = tx.blockfile_no, tx.file_offset
+        if location is None and self.use_index:
+            found = blockchain.find_transaction(txid, None if self.ordered else blk_files)
+            if found is not None:
+                # Only prefixes are indexed, make sure the block contains the tx
+                rows = blockchain.get_index(found[0])
+                rows = rows[rows["offset"] == found[1]]
+                block = next(blockchain.get_unordered_blocks(found[0], rows))
+                if any(tx.txid == txid for tx in block.iter_transactions()):
+                    location = file_number(found[0]), found[1]
+        if location is None:
+            return None
+        height = None
+        if self.ordered:
+            rows = np.flatnonzero((self.chain["file"] == location[0])
+                                  & (self.chain["offset"] == location[1]))
+            if len(rows) == 0:
+                return None
+            height = int(self.chain["height"][rows[0]])
+        return location[0], location[1], height
+
+    def _spentOutput(self, spent, tx_nr, input_nr):
+        '''Returns the address and value of the output spent by the input
+           `input_nr` of the transaction `tx_nr` of the current block, given
+           its `spent` outputs (see `_blockPrevouts`), or (None, None).
+        '''
+        if spent is None:
+            return (None, None)
+        return spent[tx_nr-1][input_nr]
+
+    def _blockPrevouts(self, block):
+        '''Returns the address and value of the outputs spent by every
+           transaction of `block` but the coinbase, taken from the undo data
+           of the block. None if they are unknown.
+        '''
+        spent = block.spent_outputs
+        if spent is None:
+            return None
+        return [[(spent_address(value, script), value) for _, _, value, script in tx]
+                for tx in spent]
+
+    def _spendUtxos(self, blockchain, columns, index):
+        '''Applies the blocks decoded into `columns` (the chain rows `index`)
+           to the UTXO store and adds the address and value of the outputs
+           spent by their inputs to `columns`. Blocks in front of them which
+           were not applied yet are replayed first.
+        '''
+        if len(index) == 0:
+            columns["input_addresses"], columns["input_values"] = spent_columns(
+                np.zeros(len(columns["inputs"]), dtype=UTXO_DTYPE))
+            return columns
+        first = int(index["height"][0])
+        if self.utxos.height is None or self.utxos.height >= first:
+            _print("UTXO store is ahead of the parsed blocks, rebuilding it...")
+            self.utxos.reset()
+
+        # Blocks skipped by a custom start, a time window or a snapshot
+        # taken at an earlier height
+        behind = (self.chain["height"] > self.utxos.height) & (self.chain["height"] < first)
+        for nr in np.unique(self.chainFile[behind]).tolist():
+            rows = self.chain[behind & (self.chainFile == nr)]
+            self.utxos.update(decode_blocks(get_chain_blocks(blockchain.path, rows)),
+                              int(rows["height"][-1]), rows["hash"][-1].tobytes())
+
+        spent = self.utxos.update(columns, int(index["height"][-1]), index["hash"][-1].tobytes())
+        columns["input_addresses"], columns["input_values"] = spent_columns(spent)
+        return columns
+
+    def _snapshotUtxos(self, force=False):
+        '''Stores a snapshot of the UTXO store every `UTXO_SNAPSHOT_INTERVAL`
+           seconds (or if `force`), such that a restart continues there.
+        '''
+        if force or time.time() - self.utxoSaved > UTXO_SNAPSHOT_INTERVAL:
+            if self.utxos.save():
+                self.logger.log(f"UTXO snapshot saved at height {self.utxos.height}")
+            self.utxoSaved = time.time()
+
+    def _collectTxids(self, blockchain, blk_file):
+        '''Returns True if the txid index of `blk_file` should be built while
+           parsing it, which requires every block of the file to be decoded.
+        '''
+        if not self.use_index or self.ordered or self.startTS or self.endTS:
+            return False
+        for seek in (self.seek, self.seekEnd):
+            if seek is not None and seek[0] == self.fn:
+                return False
+        return blockchain.load_txid_index(blk_file) is None
+
+    def _saveTxidIndex(self, blockchain, blk_file, index, prefixes, blocks):
+        '''Stores the txid index of `blk_file`, given the txid prefixes and
+           the number of the block (in parsing order) of every transaction.
+        '''
+        if index is None:
+            index = read_headers(blk_file)
+        offsets = index["offset"][np.asarray(blocks, dtype=np.int64)]
+        blockchain.save_txid_index(blk_file, prefixes, offsets)
+
+    def _parseColumnar(self, blockchain, blk_file, start, sT, eT, index=None):
+        '''Decodes the blk file `blk_file` into columns and builds its edges
+           without creating any transaction objects. Returns `start`, the flag
+           signaling if the start transaction `sT` was reached.
+        '''
+        if self.ordered:
+            raw_blocks = get_chain_blocks(blockchain.path, index)
+            self.blockHeights = index["height"]
+        elif index is not None:
+            raw_blocks = get_blocks_at(blk_file, index)
+        else:
+            raw_blocks = get_blocks(blk_file)
+        undo = None
+        if self.cprevout and not self.utxo:
+            undo = blockchain.get_undo(index, blk_file)
+        columns = decode_blocks(raw_blocks, undo)
+        if self.utxo:
+            self._spendUtxos(blockchain, columns, index)
+        txids = columns["txids"]
+
+        # Build the txid index of the file
+        if self.fileTxids is not None:
+            prefixes = columns["txs"]["txid"].tobytes()
+            prefixes = np.frombuffer(prefixes, dtype="<u8").reshape(-1, 4)[:, 0]
+            self._saveTxidIndex(blockchain, blk_file, index, prefixes, columns["txs"]["block"])
+
+        # Custom start: skip everything before the start transaction
+        first, last = 0, None
+        if not start:
+            hits = np.flatnonzero(txids == sT)
+            if len(hits) == 0:
+                return start
+            first, start = int(hits[0]), True
+
+        # Custom end: cut at the end transaction (excluded)
+        if eT != None:
+            hits = np.flatnonzero(txids[first:] == eT)
+            if len(hits) > 0:
+                last = first + int(hits[0])
+
+        columns = select_txs(columns, first, last)
+        if len(columns["txs"]) > 0:
+            self.currBl_s = int(columns["txs"]["ts"][-1])
+            self.currTxID = columns["txids"][-1]
+
+        # Edges are built batch by batch, all but the last are saved here
+        batches = self._columnarBatches(columns)
+        for nr, (batch_start, batch_stop) in enumerate(batches):
+            batch = columns if len(batches) == 1 else select_txs(columns, batch_start, batch_stop)
+            if self.normalized:
+                self._buildColumnarTables(batch)
+            else:
+                self._buildColumnarEdges(batch)
+            if nr < len(batches) - 1 and save_edge_list(self, final=False) == "stop":
+                sys.exit(1)
+
+        if last != None:
+            _print("End Tx reached")
+            _print("Execution terminated")
+            sys.exit(1)
+        return start
+
+    def schedule(self, sF, eF):
+        '''Returns the blk files `sF` to `eF` for the work queue of the
+           multiprocessing mode, ordered by their estimated parsing cost,
+           largest first. The cost is the number of transactions taken from
+           the block index (--index) or the size of the file.
+        '''
+        blockchain = Blockchain(os.path.expanduser(self.dl))
+        blk_files = blockchain.get_blk_files(sF, eF)
+        if self.use_index:
+            cost = {f: int(blockchain.get_index(f)["n_tx"].sum()) for f in blk_files}
+        else:
+            cost = {f: os.path.getsize(f) for f in blk_files}
+        return sorted(blk_files, key=lambda f: cost[f], reverse=True)
+
     # Build Graph
-    def parse(self, sF, eF, sT, eT, process = 1): 
+    def parse(self, sF, eF, sT, eT, process = 1, queue = None): 
         '''Parising function that starts the parsing process.
            Arguments: start file `sF`, end file `eF`, start tx `sT` and a end tx `eT`.
+           If a `queue` is given, the blk files are taken from it one at a
+           time until it yields None (multiprocessing work queue).
         '''
         if process == 1:
             time.sleep(1)
@@ -119,20 +649,32 @@ class BtcTxParser:
             
             # Set start to True if no Start transaction is provided
             start = True if sT == None else False
-            
+
             # Receive list of .blk files
             blk_files = blockchain.get_blk_files(sF, eF)
+
+            # Jump directly to the blocks containing the start and end transaction
+            if self.leveldb or self.use_index:
+                if sT != None:
+                    self.seek = self._seekTx(blockchain, sT, blk_files)
+                    if self.seek is not None:
+                        _print(f"Start tx found in blk file nr. {self.seek[0]}")
+                if eT != None:
+                    self.seekEnd = self._seekTx(blockchain, eT, blk_files)
             
-            # l = number of .blk files
+            # l = number of .blk files, shared by all workers of the work queue
             # t0 = time iteration beginns
             # loop_duration = list of delta times of iterations
             # Value received by output
-            self.l = len(blk_files)+file_number(sF)-1 if sF else len(blk_files)-1
+            self.l = len(blk_files)
             self.t0, self.loop_duration, self.Val, self.cum_edges = None, [], None, 0
+            self.started = datetime.now()
+            if queue is None:
+                self.done.value = 0
             
             
             # Loop through all .blk files
-            for blk_file in blk_files:
+            for blk_file in (blk_files if queue is None else iter(queue.get, None)):
                 
                 # Monitor disk usage in multi-processing mode
                 if self.multi_p:
@@ -147,30 +689,69 @@ class BtcTxParser:
                 
                 # Ensure to start with an empty array
                 if not self.use_parquet:
-                    assert(len(self.edge_list) == 0)
+                    assert(edge_count(self.edge_list) == 0)
                 
                 # Get integer of .blk filename (blk00001 => 1)
                 self.fn = file_number(blk_file)
+
+                # Skip blk files in front of the start tx and behind the end tx
+                if self.seek is not None and not self.ordered and self.fn < self.seek[0]:
+                    self._fileDone()
+                    continue
+                if self.seekEnd is not None and not self.ordered and self.fn > self.seekEnd[0]:
+                    self._fileDone()
+                    continue
                 
                 # Log progress
-                self.logger.log(f"Block File # {self.fn}/{self.l}")
+                self.logger.log(f"Block File # {self.fn} ({self.done.value}/{self.l} done)")
+
+                # Blocks to parse, None if there is no index
+                index = self._selectBlocks(blockchain, blk_file)
 
-                for block in blockchain.get_unordered_blocks(blk_file):
+                # Txid prefixes and block numbers for the txid index
+                self.fileTxids = ([], []) if self._collectTxids(blockchain, blk_file) else None
+                
+                # Columnar engine
+                if self.columnar:
+                    start = self._parseColumnar(blockchain, blk_file, start, sT, eT, index)
+                    blocks = []
+                elif self.ordered:
+                    blocks = blockchain.get_ordered_blocks(index)
+                else:
+                    blocks = blockchain.get_unordered_blocks(blk_file, index)
+
+                # Undo data of the blocks to resolve the spent outputs (the UTXO store
+                # is applied by the columnar engine)
+                undo = None
+                if self.cprevout and not self.columnar:
+                    undo = blockchain.get_undo(index, blk_file)
+
+                for block_nr, block in enumerate(blocks):
                     
                     # Keep track of processed blocks
                     self.currBlHash = block.hash
+                    self.currBlHeight = block.height
+                    if undo is not None:
+                        block.undo = undo[block_nr]
 
-                    # Skip blocks younger than specified `end timestamp`
+                    # Skip blocks outside of the `start` and `end timestamp`
                     self.currBl_s = block.header.timestamp
                     self.currBl = datetime.utcfromtimestamp(self.currBl_s)
+                    if self.startTS:
+                        if self.currBl_s < self.startTS_s:
+                            continue
                     if self.endTS:                     
                         if self.currBl > self.endTS:
                             continue
                     
-                    for tx in block.transactions:
+                    spent = self._blockPrevouts(block) if self.cprevout else None
+                    for tx_nr, tx in enumerate(block.iter_transactions()):
                         
                         # Set `last-processed tx id`
                         self.currTxID = tx.txid
+                        if self.fileTxids is not None:
+                            self.fileTxids[0].append(txid_prefix(self.currTxID))
+                            self.fileTxids[1].append(block_nr)
                         
                         # ---
                         # Custom Start or End                      
@@ -192,32 +773,54 @@ class BtcTxParser:
 
                             # Handle Inputs
                             Vins = []
-                            for inp in tx.inputs:
+                            for input_nr, inp in enumerate(tx.inputs):
 
                                 # Coinbase Txs
                                 if inp.transaction_hash == "0" * 64:
                                     # Build egde from ZERO to all Transaction output addresses
                                     Vins.append("0")
                                
+                                # Append transaction id, vout and the spent address and value
+                                elif self.cprevout:
+                                    Vins.append((inp.transaction_hash, int(inp.transaction_index))
+                                                + self._spentOutput(spent, tx_nr, input_nr))
+
                                 # Append transaction id and vout 
                                 else:
                                     Vins.append((inp.transaction_hash, int(inp.transaction_index)))
 
-                            # Outputs and Values
-                            Outs = []
-                            Vals = []
-                            Scpt = []
-                            for output in tx.outputs:
-                                # Multisigs might contain multiple addresses
-                                for address in output.addresses:
-                                    Outs.append(address.address)
-                                    Vals.append(output.value)
-                                    Scpt.append(output.type)
-
-                            # Build edge
-                            self._buildEdge(Vins, Outs, Vals, Scpt)
+                            # Normalized tables
+                            if self.normalized:
+                                self._buildTables(Vins, tx.outputs)
+
+                            else:
+                                # Outputs and Values
+                                Outs = []
+                                Vals = []
+                                Scpt = []
+                                for output in tx.outputs:
+                                    # Multisigs might contain multiple addresses
+                                    for address in output.addresses:
+                                        Outs.append(address.address)
+                                        Vals.append(output.value)
+                                        Scpt.append(output.type)
+
+                                # Build edge
+                                self._buildEdge(Vins, Outs, Vals, Scpt)
+
+                            # Save a batch of the edges if the buffer is full
+                            if self._flushDue() and save_edge_list(self, final=False) == "stop":
+                                sys.exit(1)
                 
-                if start:
+                # Store the txid index of the parsed file
+                if self.fileTxids is not None and not self.columnar:
+                    self._saveTxidIndex(blockchain, blk_file, index, *self.fileTxids)
+
+                # Progress of all workers, including this file
+                self.progress = self._fileDone()
+
+                # Nothing to save if no block of the file is within the time window
+                if start and (edge_count(self.edge_list) > 0 or self.flushed):
                     if not self.use_parquet:
                         _print(f"blk file nr. {self.fn} successfully parsed...", end='\r')
                     # Safe/upload and reset edge list and then reset it
@@ -228,7 +831,14 @@ class BtcTxParser:
                         self.finish_tasks()
                         _print("Execution finished")
                         return self   
+                else:
+                    # Drop the empty columns of the skipped file
+                    self.edge_list = []
                 
+                # Periodically store the unspent outputs
+                if self.utxo:
+                    self._snapshotUtxos()
+
                 # Reset t0 for next block
                 self.t0 = datetime.now()                  
 
@@ -248,15 +858,28 @@ class BtcTxParser:
             self.finish_tasks()
             return self 
     
+    def _fileDone(self):
+        '''Counts a completed blk file in the counter shared by the workers
+           and returns the number of blk files completed so far'''
+        with self.done.get_lock():
+            self.done.value += 1
+            return self.done.value
+
     # Final info prints
     def finish_tasks(self):
         # Make sure everything is saved
-        if len(self.edge_list) > 0:
+        if edge_count(self.edge_list) > 0 or self.flushed:
             success = save_edge_list(self)
+        if self.utxo:
+            self._snapshotUtxos(force=True)
+        
+        # Report how many address encodings were saved by the cache
+        self.logger.log(ADDRESS_CACHE.stats())
+        _print(ADDRESS_CACHE.stats() + "\n")
         
         # Create end file for multiprocessing
         if self.multi_p:
-            with open(f"{self.dl}/../.temp/end_multiprocessing_{np.random.randint(0,100000000)}.txt", "w") as file:
+            with open(f"{self.dl}/../.temp/end_multiprocessing_{os.getpid()}.txt", "w") as file:
                 file.write("True")
                 
         execution_time = int((datetime.now() \
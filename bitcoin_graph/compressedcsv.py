@@ -0,0 +1,132 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Compressed csv output. The csv text is collected in large buffers which are
+# compressed (gzip or zstd) and written by a background thread, so
+# compression and disk I/O overlap with parsing. zlib and zstandard release
+# the GIL while compressing. The files of a blk file stay open across its
+# batches and are completed once the blk file is saved.
+
+import csv
+import zlib
+import queue
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# File extension per codec
+CODECS = {"gzip": ".gz", "zstd": ".zst"}
+
+# Default size of the buffers handed to the compression thread
+BUFFER_SIZE = 16 * 2**20
+
+# Buffers queued for compression, bounds the memory if the disk is slower
+QUEUED_BUFFERS = 4
+
+
+def compressor(codec, level=None):
+    """Returns a compressor object (with `compress` and `flush`) of `codec`"""
+    if codec == "gzip":
+        # wbits 31 writes a gzip header and trailer
+        return zlib.compressobj(6 if level is None else int(level), zlib.DEFLATED, 31)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor(level=3 if level is None else int(level)).compressobj()
+    raise ValueError("Unknown codec {}".format(codec))
+
+
+class CompressedFile(object):
+    """Text file compressed by a background thread. Written text is
+    buffered until `buffer_size` bytes are reached."""
+
+    def __init__(self, file, codec="gzip", level=None, buffer_size=BUFFER_SIZE):
+        self.file = open(file, "wb")
+        self.compressor = compressor(codec, level)
+        self.buffer_size = buffer_size
+        self.parts, self.buffered = [], 0
+        self.error = None
+        self.queue = queue.Queue(maxsize=QUEUED_BUFFERS)
+        self.thread = threading.Thread(target=self._compress, daemon=True)
+        self.thread.start()
+
+    def _compress(self):
+        done = False
+        try:
+            while not done:
+                data = self.queue.get()
+                done = data is None
+                if done:
+                    self.file.write(self.compressor.flush())
+                else:
+                    self.file.write(self.compressor.compress(data))
+        except Exception as e:
+            self.error = e
+            # Keep consuming, the writer must not block on a full queue
+            while not done:
+                done = self.queue.get() is None
+        finally:
+            self.file.close()
+
+    def _hand_over(self):
+        if self.error is not None:
+            raise self.error
+        if self.parts:
+            self.queue.put("".join(self.parts).encode())
+            self.parts, self.buffered = [], 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.buffer_size:
+            self._hand_over()
+
+    def close(self):
+        """Compresses the remaining text and waits for the file"""
+        try:
+            self._hand_over()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+class CompressedCsv(object):
+    """Compressed csv files of the blk file parsed at the moment"""
+
+    def __init__(self, codec, level=None, buffer_size=None):
+        if codec not in CODECS:
+            raise ValueError("Unknown codec {}".format(codec))
+        # Fail before parsing if the codec is not available
+        compressor(codec, level)
+        self.codec = codec
+        self.level = level
+        self.buffer_size = int(float(buffer_size) * 2**20) if buffer_size else BUFFER_SIZE
+        self.files = {}         # Open files by name (without extension)
+
+    def writerows(self, file, rows):
+        """Appends the `rows` to the csv file `file` (the extension of the
+        codec is added)"""
+        if file not in self.files:
+            self.files[file] = CompressedFile(file + CODECS[self.codec], self.codec,
+                                              self.level, self.buffer_size)
+        csv.writer(self.files[file], delimiter=",").writerows(rows)
+
+    def close(self):
+        """Completes the files of the current blk file"""
+        for f in self.files.values():
+            f.close()
+        self.files = {}
@@ -0,0 +1,210 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Dictionary encoding of txids and addresses to 64 bits integer IDs.
+# IDs are derived from the values themselves - the first 8 bytes of a txid
+# (the prefix of the txid index) and a 8 bytes BLAKE2b hash of an address -
+# so every run and every worker process assigns the same IDs without any
+# coordination. Every txid and address is written once per output target:
+# the IDs of the written values are stored in segments next to the target,
+# together with a 32 bits check value (the next 4 bytes of a txid, another
+# hash of an address) which reveals values colliding on the same ID.
+
+import os
+import hashlib
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+
+# Edge columns holding txids and addresses
+TXID_COLUMNS = ("tx_id", "input_tx_id")
+ADDRESS_COLUMNS = ("input_address", "output_to")
+
+# Dictionary tables
+KINDS = ("txids", "addresses")
+
+# ID and check value of a written txid or address, segments are sorted by id
+KNOWN_DTYPE = np.dtype([("id", "<i8"), ("check", "<i4")])
+
+
+def txid_id(txid):
+    """Returns the ID of the hex encoded `txid`, 0 for coinbase inputs"""
+    if txid == "0":
+        return 0
+    return int.from_bytes(bytes.fromhex(txid)[:-9:-1], "little", signed=True)
+
+
+def txid_check(txid):
+    """Returns the check value of the hex encoded `txid`"""
+    return int.from_bytes(bytes.fromhex(txid)[-9:-13:-1], "little", signed=True)
+
+
+def address_id(address):
+    """Returns the ID of `address`, 0 for coinbase inputs"""
+    if address == "0":
+        return 0
+    return int.from_bytes(hashlib.blake2b(address.encode(), digest_size=8).digest(),
+                          "little", signed=True)
+
+
+def address_check(address):
+    """Returns the check value of `address`"""
+    return int.from_bytes(hashlib.blake2b(address.encode(), digest_size=4,
+                                          person=b"check").digest(),
+                          "little", signed=True)
+
+
+class IdEncoder(object):
+    """Replaces the txids and addresses of edges by their IDs and collects
+    the dictionary entries of values not written to the target yet. The
+    segments of written values are stored in `path`, one directory per
+    output target. Worker processes forked from the encoder share its
+    `lock` and read the segments of each other, see `pop_dictionary`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = multiprocessing.Lock()
+        self.pending = {kind: {} for kind in KINDS}     # (id, check) of new values by value
+        self.written = {kind: None for kind in KINDS}   # Entries popped, but not committed yet
+        self.known = {kind: [] for kind in KINDS}       # Runs of known entries sorted by id
+        self.segments = set()                           # Segment files read or written
+        self._refresh()
+
+    def _refresh(self):
+        """Reads the segments not read yet, e.g. written by other workers"""
+        if not os.path.isdir(self.path):
+            return
+        for file in sorted(os.listdir(self.path)):
+            if not file.endswith(".npy") or file in self.segments:
+                continue
+            kind = file.split("_blk_")[0]
+            if kind in KINDS:
+                segment = np.load(os.path.join(self.path, file))
+                if segment.dtype == KNOWN_DTYPE:
+                    self._add_known(kind, segment)
+                self.segments.add(file)
+
+    def _lookup(self, kind, ids, checks):
+        """Returns whether the (`ids`, `checks`) entries are known and
+        whether their ID is known with another check value (collision)"""
+        known = np.zeros(len(ids), dtype=bool)
+        taken = np.zeros(len(ids), dtype=bool)
+        for run in self.known[kind]:
+            if len(run) == 0:
+                continue
+            run_ids = run["id"]
+            left = np.searchsorted(run_ids, ids, "left")
+            right = np.searchsorted(run_ids, ids, "right")
+            found = right > left
+            taken |= found
+            first = run["check"][np.minimum(left, len(run) - 1)]
+            known |= found & (first == checks)
+            # IDs stored with several check values (earlier collisions)
+            for i in np.flatnonzero(right - left > 1):
+                known[i] |= checks[i] in run["check"][left[i]:right[i]]
+        return known, taken & ~known
+
+    def _add_known(self, kind, entries):
+        """Adds the `entries` sorted by id to the known entries. Runs of
+        similar size are merged, so there are only logarithmically many
+        runs to search"""
+        runs = self.known[kind]
+        runs.append(entries)
+        while len(runs) > 1 and 2 * len(runs[-1]) >= len(runs[-2]):
+            last = runs.pop()
+            merged = np.concatenate([runs[-1], last])
+            runs[-1] = merged[np.argsort(merged["id"], kind="stable")]
+
+    def encode(self, name, values):
+        """Returns the IDs of the `values` of the edge column `name`, as
+        int64 array or as object array if there are missing values (None)
+        """
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        uniques = list(uniques)
+        if name in TXID_COLUMNS:
+            ids = np.array([txid_id(v) for v in uniques], dtype=np.int64)
+            if name == "tx_id":
+                checks = np.array([txid_check(v) for v in uniques], dtype=np.int32)
+                self._collect("txids", uniques, ids, checks)
+        else:
+            ids = np.array([address_id(v) for v in uniques], dtype=np.int64)
+            new = ids != 0
+            uniques = [v for v, n in zip(uniques, new) if n]
+            checks = np.array([address_check(v) for v in uniques], dtype=np.int32)
+            self._collect("addresses", uniques, ids[new], checks)
+
+        if (codes >= 0).all():
+            return ids[codes]
+        encoded = np.full(len(codes), None, dtype=object)
+        present = codes >= 0
+        encoded[present] = ids[codes[present]].tolist()
+        return encoded
+
+    def _collect(self, kind, values, ids, checks):
+        """Remembers the values of `kind` not known yet"""
+        known, _ = self._lookup(kind, ids, checks)
+        pending = self.pending[kind]
+        for value, i, c, k in zip(values, ids.tolist(), checks.tolist(), known):
+            if not k:
+                pending[value] = (i, c)
+
+    def pop_dictionary(self):
+        """Returns and resets the collected dictionary entries as
+        (txids, addresses, collisions), lists of (id, value) tuples, the
+        collisions being the entries sharing their ID with another value.
+        Must be called holding the `lock` and followed by `commit` once
+        the entries are written, so no other worker writes them again.
+        """
+        self._refresh()
+        entries, collisions = {}, []
+        for kind in KINDS:
+            pending = self.pending[kind]
+            ids = np.fromiter((i for i, _ in pending.values()), dtype=np.int64, count=len(pending))
+            checks = np.fromiter((c for _, c in pending.values()), dtype=np.int32, count=len(pending))
+            known, collided = self._lookup(kind, ids, checks)
+            # Values are written to the dictionary even if their ID collides,
+            # which at least shows the ambiguous IDs
+            entries[kind] = [(i, v) for (v, (i, _)), k in zip(pending.items(), known) if not k]
+            collisions += [(i, v) for (v, (i, _)), c in zip(pending.items(), collided) if c]
+            new = np.zeros(len(entries[kind]), dtype=KNOWN_DTYPE)
+            new["id"], new["check"] = ids[~known], checks[~known]
+            # New values of the same ID
+            unique, counts = np.unique(new["id"], return_counts=True)
+            shared = set(unique[counts > 1].tolist())
+            collisions += [(i, v) for i, v in entries[kind] if i in shared]
+            self.written[kind] = new[np.argsort(new["id"], kind="stable")]
+            self.pending[kind] = {}
+        return entries["txids"], entries["addresses"], collisions
+
+    def _segment_file(self, kind, blkfilenr, n):
+        return "{}_blk_{}_{}.npy".format(kind, blkfilenr, n)
+
+    def commit(self, blkfilenr):
+        """Marks the entries returned by `pop_dictionary` as written,
+        storing them in new segments of the blk file `blkfilenr`"""
+        for kind in KINDS:
+            new, self.written[kind] = self.written[kind], None
+            if new is None or len(new) == 0:
+                continue
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path, exist_ok=True)
+            # Segments are never changed, every batch gets a new one
+            n = 0
+            while os.path.exists(os.path.join(self.path, self._segment_file(kind, blkfilenr, n))):
+                n += 1
+            file = self._segment_file(kind, blkfilenr, n)
+            with open(os.path.join(self.path, file + ".tmp"), "wb") as f:
+                np.save(f, new)
+            os.replace(os.path.join(self.path, file + ".tmp"), os.path.join(self.path, file))
+            self.segments.add(file)
+            self._add_known(kind, new)
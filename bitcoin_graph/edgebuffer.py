@@ -0,0 +1,153 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Growable columnar buffer for the edges of the object engine. Every column
+# is a typed array. String columns store every distinct value once per
+# buffer in a byte arena (with offsets) and a code per row, so the txid of a
+# transaction, a reused address or a script type repeated for many edges
+# takes 4 bytes per edge. The buffer is handed to the writers as a dictionary of
+# columns, like the edges of the columnar engine.
+
+import sys
+from array import array
+import numpy as np
+
+
+# Type of string columns, numeric columns use array typecodes
+STRING = "str"
+
+
+class StringColumn(object):
+    """String column, distinct values in a byte arena and a code per row"""
+
+    __slots__ = ("arena", "offsets", "codes", "index")
+
+    def __init__(self):
+        self.arena = bytearray()
+        self.offsets = array("q", [0])
+        self.codes = array("i")
+        self.index = {}     # Code of every distinct value
+
+    def add(self, value):
+        """Returns the code of `value`, storing it in the arena if it is
+        new, -1 for None"""
+        if value is None:
+            return -1
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.offsets) - 1
+            self.arena += value.encode()
+            self.offsets.append(len(self.arena))
+        return code
+
+    def extend(self, codes):
+        self.codes.extend(codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return len(self.arena) + self.offsets.itemsize * len(self.offsets) \
+               + self.codes.itemsize * len(self.codes) + sys.getsizeof(self.index)
+
+    def values(self):
+        """Returns the column as object array of strings (None for -1)"""
+        arena, offsets = self.arena, self.offsets
+        strings = [arena[offsets[i]:offsets[i+1]].decode() for i in range(len(offsets) - 1)]
+        strings.append(None)
+        if len(self.codes) == 0:
+            return np.zeros(0, dtype=object)
+        return np.array(strings, dtype=object)[np.frombuffer(self.codes, dtype="i")]
+
+
+class NumericColumn(object):
+    """Numeric column of the array typecode `typecode`, missing values
+    (None) are stored as 0 and remembered by their row"""
+
+    __slots__ = ("data", "nulls")
+
+    def __init__(self, typecode):
+        self.data = array(typecode)
+        self.nulls = None
+
+    def extend(self, values):
+        if None in values:
+            if self.nulls is None:
+                self.nulls = array("q")
+            start = len(self.data)
+            self.nulls.extend(start + i for i, x in enumerate(values) if x is None)
+            values = [0 if x is None else x for x in values]
+        self.data.extend(values)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        nulls = 0 if self.nulls is None else self.nulls.itemsize * len(self.nulls)
+        return self.data.itemsize * len(self.data) + nulls
+
+    def values(self):
+        """Returns the column as numpy array, an object array with None
+        for missing values"""
+        if len(self.data) == 0:
+            return np.zeros(0, dtype=self.data.typecode)
+        values = np.frombuffer(self.data, dtype=self.data.typecode)
+        if self.nulls is not None:
+            values = values.astype(object)
+            values[np.frombuffer(self.nulls, dtype=np.int64)] = None
+        return values
+
+
+class Tables(dict):
+    """Named tables of the normalized output (transactions, inputs and
+    outputs), each an EdgeBuffer or a dictionary of columns"""
+
+
+class EdgeBuffer(object):
+    """Edges as columns, given as (name, type) pairs in output order, the
+    type being STRING or an array typecode"""
+
+    def __init__(self, columns):
+        self._columns = {name: StringColumn() if kind == STRING else NumericColumn(kind)
+                         for name, kind in columns}
+
+    def __len__(self):
+        for column in self._columns.values():
+            return len(column)
+        return 0
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def __getitem__(self, name):
+        """Returns the column `name` as numpy array, see `columns`"""
+        return self._columns[name].values()
+
+    @property
+    def nbytes(self):
+        """Memory used by the buffered columns"""
+        return sum(column.nbytes for column in self._columns.values())
+
+    def add(self, name, value):
+        """Stores the string `value` of the column `name`, returns its code"""
+        return self._columns[name].add(value)
+
+    def extend(self, name, values):
+        """Appends `values` (codes for string columns) to column `name`"""
+        self._columns[name].extend(values)
+
+    def columns(self):
+        """Returns the edges as dictionary of numpy columns. The numeric
+        columns share the memory of the buffer, which must not be extended
+        afterwards."""
+        return {name: column.values() for name, column in self._columns.items()}
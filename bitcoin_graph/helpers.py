@@ -17,7 +17,10 @@ import sys
 import psutil
 import re
 import csv
+import numpy as np
 from datetime import datetime
+from bitcoin_graph.edgebuffer import EdgeBuffer, Tables
+from bitcoin_graph.parquetwriter import arrow_table
 
 # Helpers
 #
@@ -35,11 +38,37 @@ def get_date(folder="./output"):
     except:
         return 0   
 
-def save_edge_list(parser, uploader=None, location=None):
+def edge_count(rE):
+    # Rows of all normalized tables
+    if isinstance(rE, Tables):
+        return sum(edge_count(table) for table in rE.values())
+    
+    # Edges are either a list of tuples or a dictionary of columns
+    if isinstance(rE, dict):
+        return len(next(iter(rE.values()), []))
+    return len(rE)
+
+def edge_span(rE):
+    '''Returns the timestamps of the first and last edge (or transaction)
+       of `rE` or None if there are none'''
+    if isinstance(rE, Tables):
+        rE = rE["transactions"]
+    if edge_count(rE) == 0:
+        return None
+    ts = rE["ts"] if isinstance(rE, (dict, EdgeBuffer)) else [rE[0][0], rE[-1][0]]
+    return int(ts[0]), int(ts[-1])
+
+def save_edge_list(parser, uploader=None, location=None, final=True):
+    '''Saves/uploads the edges of the parsed blk file. Unless `final`, the
+       edges are a batch of a blk file that is still parsed, which is
+       appended to the output of the blk file.'''
     rE           = parser.edge_list   # List with edges
     blkfilenr    = parser.fn          # File name
     cblk         = parser.cblk        # Bool if collecting blk file number
     cvalue       = parser.cvalue      # Bool if collecting values
+    cheight      = parser.cheight     # Bool if collecting block heights
+    cprevout     = parser.cprevout    # Bool if collecting input addresses and values
+    cencode      = parser.cencode     # Bool if encoding txids and addresses to IDs
     use_parquet  = parser.use_parquet # Bool if using parquet format
     multi_p      = parser.multi_p
     
@@ -48,17 +77,44 @@ def save_edge_list(parser, uploader=None, location=None):
     else:
         location = parser.targetpath
     
-    # If collecting blk numbers is activated, then append it to every edge
-    if cblk:
-        rE = list(map(lambda x: (x) + (blkfilenr,), rE))
+    # Normalized tables instead of edges
+    if parser.normalized:
+        success = True
+        if isinstance(rE, Tables):
+            success = save_tables(parser, uploader, location)
+        if cencode:
+            save_dictionary(parser, uploader, location)
+        finish_batch(parser, final)
+        return success
+
+    # Edge buffer of the object engine, hand over its columns
+    if isinstance(rE, EdgeBuffer):
+        rE = rE.columns()
+
+    # Columnar engine, edges are already flat columns
+    if isinstance(rE, dict):
+        if cblk:
+            rE["blk_file_nr"] = np.full(edge_count(rE), blkfilenr)
     
-    # Flatten each line of rE
-    # if third entry is a tuple then transaction != coinbase transaction
-    rE = [(*row[0:2],*row[2],*row[3:]) if type(row[2]) == tuple else (*row[0:3],*row[2:]) for row in rE]
+    else:
+        # If collecting blk numbers is activated, then append it to every edge
+        if cblk:
+            rE = list(map(lambda x: (x) + (blkfilenr,), rE))
+    
+        # Flatten each line of rE
+        # if third entry is a tuple then transaction != coinbase transaction
+        n_in = 4 if cprevout else 2
+        rE = [(*row[0:2],*row[2],*row[3:]) if type(row[2]) == tuple else (*row[0:2],*(row[2],)*n_in,*row[3:]) for row in rE]
+
+    # Replace txids and addresses by their IDs
+    if cencode:
+        rE = encode_edges(parser, rE)
         
     # Direct upload to Google BigQuery without local copy
     if uploader and not use_parquet:
-        success = uploader.upload_data(rE, cblk=cblk,cvalue=cvalue)
+        success = True
+        if edge_count(rE) > 0:
+            success = uploader.upload_data(rE, cblk=cblk,cvalue=cvalue,cheight=cheight,cprevout=cprevout,cencode=cencode)
         if success == "stop":
             _print("Parsing stopped...")
             
@@ -67,27 +123,152 @@ def save_edge_list(parser, uploader=None, location=None):
         success = uploader.handle_parquet_data(rE=rE,
                                                blkfilenr=blkfilenr,
                                                cblk=cblk,
-                                               cvalue=cvalue
+                                               cvalue=cvalue,
+                                               cheight=cheight,
+                                               cprevout=cprevout,
+                                               cencode=cencode,
+                                               final=final
                                               )
 
+    # Local parquet dataset or Arrow IPC streams
+    elif parser.localWriter:
+        if edge_count(rE) > 0:
+            schema = get_table_schema(["ts", "tx_id", "input_tx_id", "vout"], cblk, cvalue, cheight, cprevout, cencode)
+            parser.localWriter.write(arrow_table(rE, schema), "rawedges", blkfilenr)
+        success = True
+
     # Store locally
     else:
         if not os.path.isdir('{}/output'.format(location)):
-            os.makedirs('{}/output'.format(location))
+            os.makedirs('{}/output'.format(location), exist_ok=True)
         if not os.path.isdir('{}/output/{}/rawedges/'.format(location,now)):
-            os.makedirs('{}/output/{}/rawedges'.format(location,now))
-        with open("{}/output/{}/rawedges/raw_blk_{}.csv".format(location, 
-                                                                now, 
-                                                                blkfilenr),"w",newline="") as f:
-            cw = csv.writer(f,delimiter=",")
-            cw.writerows(rE)
+            os.makedirs('{}/output/{}/rawedges'.format(location,now), exist_ok=True)
+        write_csv(parser, "{}/output/{}/rawedges/raw_blk_{}.csv".format(location, 
+                                                                        now, 
+                                                                        blkfilenr),
+                  zip(*rE.values()) if isinstance(rE, dict) else rE)
         success = True
+
+    # Store the dictionary entries of the new txids and addresses
+    if cencode:
+        save_dictionary(parser, uploader, location)
         
-    tablestats(parser)
+    finish_batch(parser, final)
+    return success
+
+def write_mode(parser):
+    '''Returns the mode to open the output files of the current blk file,
+       batches after the first one are appended'''
+    return "a" if parser.flushed else "w"
+
+def write_csv(parser, file, rows):
+    '''Writes the `rows` to the csv file `file` of the current blk file,
+       compressed by a background thread if compression is activated'''
+    if parser.csvWriter:
+        parser.csvWriter.writerows(file, rows)
+        return
+    with open(file, write_mode(parser), newline="") as f:
+        cw = csv.writer(f,delimiter=",")
+        cw.writerows(rows)
+
+def finish_batch(parser, final):
+    '''Prints the stats of a completely saved blk file or keeps track of
+       the saved batch, then resets the edge list'''
+    if final:
+        if parser.localWriter:
+            parser.localWriter.close()
+        if parser.csvWriter:
+            parser.csvWriter.close()
+        tablestats(parser)
+        parser.flushed, parser.flushedTs = 0, None
+    else:
+        span = edge_span(parser.edge_list)
+        if span and parser.flushedTs:
+            span = parser.flushedTs[0], span[1]
+        parser.flushedTs = span or parser.flushedTs
+        parser.flushed += edge_count(parser.edge_list)
     
     # Reset edge list
     parser.edge_list = []
-    return success
+                 
+def save_tables(parser, uploader=None, location=None):
+    '''Saves/uploads the normalized tables (transactions, inputs and
+       outputs) of the parsed blk file, one file/table per table'''
+    blkfilenr = parser.fn
+    for name, table in parser.edge_list.items():
+        if isinstance(table, EdgeBuffer):
+            table = table.columns()
+        if parser.cblk:
+            table["blk_file_nr"] = np.full(edge_count(table), blkfilenr)
+        if parser.cencode:
+            table = encode_edges(parser, table)
+        
+        if uploader:
+            success = uploader.upload_table(table, name, get_normalized_schema(table, parser.cencode))
+            if success == "stop":
+                _print("Parsing stopped...")
+                return success
+        elif parser.localWriter:
+            if edge_count(table) > 0:
+                schema = get_normalized_schema(table, parser.cencode)
+                parser.localWriter.write(arrow_table(table, schema), name, blkfilenr)
+        else:
+            if not os.path.isdir('{}/output/{}/{}/'.format(location,now,name)):
+                os.makedirs('{}/output/{}/{}'.format(location,now,name), exist_ok=True)
+            write_csv(parser, "{}/output/{}/{}/{}_blk_{}.csv".format(location, 
+                                                                     now, 
+                                                                     name,
+                                                                     name,
+                                                                     blkfilenr),
+                      zip(*table.values()))
+    return True
+
+def encode_edges(parser, rE):
+    '''Replaces the txids and addresses of the edges `rE` by their IDs'''
+    names = ["tx_id", "input_tx_id", "output_to"]
+    if parser.cprevout:
+        names.append("input_address")
+    if isinstance(rE, dict):
+        for name in names:
+            if name in rE:
+                rE[name] = parser.encoder.encode(name, rE[name])
+        return rE
+    
+    # Position of the columns within the flattened edges
+    positions = {"tx_id": 1, "input_tx_id": 2, "input_address": 4,
+                 "output_to": 6 if parser.cprevout else 4}
+    columns = list(zip(*rE))
+    if len(columns) == 0:
+        return rE
+    for name in names:
+        columns[positions[name]] = parser.encoder.encode(name, columns[positions[name]])
+    return list(zip(*columns))
+
+def save_dictionary(parser, uploader=None, location=None):
+    '''Saves/uploads the dictionary entries of the txids and addresses
+       collected by the encoder since the last call. Workers write their
+       entries one after another, so every value is only written once.'''
+    blkfilenr = parser.fn
+    with parser.encoder.lock:
+        txids, addresses, collisions = parser.encoder.pop_dictionary()
+        for i, value in collisions:
+            parser.logger.log(f"ID collision: {value} shares the ID {i} with another value")
+            _print(f"ID collision: {value} shares the ID {i} with another value\n")
+        if uploader:
+            uploader.upload_dictionary(txids, "txids")
+            uploader.upload_dictionary(addresses, "addresses")
+        else:
+            if not os.path.isdir('{}/output/{}/dictionary/'.format(location,now)):
+                os.makedirs('{}/output/{}/dictionary'.format(location,now), exist_ok=True)
+            for name, rows in (("txids", txids), ("addresses", addresses)):
+                write_csv(parser, "{}/output/{}/dictionary/{}_blk_{}.csv".format(location,
+                                                                                 now,
+                                                                                 name,
+                                                                                 blkfilenr),
+                          rows)
+        
+        # Values are only written once per target
+        parser.encoder.commit(blkfilenr)
                  
 def used_ram():
     m = psutil.virtual_memory()
@@ -105,11 +286,13 @@ def handle_time_delta(parser):
     parser.loop_duration = parser.loop_duration[-15:]
     return delta, parser.loop_duration
            
-def estimate_end(loopduration, curr_file, total_files):
-    avg_loop = int(sum(loopduration[-15:])/len(loopduration[-15:]))
-    delta_files = total_files - curr_file
+def estimate_end(start, done, total_files):
+    '''Estimates the end from the time the `done` blk files took since
+       `start`, the files being completed by all workers together'''
+    elapsed = (datetime.now() - start).total_seconds()
+    delta_files = total_files - done
     _estimate = datetime.fromtimestamp(datetime.now().timestamp() \
-                                       + delta_files * avg_loop)
+                                       + delta_files * elapsed / max(done, 1))
     return _estimate.strftime("%d.%m-%H:%M:%S")
 
 def file_number(s):
@@ -120,24 +303,39 @@ def file_number(s):
         return int(match.lstrip("0"))    
 
 # BigQuery Table schema
-def get_table_schema(cls, cblk, cvalue):
+def get_table_schema(cls, cblk, cvalue, cheight=False, cprevout=False, cencode=False):
+
+    # Txids and addresses are either strings or their IDs
+    id_type = 'INTEGER' if cencode else 'STRING'
 
     # Default table schema
     c = [ {'name': '{}'.format(cls[0]), 'type': 'INTEGER'},
-          {'name': '{}'.format(cls[1]), 'type': 'STRING'},
-          {'name': '{}'.format(cls[2]), 'type': 'STRING'},
-          {'name': '{}'.format(cls[3]), 'type': 'INTEGER'},
-          {'name': '{}'.format(cls[4]), 'type': 'STRING'},
-          {'name': '{}'.format(cls[5]), 'type': 'INTEGER'}
+          {'name': '{}'.format(cls[1]), 'type': id_type},
+          {'name': '{}'.format(cls[2]), 'type': id_type},
+          {'name': '{}'.format(cls[3]), 'type': 'INTEGER'}
         ]
+    if cprevout:
+        c.append({'name': '{}'.format("input_address"), 'type': id_type})
+        c.append({'name': '{}'.format("input_value"), 'type': 'INTEGER'})
+    c.append({'name': '{}'.format("output_to"), 'type': id_type})
+    c.append({'name': '{}'.format("output_index"), 'type': 'INTEGER'})
     if cvalue:
         c.append({'name': '{}'.format("value"), 'type': 'INTEGER'})
         c.append({'name': '{}'.format("script_type"), 'type': 'STRING'})
+    if cheight:
+        c.append({'name': '{}'.format("height"), 'type': 'INTEGER'})
     if cblk:
         c.append({'name': '{}'.format("blk_file_nr"), 'type': 'INTEGER'})
         
     return c
 
+# BigQuery schema of a normalized table
+def get_normalized_schema(columns, cencode=False):
+    strings = ["script_type"]
+    if not cencode:
+        strings += ["tx_id", "input_tx_id", "input_address", "output_to"]
+    return [{'name': c, 'type': 'STRING' if c in strings else 'INTEGER'} for c in columns]
+
 def print_output_header(parser):
     print("{:-^13}|{:-^9}|{:-^23}|{:-^14}|{:->7}|"\
           "{:-^7}|{:-^10}|{:-^16}|{:-^21}|".format("","","","","","","","","")) 
@@ -153,7 +351,7 @@ def print_output_header(parser):
                                                      "RAM stats")) 
     print("{:^13}|{:^9}| {:^21} | {:^12} | {:>5} |"\
           "{:^6} | {:^8} | {:^14} | {:^19} |".format("timestamp",
-                                                     "blk nr.",
+                                                     "files",
                                                      "date range",
                                                      "edges/blk",
                                                      "edges",
@@ -167,8 +365,8 @@ def print_output_header(parser):
 # Ugly stats-printing function
 def tablestats(parser):
     rE            = parser.edge_list     # List with edges
-    blkfilenr     = parser.fn            # File nr.
-    re_len        = len(rE)              # Nr. of edges
+    done          = parser.progress      # Blk files completed by all workers
+    re_len        = edge_count(rE) + parser.flushed  # Nr. of edges, including saved batches
     total_files   = parser.l             # Total blk files
     
     parser.cum_edges += re_len           # Cumulated edges
@@ -186,11 +384,17 @@ def tablestats(parser):
     delta, loop_duration = handle_time_delta(parser)
 
     # Get timestamps of first and last entry in edge list
-    t_0 = datetime.fromtimestamp(int(rE[0][0])).strftime("%d.%m.%Y")
-    t_1 = datetime.fromtimestamp(int(rE[-1][0])).strftime("%d.%m.%Y")
+    span = edge_span(rE)
+    if parser.flushedTs:
+        span = parser.flushedTs[0], span[1] if span else parser.flushedTs[1]
+    if span:
+        t_0 = datetime.fromtimestamp(span[0]).strftime("%d.%m.%Y")
+        t_1 = datetime.fromtimestamp(span[1]).strftime("%d.%m.%Y")
+    else:
+        t_0, t_1 = "-", "-"
     
     # Estimate end of parsing
-    estimated_end = estimate_end(loop_duration, blkfilenr, total_files)
+    estimated_end = estimate_end(parser.started, done, total_files)
     
     # Avg iteration duration
     avg_loop      = int(sum(loop_duration)/len(loop_duration))
@@ -199,7 +403,7 @@ def tablestats(parser):
     sys.stdout.write("\r{:^13}|{:>4}/{:<4}| {:>10}-{:>10} | {:^12,} | "\
                      "{:>4}M | {:^4}s | {:^7}s | {:>14} | {:>3}/{:<3} "\
                      "GiB ({:<4}%) |\n".format(timestamp, 
-                                               blkfilenr, 
+                                               done, 
                                                total_files, 
                                                t_0, 
                                                t_1, 
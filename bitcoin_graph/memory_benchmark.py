@@ -0,0 +1,102 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Memory benchmark that measures the per-transaction overhead of the parser
+# objects (Block, Transaction, Input, Output, Script and Address) for one blk
+# file. The objects are measured as they are (with __slots__) and as
+# dict-based counterparts, classes with the same methods storing their
+# attributes in an instance __dict__, which shows the saving of __slots__.
+#
+# Usage: python -m bitcoin_graph.memory_benchmark ~/.bitcoin/blocks/blk00000.dat
+
+import sys
+import tracemalloc
+from contextlib import contextmanager
+
+from bitcoin_graph.blockchain_parser import address, block, block_header, input, \
+                                            output, script, transaction
+from bitcoin_graph.blockchain_parser.blockchain import get_blocks
+from bitcoin_graph.blockchain_parser.address import ADDRESS_CACHE
+
+
+# Modules of the object model, their classes use __slots__
+MODULES = (address, block, block_header, input, output, script, transaction)
+CLASSES = (block.Block, block_header.BlockHeader, transaction.Transaction,
+           input.Input, output.Output, script.Script, address.Address,
+           address.UnknownAddress, address.OPReturnAddress)
+
+
+def dict_class(cls):
+    '''Returns a copy of the class `cls` without __slots__, storing the
+       attributes in a __dict__ per instance'''
+    namespace = {name: value for name, value in vars(cls).items()
+                 if name not in cls.__slots__ and name not in ("__slots__", "__dict__", "__weakref__")}
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+@contextmanager
+def dict_model():
+    '''Replaces the classes of the object model by their dict-based
+       counterparts within the modules creating them'''
+    clones = {cls: dict_class(cls) for cls in CLASSES}
+    patched = [(module, name, value) for module in MODULES
+               for name, value in vars(module).items() if isinstance(value, type) and value in clones]
+    for module, name, value in patched:
+        setattr(module, name, clones[value])
+    try:
+        yield
+    finally:
+        for module, name, value in patched:
+            setattr(module, name, value)
+
+
+def measure(blk_file, addresses=True):
+    '''Keeps `Block.transactions` of every block of `blk_file` alive and
+       returns the number of txs, the raw block size and the traced memory
+       of the objects in bytes. With `addresses` the output addresses are
+       decoded as well, like the parser does. The address cache is disabled,
+       so every measurement decodes the same addresses.
+    '''
+    raw_blocks = list(get_blocks(blk_file))
+    raw_size = sum(len(raw) for raw in raw_blocks)
+    cache_size = ADDRESS_CACHE.maxsize
+    ADDRESS_CACHE.resize(0)
+
+    tracemalloc.start()
+    blocks = [block.Block(raw) for raw in raw_blocks]
+    n_txs = 0
+    for b in blocks:
+        for tx in b.transactions:
+            n_txs += 1
+            tx.txid
+            for inp in tx.inputs:
+                inp.transaction_hash
+            if addresses:
+                for out in tx.outputs:
+                    [a.address for a in out.addresses]
+    used, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ADDRESS_CACHE.resize(cache_size)
+    return n_txs, raw_size, used, peak
+
+
+if __name__ == '__main__':
+    for addresses in (False, True):
+        with dict_model():
+            baseline = measure(sys.argv[1], addresses)
+        slots = measure(sys.argv[1], addresses)
+        print("with addresses:" if addresses else "without addresses:")
+        for name, (n_txs, raw_size, used, peak) in (("  __dict__", baseline), ("  __slots__", slots)):
+            print("{:<12}{:>9,} txs | raw {:>8.2f} MiB | objects {:>8.2f} MiB "\
+                  "(peak {:>8.2f} MiB) | {:>6,} bytes/tx | {:.2f}x raw size"
+                  .format(name, n_txs, raw_size/2**20, used/2**20, peak/2**20,
+                          int(used/max(n_txs, 1)), used/max(raw_size, 1)))
+        print("  saving      {:.1%}".format(1 - slots[2]/max(baseline[2], 1)))
@@ -0,0 +1,141 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Parquet and Arrow IPC output written directly with pyarrow. Edges and
+# tables are turned into typed Arrow columns following their BigQuery schema,
+# either for the files uploaded to the Google Cloud, for a local
+# Hive-partitioned dataset or for Arrow IPC streams (see `reader.py`).
+
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+
+# Characters allowed in the string columns of parquet files
+VALID_STRING = "^[A-Za-z0-9_]*$"
+INVALID_CHARS = "[^A-Za-z0-9_]+"
+
+# String columns that might hold other characters, txids are hex strings
+CHECKED_COLUMNS = ["input_address", "output_to", "script_type"]
+
+# String columns with many repeated values, stored as dictionary arrays
+DICTIONARY_COLUMNS = ["output_to", "script_type"]
+
+# Partitioning of the local dataset and blk files per `blk` partition
+PARTITIONS = ("blk", "day", "month")
+BLK_RANGE = 100
+
+
+def arrow_table(data, schema):
+    """Returns `data` (rows or a dictionary of columns) as Arrow table with
+    the types of the BigQuery `schema`"""
+    if not isinstance(data, dict):
+        data = dict(zip([c["name"] for c in schema], zip(*data)))
+
+    fields, columns = [], []
+    for c in schema:
+        field = pa.field(c["name"], pa.int64() if c["type"] == "INTEGER" else pa.string())
+        column = pa.array(data[field.name], type=field.type)
+
+        if pa.types.is_string(field.type):
+            # Only strip other characters if there are any
+            if field.name in CHECKED_COLUMNS:
+                if not pc.all(pc.match_substring_regex(column, VALID_STRING)).as_py():
+                    column = pc.replace_substring_regex(column, INVALID_CHARS, "")
+            if field.name in DICTIONARY_COLUMNS:
+                column = column.dictionary_encode()
+                field = field.with_type(column.type)
+        fields.append(field)
+        columns.append(column)
+    return pa.Table.from_arrays(columns, schema=pa.schema(fields))
+
+
+class ParquetDataset(object):
+    """Local Hive-partitioned parquet dataset with a directory per table
+    (e.g. `rawedges`) and one file per blk file and partition, e.g.
+    `rawedges/date=2021-01-01/blk_2400.parquet`. Tables without timestamps
+    are partitioned by blk files. Files are written to `.part` files and
+    renamed once their blk file is complete, so parallel workers never
+    share a file.
+    """
+
+    def __init__(self, path, partition="blk", compression="snappy", row_group_size=None):
+        if partition not in PARTITIONS:
+            raise ValueError("Unknown partitioning {}".format(partition))
+        self.path = path
+        self.partition = partition
+        self.compression = None if compression in (None, "none") else compression
+        self.row_group_size = int(row_group_size) if row_group_size else None
+        self.writers = {}       # Open writers of the current blk file by file
+
+    def _partitions(self, table, blkfilenr):
+        """Yields the partition directories of the rows of `table` with the
+        rows, splitting it by the timestamps of its rows"""
+        if self.partition == "blk" or "ts" not in table.column_names:
+            start = blkfilenr // BLK_RANGE * BLK_RANGE
+            yield "blk_range={}-{}".format(start, start + BLK_RANGE - 1), table
+            return
+        name, unit, fmt = ("date", "D", "%Y-%m-%d") if self.partition == "day" else ("month", "M", "%Y-%m")
+        keys = table.column("ts").to_numpy().astype("datetime64[s]").astype("datetime64[{}]".format(unit))
+        for key in np.unique(keys):
+            yield "{}={}".format(name, key.item().strftime(fmt)), table.take(np.flatnonzero(keys == key))
+
+    def write(self, table, name, blkfilenr):
+        """Appends the Arrow `table` to the table `name` of the dataset"""
+        for partition, rows in self._partitions(table, blkfilenr):
+            directory = os.path.join(self.path, name, partition)
+            file = os.path.join(directory, "blk_{}.parquet".format(blkfilenr))
+            if file not in self.writers:
+                os.makedirs(directory, exist_ok=True)
+                self.writers[file] = pq.ParquetWriter(file + ".part", rows.schema,
+                                                      compression=self.compression,
+                                                      use_dictionary=True)
+            self.writers[file].write_table(rows, row_group_size=self.row_group_size)
+
+    def close(self):
+        """Completes the files of the current blk file"""
+        for file, writer in self.writers.items():
+            writer.close()
+            os.replace(file + ".part", file)
+        self.writers = {}
+
+
+class IpcFiles(object):
+    """Arrow IPC stream per table and blk file, laid out like the csv
+    output, e.g. `rawedges/raw_blk_2417.arrows`. Batches of a blk file are
+    appended as record batches. The streams are not compressed, so they
+    can be memory-mapped by consumers without any deserialization.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.writers = {}       # Open (file, writer) of the current blk file by file
+
+    def write(self, table, name, blkfilenr):
+        """Appends the Arrow `table` to the table `name`"""
+        directory = os.path.join(self.path, name)
+        prefix = "raw" if name == "rawedges" else name
+        file = os.path.join(directory, "{}_blk_{}.arrows".format(prefix, blkfilenr))
+        if file not in self.writers:
+            os.makedirs(directory, exist_ok=True)
+            sink = pa.OSFile(file + ".part", "wb")
+            self.writers[file] = sink, pa.ipc.new_stream(sink, table.schema)
+        self.writers[file][1].write_table(table)
+
+    def close(self):
+        """Completes the files of the current blk file"""
+        for file, (sink, writer) in self.writers.items():
+            writer.close()
+            sink.close()
+            os.replace(file + ".part", file)
+        self.writers = {}
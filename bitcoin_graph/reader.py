@@ -0,0 +1,58 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Reader for the Arrow IPC streams written with `--format arrow`. The streams
+# are memory-mapped, so loading a range of blk files neither copies nor
+# deserializes the edges - pages are read from disk once they are accessed.
+#
+#   from bitcoin_graph.reader import read_edges
+#   edges = read_edges("output/20211201_120000", 2400, 2499)
+#   df = edges.to_pandas()
+
+import os
+import re
+import pyarrow as pa
+
+
+def blk_files(path, table="rawedges", start=None, end=None):
+    """Returns the (blk file number, file) pairs of the streams of `table`
+    in the output directory `path` (`output/<date>`), sorted by number and
+    restricted to the blk files `start` to `end` (included)"""
+    directory = os.path.join(path, table)
+    files = []
+    for file in os.listdir(directory):
+        match = re.search("_blk_([0-9]+)\\.arrows$", file)
+        if match is None:
+            continue
+        nr = int(match.group(1))
+        if (start is None or nr >= start) and (end is None or nr <= end):
+            files.append((nr, os.path.join(directory, file)))
+    return sorted(files)
+
+
+def iter_batches(path, start=None, end=None, table="rawedges"):
+    """Yields the record batches of the blk files `start` to `end`, one
+    file after another, see `blk_files`"""
+    for _, file in blk_files(path, table, start, end):
+        reader = pa.ipc.open_stream(pa.memory_map(file))
+        for batch in reader:
+            yield batch
+
+
+def read_edges(path, start=None, end=None, table="rawedges"):
+    """Returns the edges (or rows of a normalized `table`) of the blk files
+    `start` to `end` as a single memory-mapped pyarrow Table, see
+    `blk_files`. None if there are no files."""
+    tables = [pa.ipc.open_stream(pa.memory_map(file)).read_all()
+              for _, file in blk_files(path, table, start, end)]
+    if not tables:
+        return None
+    return pa.concat_tables(tables)
@@ -20,8 +20,11 @@ import sys
 import time
 import pandas as pd
 import pandas_gbq
+import pyarrow.parquet as pq
+
+from bitcoin_graph.helpers import _print, get_date, get_table_schema, edge_count
+from bitcoin_graph.parquetwriter import arrow_table
 
-from bitcoin_graph.helpers import _print, get_date, get_table_schema
 #
 # Big Query Uploader
 class Uploader():
@@ -31,7 +34,8 @@ class Uploader():
     # table id: google big query table id, default: btc
     # dataset: specific dataset within table, default: bitcoin_transaction
     def __init__(self, credentials, project, dataset, table_id, path=None, 
-                 logger=None, bucket=None, pthreshold=None, multi_p=False, cores=1, loc=None):
+                 logger=None, bucket=None, pthreshold=None, multi_p=False, cores=1, loc=None,
+                 compression="snappy", row_group_size=None):
         
         # put google credentials into .gcpkey folder
         self.credentials = credentials
@@ -48,6 +52,9 @@ class Uploader():
         self.multi_p         = multi_p
         self.cores           = cores
         self.loc             = loc
+        self.writer          = None     # Parquet writer of the blk file parsed in batches
+        self.compression     = None if compression in (None, "none") else compression
+        self.row_group_size  = int(row_group_size) if row_group_size else None
         try:
             self.path  = path or "output/{}/rawedges".format(get_date())
         except:
@@ -63,13 +70,18 @@ class Uploader():
         print("Uploader successfully initialized")
 
         
-    def get_columnnames(self, cvalue, cblk):
+    def get_columnnames(self, cvalue, cblk, cheight=False, cprevout=False):
         
         # Default column names
-        cls = ["ts", "tx_id", "input_tx_id", "vout", "output_to", "output_index"]
+        cls = ["ts", "tx_id", "input_tx_id", "vout"]
+        if cprevout:
+            cls.extend(["input_address", "input_value"])
+        cls.extend(["output_to", "output_index"])
         if cvalue:
             cls.append("value")
         cls.append("script_type")
+        if cheight:
+            cls.append("height")
         if cblk:
             cls.append("blk_file_nr")
         return cls
@@ -97,7 +109,7 @@ class Uploader():
             if len(current_file_list) > 1:
                 for file in current_file_list:
                     file = "{}/../.temp/".format(self.loc) + file
-                    if file.endswith("txt"):
+                    if file.endswith("txt") or file.endswith(".part"):
                         continue
                     if datetime.now().timestamp()-os.path.getmtime(file) < 20:
                         continue
@@ -131,19 +143,35 @@ class Uploader():
                 time.sleep(5)
         return True
 
-    def handle_parquet_data(self, rE, blkfilenr, cblk, cvalue):
-        
-        cls = self.get_columnnames(cvalue,cblk)
-    
-        df = pd.DataFrame(rE, columns=cls)
-        df["vout"] = df["vout"].astype('int') 
-        for col in df.select_dtypes(include="object").columns:
-            df[col] = df[col].apply(lambda x:re.sub('[^A-Za-z0-9_]+','', str(x)))
+    def arrow_table(self, rE, cblk, cvalue, cheight=False, cprevout=False, cencode=False):
+        ''' Returns the edges `rE` (rows or a dictionary of columns) as Arrow
+            table with the types of the BigQuery table schema '''
+        cls = self.get_columnnames(cvalue,cblk,cheight,cprevout)
+        return arrow_table(rE, get_table_schema(cls, cblk, cvalue, cheight, cprevout, cencode))
 
-        df.to_parquet("{}/../.temp/blk_{}.parquet".format(self.loc,blkfilenr))
+    def handle_parquet_data(self, rE, blkfilenr, cblk, cvalue, cheight=False, cprevout=False, cencode=False, final=True):
+        ''' Appends the edges `rE` as row group to the parquet file of the blk
+            file, which is completed (and possibly uploaded) if `final` '''
+        
+        # Written to a .part file first, so incomplete files are not uploaded
+        file = "{}/../.temp/blk_{}.parquet".format(self.loc,blkfilenr)
+        if edge_count(rE) > 0:
+            table = self.arrow_table(rE, cblk, cvalue, cheight, cprevout, cencode)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(file + ".part", table.schema,
+                                               compression=self.compression,
+                                               use_dictionary=True)
+            self.writer.write_table(table, row_group_size=self.row_group_size)
+        if not final:
+            return True
+        if self.writer is None:
+            return True
+        self.writer.close()
+        self.writer = None
+        os.replace(file + ".part", file)
         self.logger.log("Saved {}/../.temp/blk_{}.parquet".format(self.loc, blkfilenr))
         if not self.multi_p:
-            current_file_list = os.listdir("{}/../.temp".format(self.loc))
+            current_file_list = [f for f in os.listdir("{}/../.temp".format(self.loc)) if not f.endswith(".part")]
 
             if len(current_file_list) > self.threshold:
                 for file in current_file_list:
@@ -169,12 +197,35 @@ class Uploader():
         return True
         
     
-    def upload_data(self, data=None, location="europe-west3", chsz=int(1e7), cblk=None, cvalue=None):
+    def upload_table(self, data, name, schema, location="europe-west3", chsz=int(1e7)):
+        ''' Uploads `data` (rows or a dictionary of columns) to the table
+            `<table_id>_<name>` with the given `schema` '''
+        df = pd.DataFrame(data, columns=[c["name"] for c in schema])
+        if len(df) == 0:
+            return True
+        df.to_gbq(self.dataset+"."+self.table_id+"_"+name, 
+                  if_exists="append", 
+                  location=location, 
+                  chunksize=chsz, 
+                  table_schema=schema, 
+                  progress_bar=False)
+        if self.logger:
+            self.logger.log(f"Uploaded {len(df)} rows to {name}")
+        return True
+
+    def upload_dictionary(self, rows, name, location="europe-west3"):
+        ''' Uploads the dictionary entries `rows`, (id, value) tuples, to the
+            table `<table_id>_<name>` (`txids` or `addresses`) '''
+        value = "txid" if name == "txids" else "address"
+        schema = [{'name': 'id', 'type': 'INTEGER'}, {'name': value, 'type': 'STRING'}]
+        return self.upload_table(rows, name, schema, location)
+    
+    def upload_data(self, data=None, location="europe-west3", chsz=int(1e7), cblk=None, cvalue=None, cheight=False, cprevout=False, cencode=False):
         try:
             # Parsing with direct upload
-            cls = self.get_columnnames(cvalue,cblk)
+            cls = self.get_columnnames(cvalue,cblk,cheight,cprevout)
             df = pd.DataFrame(data, columns=cls)
-            schema=get_table_schema(cls, cblk, cvalue)
+            schema=get_table_schema(cls, cblk, cvalue, cheight, cprevout, cencode)
             cloud_path = self.dataset+"."+self.table_id
             df.to_gbq(cloud_path, 
                       if_exists="append", 
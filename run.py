@@ -16,13 +16,12 @@ import os
 import argparse
 import numpy as np
 from datetime import datetime
-from multiprocessing import Process, cpu_count, connection
+from multiprocessing import Process, Queue, cpu_count, connection
 
 from bitcoin_graph import starting_info
 from bitcoin_graph.btcTxParser import *
 from bitcoin_graph.uploader import Uploader
 from bitcoin_graph.logger import BlkLogger
-from bitcoin_graph.helpers import file_number
 
 
 parser = argparse.ArgumentParser(formatter_class=lambda prog: argparse.HelpFormatter(prog,max_help_position=60))
@@ -30,6 +29,7 @@ parser.add_argument('-sf', '--startfile', help=".blk start file (included) - def
 parser.add_argument('-ef', '--endfile', help=".blk end file (included) - default: None", default=None)
 parser.add_argument('-st', '--starttx', help="start transaction id (included) - default: None", default=None)
 parser.add_argument('-et', '--endtx', help="end transaction id (excluded) - default: None", default=None)
+parser.add_argument('-sts', '--startts', help="start timestamp of block - default: None", default=None)
 parser.add_argument('-ets', '--endts', help="end timestamp of block - default: None", default=None)
 parser.add_argument('-loc', '--blklocation', help=".blk|.csv file location - default: ~/.bitcoin/blocks", default="~/.bitcoin/blocks")
 
@@ -53,9 +53,53 @@ parser.add_argument('-parq', '--parquet', help="use parquet format - default: Fa
 # Use Multiprocessing
 parser.add_argument('-mp', '--multiprocessing', help="use multiprocessing - default: False",  action='store_true')
 
+# Address cache size
+parser.add_argument('-ac', '--addresscache', help="number of encoded addresses cached per process, 0 disables it - default: 262144",  default=2**18)
+
+# Save the edges of a blk file in batches
+parser.add_argument('-fe', '--flushedges', help="save the edges of a blk file in batches of this many edges (table rows with --normalized) - default: None",  default=None)
+parser.add_argument('-fmb', '--flushmb', help="save the edges of a blk file in batches once the buffered edges take this many MB - default: None",  default=None)
+
+# Use the sidecar block index
+parser.add_argument('-idx', '--index', help="build/use a block index next to the blk files to seek to relevant blocks - default: False",  action='store_true')
+
+# Parse the main chain ordered by height
+parser.add_argument('-ord', '--ordered', help="parse the main chain ordered by height, without stale blocks, and collect block heights - default: False", action='store_true')
+
+# Use the LevelDB databases of bitcoind
+parser.add_argument('-ldb', '--leveldb', help="use the LevelDB block index and txindex of bitcoind to seek the start tx and to order blocks - default: False", action='store_true')
+
+# Resolve the spent outputs of inputs
+parser.add_argument('-pv', '--prevouts', help="resolve the address and value of every input from the rev*.dat undo files - default: False", action='store_true')
+parser.add_argument('-utxo', '--utxo', help="resolve the address and value of every input with an own UTXO store (no rev*.dat files needed), implies --ordered and --columnar - default: False", action='store_true')
+
+# Encode txids and addresses as integer IDs
+parser.add_argument('-enc', '--encode', help="replace txids and addresses by 64 bit integer IDs and save dictionary tables - default: False", action='store_true')
+
+# Save normalized tables
+parser.add_argument('-norm', '--normalized', help="save transaction, input and output tables instead of edges - default: False", action='store_true')
+
+# Use the columnar engine
+parser.add_argument('-col', '--columnar', help="decode blk files into columns (faster bulk extraction) - default: False",  action='store_true')
+
 # Parquet file upload threshold
 parser.add_argument('-ut', '--uploadthreshold', help="uploading threshold for parquet files - default: 5",  default=5)
 
+# Parquet compression and row group size
+parser.add_argument('-pc', '--compression', help="compression of parquet files (snappy, gzip, brotli, zstd, lz4 or none) - default: snappy",  default="snappy")
+parser.add_argument('-rg', '--rowgroupsize', help="maximum number of rows per row group of parquet files - default: None (pyarrow default)",  default=None)
+
+# Local output format
+parser.add_argument('-fmt', '--format', help="format of the local output (csv or arrow ipc streams), see --parquet for parquet - default: csv",  choices=["csv", "arrow"], default="csv")
+
+# Compression of local csv files
+parser.add_argument('-z', '--compress', help="compress local csv files with gzip or zstd on a background thread - default: None",  choices=["gzip", "zstd"], default=None)
+parser.add_argument('-zl', '--compresslevel', help="compression level - default: None (6 for gzip, 3 for zstd)",  default=None)
+parser.add_argument('-zb', '--compressbuffer', help="MB of csv text compressed at once - default: 16",  default=None)
+
+# Partitioning of local parquet datasets
+parser.add_argument('-part', '--partition', help="partitioning of local parquet datasets (blk: ranges of 100 blk files, day or month) - default: blk",  choices=["blk", "day", "month"], default="blk")
+
 # Bucket name
 parser.add_argument('-b', '--bucket', help="bucket name to store parquet files - default: btc_<timestamp>",  default="btc_{}".format(int(datetime.now().timestamp())))
 
@@ -77,6 +121,7 @@ startFile    = _args.startfile
 endFile      = _args.endfile
 startTx      = _args.starttx
 endTx        = _args.endtx
+startTS      = _args.startts
 endTS        = _args.endts
 file_loc     = _args.blklocation
 targetpath   = _args.targetpath
@@ -85,12 +130,30 @@ cblk         = _args.collectblk
 upload       = _args.upload
 use_parquet  = _args.parquet
 up_thres     = _args.uploadthreshold
+compression  = _args.compression
+row_groups   = _args.rowgroupsize
+partition    = _args.partition
+out_format   = _args.format
+compress     = _args.compress
+comp_level   = _args.compresslevel
+comp_buffer  = _args.compressbuffer
 bucket       = _args.bucket
 creds        = _args.credentials
 project      = _args.project
 table_id     = _args.tableid
 dataset      = _args.dataset
 multi_p      = _args.multiprocessing
+columnar     = _args.columnar
+addr_cache   = _args.addresscache
+use_index    = _args.index
+ordered      = _args.ordered
+leveldb      = _args.leveldb
+prevouts     = _args.prevouts
+utxo         = _args.utxo
+encode       = _args.encode
+normalized   = _args.normalized
+flush_edges  = _args.flushedges
+flush_mb     = _args.flushmb
 # -----------------------------------------------
 
 
@@ -100,10 +163,16 @@ multi_p      = _args.multiprocessing
 # Initialize btc graph object
 # `blk_loc` for the location where the blk files are stored
 # `raw Edges` to additionally save graph in edgeList format
-btc_graph = BtcTxParser(dl=file_loc, endTS=endTS, upload=upload, use_parquet=use_parquet, 
+btc_graph = BtcTxParser(dl=file_loc, startTS=startTS, endTS=endTS, upload=upload, use_parquet=use_parquet, 
                         upload_threshold=up_thres, bucket=bucket, cvalue=collectvalue, cblk=cblk, 
                         targetpath=targetpath, credentials=creds, table_id=table_id, dataset=dataset, 
-                        project=project, multi_p=multi_p)
+                        project=project, multi_p=multi_p, columnar=columnar,
+                        address_cache=addr_cache, use_index=use_index, ordered=ordered,
+                        leveldb=leveldb, prevouts=prevouts, utxo=utxo,
+                        encode=encode, normalized=normalized, flush_edges=flush_edges,
+                        flush_mb=flush_mb, compression=compression, row_group_size=row_groups,
+                        partition=partition, output_format=out_format, compress=compress,
+                        compress_level=comp_level, compress_buffer=comp_buffer)
 
 # Start building graph
 if __name__ == '__main__':
@@ -114,15 +183,12 @@ if __name__ == '__main__':
 
         else:
             cpus = cpu_count()
-            sF = file_number(startFile)
-            eF = file_number(endFile)
-            r = list(range(sF, eF+1))
             
             processes = []
             
             if upload:  
                 cpu_u = 1
-                cpu_p = cpus - cpu_u
+                cpu_p = max(cpus - cpu_u, 1)
                 uploader = Uploader(credentials=creds, table_id=table_id, dataset=dataset, 
                                     project=project, logger=BlkLogger(), bucket=bucket, 
                                     multi_p=multi_p, cores=cpu_p, loc=file_loc)
@@ -131,20 +197,16 @@ if __name__ == '__main__':
             else:
                 cpu_p = cpus
             
-            d  = round((eF - sF)/cpu_p)
-            pack = {}
+            # Work queue, every worker takes the next blk file once it is done
+            # with the previous one, the most expensive files first
+            queue = Queue()
+            for blk_file in btc_graph.schedule(startFile, endFile):
+                queue.put(blk_file)
             for i in range(cpu_p):
-                if i+1 == cpu_p:
-                    pack[i] = r[d*i:]
-                else:
-                    pack[i] = r[d*i:d*(1+i)]
+                queue.put(None)
            
-            for i in list(pack):
-                if len(pack[i]) < 1:
-                    continue
-                start = "blk{}.dat".format(str(list(pack[i])[0]).zfill(5))
-                end   = "blk{}.dat".format(str(list(pack[i])[-1]).zfill(5))
-                processes.append(Process(target = btc_graph.parse, args=(start,end,startTx,endTx, i)))
+            for i in range(cpu_p):
+                processes.append(Process(target = btc_graph.parse, args=(startFile,endFile,startTx,endTx,i,queue)))
 
 
 
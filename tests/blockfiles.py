@@ -0,0 +1,166 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Builds small synthetic .blk files for the tests. Every block has a coinbase
+# paying to a p2pkh address and, from the second block on, a transaction
+# spending the coinbase of the previous block to two outputs.
+
+import os
+import struct
+import hashlib
+
+
+MAGIC = b"\xf9\xbe\xb4\xd9"
+
+# Timestamp of the first block, blocks follow every 10 minutes
+FIRST_TS = 1500000000
+
+# Generator point of secp256k1, a valid public key
+GX = bytes.fromhex("79be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798")
+GY = bytes.fromhex("483ada7726a3c4655da4fbfc0e1108a8fd17b448a68554199c47d08ffb10d4b8")
+
+
+def sha256d(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def varint(n):
+    if n < 0xfd:
+        return bytes([n])
+    if n <= 0xffff:
+        return b"\xfd" + struct.pack("<H", n)
+    return b"\xfe" + struct.pack("<I", n)
+
+
+def core_varint(n):
+    """Returns `n` in the VARINT format of bitcoind's databases and undo files"""
+    out = [n & 0x7f]
+    while n > 0x7f:
+        n = (n >> 7) - 1
+        out.append(n & 0x7f | 0x80)
+    return bytes(reversed(out))
+
+
+def compress_amount(n):
+    """Bitcoin core's CompressAmount"""
+    if n == 0:
+        return 0
+    e = 0
+    while n % 10 == 0 and e < 9:
+        n //= 10
+        e += 1
+    if e < 9:
+        return 1 + (n // 10 * 9 + n % 10 - 1) * 10 + e
+    return 1 + (n - 1) * 10 + 9
+
+
+def undo_record(spent):
+    """Returns the undo data of a block, `spent` holds a list of the
+    (height, is_coinbase, value, p2pkh script) spent by every transaction
+    but the coinbase"""
+    raw = varint(len(spent))
+    for tx in spent:
+        raw += varint(len(tx))
+        for height, is_coinbase, value, script in tx:
+            raw += core_varint(height * 2 + is_coinbase)
+            if height > 0:
+                raw += core_varint(0)
+            raw += core_varint(compress_amount(value)) + core_varint(0) + script[3:23]
+    return raw
+
+
+def p2pkh(seed):
+    """Returns a p2pkh script with a hash160 derived from `seed`"""
+    return b"\x76\xa9\x14" + hashlib.sha256(seed).digest()[:20] + b"\x88\xac"
+
+
+def p2wpkh(seed):
+    """Returns a p2wpkh script with a program derived from `seed`"""
+    return b"\x00\x14" + hashlib.sha256(seed).digest()[:20]
+
+
+def transaction(inputs, outputs):
+    """Returns a legacy transaction spending the (txid, vout) `inputs`
+    (txid in internal byte order) to the (value, script) `outputs`"""
+    raw = struct.pack("<I", 1) + varint(len(inputs))
+    for txid, vout in inputs:
+        raw += txid + struct.pack("<I", vout) + varint(0) + struct.pack("<I", 0xffffffff)
+    raw += varint(len(outputs))
+    for value, script in outputs:
+        raw += struct.pack("<q", value) + varint(len(script)) + script
+    return raw + struct.pack("<I", 0)
+
+
+def coinbase(height, script):
+    """Returns a coinbase transaction of `height` paying to `script`"""
+    script_sig = struct.pack("<I", height)
+    return (struct.pack("<I", 1) + varint(1) + bytes(32) + b"\xff\xff\xff\xff"
+            + varint(len(script_sig)) + script_sig + struct.pack("<I", 0xffffffff)
+            + varint(1) + struct.pack("<q", 50 * 10**8) + varint(len(script)) + script
+            + struct.pack("<I", 0))
+
+
+def block(prev_hash, timestamp, txs, nonce=0):
+    """Returns the raw block with the raw transactions `txs`"""
+    header = struct.pack("<I32s32sIII", 1, prev_hash, sha256d(b"".join(txs)),
+                         timestamp, 0x207fffff, nonce)
+    return header + varint(len(txs)) + b"".join(txs)
+
+
+def write_blk_file(path, raw_blocks, padding=0):
+    """Writes the `raw_blocks` framed by magic and size, followed by
+    `padding` zero bytes like preallocated files of bitcoind"""
+    with open(path, "wb") as f:
+        for raw in raw_blocks:
+            f.write(MAGIC + struct.pack("<I", len(raw)) + raw)
+        f.write(bytes(padding))
+
+
+def build_chain(directory, n_files=3, blocks_per_file=4, stale=(), rev=False):
+    """Writes `n_files` blk files with `blocks_per_file` blocks of a chain
+    to `directory`. Heights in `stale` get an additional stale sibling
+    block, stored in front of the main chain block. With `rev` the undo
+    data of the main chain is written to rev files, in reverse order.
+    Returns the main chain as list of dictionaries (file, height, hash,
+    timestamp, txids)."""
+    os.makedirs(directory, exist_ok=True)
+    chain, prev_hash, height = [], bytes(32), 0
+    previous_coinbase = None
+    for nr in range(n_files):
+        raw_blocks, undo = [], []
+        for _ in range(blocks_per_file):
+            timestamp = FIRST_TS + 600 * height
+            txs = [coinbase(height, p2pkh(b"miner %d" % height))]
+            if previous_coinbase is not None:
+                txs.append(transaction([(previous_coinbase, 0)],
+                                       [(10**8, p2pkh(b"payee %d" % height)),
+                                        (2 * 10**8, p2wpkh(b"change %d" % height))]))
+            if height in stale:
+                sibling = [coinbase(height, p2pkh(b"stale %d" % height))]
+                raw_blocks.append(block(prev_hash, timestamp + 1, sibling, nonce=1))
+            raw = block(prev_hash, timestamp, txs)
+            raw_blocks.append(raw)
+            if height > 0:
+                spent = [[(height - 1, True, 50 * 10**8, p2pkh(b"miner %d" % (height - 1)))]]
+                data = undo_record(spent)
+                undo.append(data + sha256d(prev_hash + data))
+            prev_hash = sha256d(raw[:80])
+            previous_coinbase = sha256d(txs[0])
+            chain.append({"file": nr, "height": height, "hash": prev_hash,
+                          "timestamp": timestamp,
+                          "txids": [sha256d(tx)[::-1].hex() for tx in txs]})
+            height += 1
+        write_blk_file(os.path.join(directory, "blk%05d.dat" % nr), raw_blocks, padding=64)
+        if rev:
+            with open(os.path.join(directory, "rev%05d.dat" % nr), "wb") as f:
+                for record in reversed(undo):
+                    f.write(MAGIC + struct.pack("<I", len(record) - 32) + record)
+    return chain
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# Import the package from the repository, the tests import the block file
+# builder next to them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from blockfiles import build_chain
+
+
+@pytest.fixture
+def blocks(tmp_path):
+    """Directory with three blk files of four blocks each and the chain"""
+    directory = tmp_path / "blocks"
+    chain = build_chain(str(directory))
+    return str(directory), chain
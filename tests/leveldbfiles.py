@@ -0,0 +1,169 @@
+# Copyright (C) Anton Wahrstätter 2021
+
+# This file is part of python-bitcoin-graph which was forked from python-bitcoin-blockchain-parser.
+#
+# It is subject to the license terms in the LICENSE file found in the top-level
+# directory of this distribution.
+#
+# No part of python-bitcoin-graph, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+
+# Writes small LevelDB databases for the tests: a MANIFEST, tables with
+# plain and snappy compressed blocks and log files. Checksums are not
+# written, the reader does not verify them.
+
+import os
+import struct
+
+from bitcoin_graph.blockchain_parser.leveldb import LOG_BLOCK_SIZE, LOG_FULL, LOG_FIRST, \
+    LOG_MIDDLE, LOG_LAST, TABLE_MAGIC, NO_COMPRESSION, SNAPPY_COMPRESSION, TYPE_VALUE, \
+    TAG_COMPARATOR, TAG_LOG_NUMBER, TAG_NEXT_FILE_NUMBER, TAG_LAST_SEQUENCE, TAG_NEW_FILE
+
+
+def uvarint(n):
+    out = bytearray()
+    while n >= 0x80:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def lslice(data):
+    return uvarint(len(data)) + data
+
+
+def snappy_compress(data):
+    """Greedy snappy compressor emitting literals and 2 byte offset copies
+    of repeated 4 byte sequences"""
+    out = bytearray(uvarint(len(data)))
+
+    def literal(chunk):
+        while chunk:
+            part, chunk = chunk[:256], chunk[256:]
+            if len(part) <= 60:
+                out.extend(bytes([(len(part) - 1) << 2]) + part)
+            else:
+                out.extend(bytes([60 << 2, len(part) - 1]) + part)
+
+    seen, pos, start = {}, 0, 0
+    while pos + 4 <= len(data):
+        candidate = seen.get(data[pos:pos+4])
+        seen[data[pos:pos+4]] = pos
+        if candidate is None or pos - candidate > 0xffff:
+            pos += 1
+            continue
+        size = 4
+        while pos + size < len(data) and size < 64 and data[candidate+size] == data[pos+size]:
+            size += 1
+        literal(data[start:pos])
+        out.extend(bytes([(size - 1) << 2 | 2]) + struct.pack("<H", pos - candidate))
+        pos += size
+        start = pos
+    literal(data[start:])
+    return bytes(out)
+
+
+def internal_key(key, sequence, kind=TYPE_VALUE):
+    return key + struct.pack("<Q", sequence << 8 | kind)
+
+
+def block(entries):
+    """Returns a table block of the (key, value) `entries`, keys are prefix
+    compressed against the previous key"""
+    out, previous = bytearray(), b""
+    for key, value in entries:
+        shared = 0
+        while shared < min(len(key), len(previous)) and key[shared] == previous[shared]:
+            shared += 1
+        out += uvarint(shared) + uvarint(len(key) - shared) + uvarint(len(value))
+        out += key[shared:] + value
+        previous = key
+    return bytes(out + struct.pack("<II", 0, 1))
+
+
+def write_table(path, entries, block_entries=2, compress=True):
+    """Writes the (key, sequence, type, value) `entries`, sorted by key and
+    newest first, to a table. Every other data block is snappy compressed
+    if `compress` is set. Returns the smallest and largest internal key."""
+    data, index = bytearray(), []
+
+    def append(raw, compression):
+        handle = uvarint(len(data)) + uvarint(len(raw))
+        data.extend(raw + bytes([compression]) + bytes(4))
+        return handle
+
+    for n, i in enumerate(range(0, len(entries), block_entries)):
+        keys = [(internal_key(key, seq, kind), value or b"")
+                for key, seq, kind, value in entries[i:i+block_entries]]
+        raw = block(keys)
+        if compress and n % 2 == 0:
+            handle = append(snappy_compress(raw), SNAPPY_COMPRESSION)
+        else:
+            handle = append(raw, NO_COMPRESSION)
+        index.append((keys[-1][0], handle))
+    metaindex = append(block([]), NO_COMPRESSION)
+    index = append(block(index), NO_COMPRESSION)
+    footer = metaindex + index
+    data += footer + bytes(40 - len(footer)) + struct.pack("<Q", TABLE_MAGIC)
+    with open(path, "wb") as f:
+        f.write(data)
+    first, last = entries[0], entries[-1]
+    return internal_key(*first[:3]), internal_key(*last[:3])
+
+
+def write_log(path, records):
+    """Writes the `records` to a log file, splitting them at block borders"""
+    out = bytearray()
+    for record in records:
+        first = True
+        while True:
+            left = LOG_BLOCK_SIZE - len(out) % LOG_BLOCK_SIZE
+            if left < 7:
+                out += bytes(left)
+                continue
+            fragment, record = record[:left-7], record[left-7:]
+            if first:
+                kind = LOG_FIRST if record else LOG_FULL
+            else:
+                kind = LOG_MIDDLE if record else LOG_LAST
+            out += struct.pack("<IHB", 0, len(fragment), kind) + fragment
+            first = False
+            if not record:
+                break
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_batch(sequence, entries):
+    """Returns a write batch record of the (key, type, value) `entries`"""
+    out = bytearray(struct.pack("<QI", sequence, len(entries)))
+    for key, kind, value in entries:
+        out += bytes([kind]) + lslice(key)
+        if kind == TYPE_VALUE:
+            out += lslice(value)
+    return bytes(out)
+
+
+def write_db(directory, tables=(), logs=(), log_number=None):
+    """Writes a database to `directory`. `tables` are (number, level,
+    entries) of the live tables, `logs` (number, records) of the log files.
+    Log files numbered below `log_number` are already compacted."""
+    os.makedirs(directory, exist_ok=True)
+    edit = bytes([TAG_COMPARATOR]) + lslice(b"leveldb.BytewiseComparator")
+    if log_number is None:
+        log_number = min([number for number, _ in logs], default=1)
+    edit += bytes([TAG_LOG_NUMBER]) + uvarint(log_number)
+    edit += bytes([TAG_NEXT_FILE_NUMBER]) + uvarint(100)
+    edit += bytes([TAG_LAST_SEQUENCE]) + uvarint(10**6)
+    for number, level, entries in tables:
+        path = os.path.join(directory, "%06d.ldb" % number)
+        smallest, largest = write_table(path, entries)
+        edit += bytes([TAG_NEW_FILE]) + uvarint(level) + uvarint(number)
+        edit += uvarint(os.path.getsize(path)) + lslice(smallest) + lslice(largest)
+    for number, records in logs:
+        write_log(os.path.join(directory, "%06d.log" % number), records)
+    write_log(os.path.join(directory, "MANIFEST-000099"), [edit])
+    with open(os.path.join(directory, "CURRENT"), "w") as f:
+        f.write("MANIFEST-000099\n")
@@ -0,0 +1,46 @@
+import csv
+import glob
+import os
+
+import pytest
+
+from bitcoin_graph import btcTxParser
+from bitcoin_graph.btcTxParser import BtcTxParser
+
+
+def parse(directory, target, **kwargs):
+    parser = BtcTxParser(dl=directory, targetpath=target, cvalue=True, **kwargs)
+    parser.parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+    return parser
+
+
+def output(target):
+    """Returns the rows of every csv file of the output by table and file"""
+    rows = {}
+    for file in glob.glob(os.path.join(target, "output", "*", "*", "*.csv")):
+        with open(file) as f:
+            rows[os.path.relpath(file, os.path.dirname(os.path.dirname(file)))] = list(csv.reader(f))
+    return rows
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(columnar=True), dict(normalized=True),
+                                    dict(normalized=True, columnar=True, prevouts=True)])
+def test_batches_match_whole_files(blocks, tmp_path, monkeypatch, kwargs):
+    directory, _ = blocks
+    expected = output(parse(directory, str(tmp_path / "whole"), **kwargs).targetpath)
+    assert expected
+
+    batches = []
+    def save_edge_list(parser, final=True):
+        batches.append(final)
+        return save_edge_list.original(parser, final=final)
+    save_edge_list.original = btcTxParser.save_edge_list
+    monkeypatch.setattr(btcTxParser, "save_edge_list", save_edge_list)
+
+    for n, batch in enumerate((dict(flush_edges=1), dict(flush_edges=3), dict(flush_mb=1e-6))):
+        target = str(tmp_path / str(n))
+        del batches[:]
+        parse(directory, target, **batch, **kwargs)
+        assert batches.count(True) == 3 and batches.count(False) > 0
+        # Batches are appended to the files of their blk file in order
+        assert output(target) == expected
@@ -0,0 +1,63 @@
+import pytest
+from bitcoin import base58
+
+from bitcoin_graph.blockchain_parser.address import Address
+from bitcoin_graph.blockchain_parser.utils_taproot import decode, encode_batch, \
+                                                         encode_segwit, from_taproot
+from blockfiles import sha256d
+
+
+# Valid addresses and their scriptPubKey from BIP-173 (bech32) and BIP-350
+# (bech32m)
+VECTORS = [
+    ("BC1QW508D6QEJXTDG4Y5R3ZARVARY0C5XW7KV8F3T4",
+     "0014751e76e8199196d454941c45d1b3a323f1433bd6"),
+    ("tb1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3q0sl5k7",
+     "00201863143c14c5166804bd19203356da136c985678cd4d27a1b8c6329604903262"),
+    ("tb1qqqqqp399et2xygdj5xreqhjjvcmzhxw4aywxecjdzew6hylgvsesrxh6hy",
+     "0020000000c4a5cad46221b2a187905e5266362b99d5e91c6ce24d165dab93e86433"),
+    ("BC1SW50QGDZ25J", "6002751e"),
+    ("bc1zw508d6qejxtdg4y5r3zarvaryvaxxpcs", "5210751e76e8199196d454941c45d1b3a323"),
+    ("tb1pqqqqp399et2xygdj5xreqhjjvcmzhxw4aywxecjdzew6hylgvsesf3hn0c",
+     "5120000000c4a5cad46221b2a187905e5266362b99d5e91c6ce24d165dab93e86433"),
+    ("bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0",
+     "512079be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798"),
+    ("bc1pw508d6qejxtdg4y5r3zarvary0c5xw7kw508d6qejxtdg4y5r3zarvary0c5xw7kt5nd6y",
+     "5128751e76e8199196d454941c45d1b3a323f1433bd6751e76e8199196d454941c45d1b3a323f1433bd6"),
+]
+
+
+def witness(script):
+    """Returns the witness version and program of a segwit scriptPubKey"""
+    script = bytes.fromhex(script)
+    return (script[0] - 0x50 if script[0] else 0), script[2:]
+
+
+@pytest.mark.parametrize("address,script", VECTORS)
+def test_encode_segwit(address, script):
+    witver, witprog = witness(script)
+    hrp = address.lower().split("1")[0]
+    assert encode_segwit(witver, witprog, hrp) == address.lower()
+    assert decode(hrp, address.lower()) == (witver, list(witprog))
+
+
+def test_encode_batch():
+    vectors = [witness(script) for address, script in VECTORS if address.startswith("bc1p")]
+    addresses = [address for address, script in VECTORS if address.startswith("bc1p")]
+    assert encode_batch([witprog for _, witprog in vectors]) == addresses
+    assert [from_taproot(witprog.hex()) for _, witprog in vectors] == addresses
+
+
+def test_address_objects():
+    witver, witprog = witness(VECTORS[0][1])
+    assert Address.from_bech32(witprog, witver).address == VECTORS[0][0].lower()
+    witver, witprog = witness(VECTORS[6][1])
+    assert Address.from_bech32m(witprog, witver).address == VECTORS[6][0]
+    assert Address.from_ripemd160(bytes.fromhex("77bff20c60e522dfaa3350c39b030a5d004e839a")) \
+        .address == "1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2"
+    p2sh = Address.from_ripemd160(bytes.fromhex("77bff20c60e522dfaa3350c39b030a5d004e839a"),
+                                  type="p2sh")
+    assert p2sh.is_p2sh() and p2sh.address.startswith("3")
+    payload = base58.decode(p2sh.address)
+    assert payload[:21] == b"\x05" + p2sh.hash
+    assert payload[21:] == sha256d(payload[:21])[:4]
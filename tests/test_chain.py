@@ -0,0 +1,44 @@
+import numpy as np
+
+from bitcoin_graph.blockchain_parser import blockchain as bc
+from blockfiles import build_chain, sha256d
+
+
+def test_main_chain_without_stale_blocks(tmp_path):
+    chain = build_chain(str(tmp_path / "blocks"), n_files=2, blocks_per_file=5, stale=(3, 6))
+    rows = bc.Blockchain(str(tmp_path / "blocks")).get_chain()
+
+    assert rows["height"].tolist() == list(range(10))
+    assert [h.tobytes() for h in rows["hash"]] == [block["hash"] for block in chain]
+    assert rows["file"].tolist() == [block["file"] for block in chain]
+
+
+def test_ordered_blocks(tmp_path):
+    chain = build_chain(str(tmp_path / "blocks"), n_files=2, blocks_per_file=3, stale=(1,))
+    blocks = list(bc.Blockchain(str(tmp_path / "blocks")).get_ordered_blocks())
+
+    assert [block.height for block in blocks] == list(range(6))
+    assert [[tx.txid for tx in block.transactions] for block in blocks] \
+        == [block["txids"] for block in chain]
+
+
+def test_chain_blocks_keep_few_files_open(tmp_path, monkeypatch):
+    build_chain(str(tmp_path / "blocks"), n_files=4, blocks_per_file=2)
+    blockchain = bc.Blockchain(str(tmp_path / "blocks"))
+    rows = blockchain.get_chain()
+    # Jump back and forth between the files
+    order = np.array([0, 2, 4, 6, 1, 3, 5, 7, 0, 6])
+
+    opened = []
+    def open_blk_file(blockfile, ranges=False):
+        raw_data = open_blk_file.original(blockfile, ranges)
+        opened.append(raw_data)
+        return raw_data
+    open_blk_file.original = bc.open_blk_file
+    monkeypatch.setattr(bc, "open_blk_file", open_blk_file)
+
+    for view, row in zip(bc.get_chain_blocks(blockchain.path, rows[order]), rows[order]):
+        assert sha256d(bytes(view[:80])) == row["hash"].tobytes()
+        view.release()
+        assert sum(not raw_data.closed for raw_data in opened) <= bc.CHAIN_OPEN_FILES
+    assert all(raw_data.closed for raw_data in opened)
@@ -0,0 +1,76 @@
+import csv
+import glob
+import gzip
+import io
+import os
+
+import pytest
+import zstandard
+
+from bitcoin_graph import compressedcsv
+from bitcoin_graph.compressedcsv import CompressedCsv, CompressedFile
+from bitcoin_graph.btcTxParser import BtcTxParser
+
+
+def decompress(file):
+    with open(file, "rb") as f:
+        data = f.read()
+    if file.endswith(".gz"):
+        return gzip.decompress(data).decode()
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data).decode()
+
+
+@pytest.mark.parametrize("codec,extension", [("gzip", ".gz"), ("zstd", ".zst")])
+def test_compressed_csv(tmp_path, codec, extension):
+    # Buffers of a few bytes are handed over on almost every write
+    writer = CompressedCsv(codec, level=1, buffer_size=1e-5)
+    rows = [(i, "tx %d" % i, i * 10) for i in range(1000)]
+    file = str(tmp_path / "raw_blk_0.csv")
+    writer.writerows(file, rows[:500])
+    writer.writerows(file, rows[500:])
+    writer.close()
+    assert os.listdir(str(tmp_path)) == ["raw_blk_0.csv" + extension]
+    assert list(csv.reader(io.StringIO(decompress(file + extension)))) == \
+        [[str(v) for v in row] for row in rows]
+
+
+def test_codecs(monkeypatch):
+    with pytest.raises(ValueError):
+        CompressedCsv("lz4")
+    monkeypatch.setattr(compressedcsv, "zstandard", None)
+    with pytest.raises(ImportError):
+        CompressedCsv("zstd")
+
+
+def test_errors_of_the_thread(tmp_path, monkeypatch):
+    class Failing(object):
+        def compress(self, data):
+            raise OSError("disk full")
+        def flush(self):
+            return b""
+    monkeypatch.setattr(compressedcsv, "compressor", lambda codec, level: Failing())
+    f = CompressedFile(str(tmp_path / "file.gz"), buffer_size=1)
+    # The writer must neither block on the full queue nor lose the error
+    with pytest.raises(OSError):
+        for _ in range(100):
+            f.write("row\n")
+    with pytest.raises(OSError):
+        f.close()
+    assert not f.thread.is_alive() and f.file.closed
+
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd"])
+def test_parse_compressed(blocks, tmp_path, codec):
+    directory, _ = blocks
+    for target, compress in ((str(tmp_path / "plain"), None), (str(tmp_path / codec), codec)):
+        BtcTxParser(dl=directory, targetpath=target, cvalue=True, flush_edges=2,
+                    compress=compress, compress_buffer=1e-4) \
+            .parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+
+    plain = sorted(glob.glob(str(tmp_path / "plain" / "output" / "*" / "*" / "*.csv")))
+    compressed = sorted(glob.glob(str(tmp_path / codec / "output" / "*" / "*" / "*.csv.*")))
+    assert [os.path.basename(f) for f in compressed] == \
+        [os.path.basename(f) + compressedcsv.CODECS[codec] for f in plain]
+    for file, compressed_file in zip(plain, compressed):
+        with open(file, newline="") as f:
+            assert decompress(compressed_file) == f.read()
@@ -0,0 +1,114 @@
+import csv
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from bitcoin_graph import dictionary
+from bitcoin_graph.dictionary import IdEncoder, txid_id, txid_check, address_id
+from bitcoin_graph.blockchain_parser.blockchain import txid_prefix
+from bitcoin_graph.btcTxParser import BtcTxParser
+
+
+TXIDS = [bytes([i] * 32).hex() for i in range(1, 6)]
+ADDRESSES = ["1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2", "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4",
+             "3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy"]
+
+
+def test_ids():
+    txid = "00112233445566778899aabbccddeeff00112233445566778899aabbccddeeff"
+    # The ID is the txid index prefix as signed integer
+    assert txid_id(txid) % 2**64 == txid_prefix(txid)
+    # The check value are the next 4 bytes of the txid in internal byte order
+    assert txid_check(txid) == 0x44556677
+    assert txid_id("0") == 0 and address_id("0") == 0
+    assert len({address_id(a) for a in ADDRESSES}) == len(ADDRESSES)
+
+
+def test_encode_and_pop(tmp_path):
+    encoder = IdEncoder(str(tmp_path))
+    ids = encoder.encode("tx_id", TXIDS[:3] + TXIDS[:1])
+    assert ids.dtype == np.int64
+    assert ids.tolist() == [txid_id(t) for t in TXIDS[:3] + TXIDS[:1]]
+    # Missing values stay None
+    encoded = encoder.encode("input_address", [ADDRESSES[0], None, "0"])
+    assert encoded.tolist() == [address_id(ADDRESSES[0]), None, 0]
+    # Only txids of transactions are written, not the ones of inputs
+    encoder.encode("input_tx_id", TXIDS[3:])
+
+    txids, addresses, collisions = encoder.pop_dictionary()
+    assert sorted(txids) == sorted((txid_id(t), t) for t in TXIDS[:3])
+    assert addresses == [(address_id(ADDRESSES[0]), ADDRESSES[0])]
+    assert collisions == []
+    encoder.commit(0)
+    assert sorted(os.listdir(str(tmp_path))) == ["addresses_blk_0_0.npy", "txids_blk_0_0.npy"]
+
+    # Written values are not written again, neither by this encoder nor by
+    # another one (e.g. a worker or a later run) using the same path
+    encoder.encode("tx_id", TXIDS[:4])
+    assert encoder.pop_dictionary()[0] == [(txid_id(TXIDS[3]), TXIDS[3])]
+    other = IdEncoder(str(tmp_path))
+    other.encode("tx_id", TXIDS[:4])
+    encoder.commit(1)
+    other.encode("output_to", ADDRESSES)
+    txids, addresses, _ = other.pop_dictionary()
+    assert txids == []
+    assert sorted(addresses) == sorted((address_id(a), a) for a in ADDRESSES[1:])
+    other.commit(1)
+    assert "addresses_blk_1_0.npy" in os.listdir(str(tmp_path))
+
+
+def test_collisions(tmp_path, monkeypatch):
+    monkeypatch.setattr(dictionary, "address_id", lambda address: 42)
+    encoder = IdEncoder(str(tmp_path))
+    encoder.encode("output_to", ADDRESSES[:2])
+    _, addresses, collisions = encoder.pop_dictionary()
+    # Both values are written, showing the ambiguous ID
+    assert sorted(addresses) == [(42, a) for a in sorted(ADDRESSES[:2])]
+    assert sorted(collisions) == sorted(addresses)
+    encoder.commit(0)
+
+    encoder.encode("output_to", ADDRESSES)
+    _, addresses, collisions = encoder.pop_dictionary()
+    assert addresses == [(42, ADDRESSES[2])]
+    assert collisions == [(42, ADDRESSES[2])]
+
+
+def test_known_runs(tmp_path):
+    encoder = IdEncoder(str(tmp_path))
+    values = ["address %d" % i for i in range(300)]
+    for nr in range(30):
+        encoder.encode("output_to", values[nr*10:nr*10+10])
+        encoder.pop_dictionary()
+        encoder.commit(nr)
+    # Runs of similar size are merged
+    assert len(encoder.known["addresses"]) <= 6
+    assert sum(len(run) for run in encoder.known["addresses"]) == 300
+    encoder.encode("output_to", values + ["new"])
+    assert encoder.pop_dictionary()[1] == [(address_id("new"), "new")]
+
+
+def edges(target, folder="rawedges"):
+    return [row for file in sorted(glob.glob(os.path.join(target, "output", "*", folder, "*.csv")))
+            for row in csv.reader(open(file))]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_parse_encoded(blocks, tmp_path, columnar):
+    directory, _ = blocks
+    for target, encode in ((str(tmp_path / "plain"), False), (str(tmp_path / "encoded"), True)):
+        parser = BtcTxParser(dl=directory, targetpath=target, cvalue=True, columnar=columnar,
+                             encode=encode)
+        parser.parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+
+    values = {"0": "0"}
+    for row in edges(str(tmp_path / "encoded"), "dictionary"):
+        assert row[0] not in values
+        values[row[0]] = row[1]
+    # The txids of inputs are not written to the dictionary
+    decoded = [[row[0], values[row[1]], row[2], row[3], values[row[4]]] + row[5:]
+               for row in edges(str(tmp_path / "encoded"))]
+    plain = [row[:2] + [str(txid_id(row[2]))] + row[3:]
+             for row in edges(str(tmp_path / "plain"))]
+    assert sorted(decoded) == sorted(plain)
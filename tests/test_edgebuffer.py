@@ -0,0 +1,23 @@
+from bitcoin_graph.edgebuffer import EdgeBuffer, StringColumn, STRING
+
+
+def test_string_column_stores_values_once():
+    column = StringColumn()
+    codes = [column.add(v) for v in ["p2pkh", "p2sh", "p2pkh", None, "p2pkh"]]
+    assert codes == [0, 1, 0, -1, 0]
+    column.extend(codes * 1000)
+    assert column.arena == b"p2pkhp2sh"
+    assert column.values().tolist() == ["p2pkh", "p2sh", "p2pkh", None, "p2pkh"] * 1000
+
+
+def test_edge_buffer():
+    edges = EdgeBuffer([("tx_id", STRING), ("vout", "I"), ("value", "q")])
+    for i in range(3):
+        edges.extend("tx_id", [edges.add("tx_id", "tx %d" % (i % 2))] * 2)
+        edges.extend("vout", [i, i])
+        edges.extend("value", [None, i])
+    assert len(edges) == 6 and "vout" in edges and "ts" not in edges
+    columns = edges.columns()
+    assert columns["tx_id"].tolist() == ["tx 0", "tx 0", "tx 1", "tx 1", "tx 0", "tx 0"]
+    assert columns["vout"].tolist() == [0, 0, 1, 1, 2, 2]
+    assert columns["value"].tolist() == [None, 0, None, 1, None, 2]
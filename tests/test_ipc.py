@@ -0,0 +1,44 @@
+import csv
+import glob
+import os
+
+import pyarrow as pa
+
+from bitcoin_graph.btcTxParser import BtcTxParser
+from bitcoin_graph.parquetwriter import IpcFiles
+from bitcoin_graph.reader import blk_files, iter_batches, read_edges
+
+
+def test_ipc_files(tmp_path):
+    files = IpcFiles(str(tmp_path))
+    for nr in (3, 10, 2):
+        files.write(pa.table({"ts": [nr, nr]}), "rawedges", nr)
+        files.write(pa.table({"ts": [nr]}), "rawedges", nr)
+        files.write(pa.table({"tx_id": [str(nr)]}), "transactions", nr)
+        # Files are completed once their blk file is
+        assert glob.glob(str(tmp_path / "*" / "*_blk_{}.arrows".format(nr))) == []
+        files.close()
+    assert sorted(os.listdir(str(tmp_path / "rawedges"))) == \
+        ["raw_blk_10.arrows", "raw_blk_2.arrows", "raw_blk_3.arrows"]
+
+    assert [nr for nr, _ in blk_files(str(tmp_path))] == [2, 3, 10]
+    assert [nr for nr, _ in blk_files(str(tmp_path), start=3, end=9)] == [3]
+    # Every write of a blk file is a record batch
+    assert [b.num_rows for b in iter_batches(str(tmp_path), end=3)] == [2, 1, 2, 1]
+    assert read_edges(str(tmp_path)).column("ts").to_pylist() == [2, 2, 2, 3, 3, 3, 10, 10, 10]
+    assert read_edges(str(tmp_path), table="transactions", start=10).to_pylist() == [{"tx_id": "10"}]
+    assert read_edges(str(tmp_path), start=11) is None
+
+
+def test_parse_to_ipc(blocks, tmp_path):
+    directory, _ = blocks
+    BtcTxParser(dl=directory, targetpath=str(tmp_path / "csv"), cvalue=True, flush_edges=2) \
+        .parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+    BtcTxParser(dl=directory, targetpath=str(tmp_path / "arrow"), cvalue=True, flush_edges=2,
+                output_format="arrow").parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+
+    expected = [row for file in sorted(glob.glob(str(tmp_path / "csv" / "output" / "*" / "rawedges" / "*.csv")))
+                for row in csv.reader(open(file))]
+    edges = read_edges(glob.glob(str(tmp_path / "arrow" / "output" / "*"))[0])
+    rows = [[str(v) for v in row.values()] for row in edges.to_pylist()]
+    assert rows == expected
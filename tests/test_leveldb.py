@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from bitcoin_graph.blockchain_parser import blockchain as bc
+from bitcoin_graph.blockchain_parser.leveldb import LevelDB, LevelDBError, OBFUSCATE_KEY, \
+                                                    TYPE_DELETION, TYPE_VALUE, snappy_decompress
+from blockfiles import build_chain, core_varint
+from leveldbfiles import snappy_compress, write_batch, write_db
+
+
+def test_snappy():
+    # Literal "abc", then a 1 byte offset copy overlapping its own output
+    assert snappy_decompress(bytes([12, 2 << 2]) + b"abc" + bytes([5 << 2 | 1, 3])) \
+        == b"abc" * 4
+    # Literal longer than 60 bytes with its length in the next byte
+    assert snappy_decompress(bytes([70, 60 << 2, 69]) + bytes(range(70))) == bytes(range(70))
+    data = b"".join(b"key %d value %d " % (i % 7, i) for i in range(500))
+    compressed = snappy_compress(data)
+    assert len(compressed) < len(data) // 2
+    assert snappy_decompress(compressed) == data
+    with pytest.raises(LevelDBError):
+        snappy_decompress(bytes([4, 5 << 2 | 1, 3]))
+
+
+def test_tables_and_logs(tmp_path):
+    big = bytes(range(256)) * 200
+    old = [(b"a%02d" % i, 10 + i, TYPE_VALUE, b"old %d" % i) for i in range(20)]
+    new = [(b"a03", 50, TYPE_VALUE, b"new 3"), (b"a05", 51, TYPE_DELETION, None)]
+    logs = [(3, [write_batch(1, [(b"a07", TYPE_VALUE, b"compacted")])]),
+            (5, [write_batch(60, [(b"a08", TYPE_VALUE, b"log 8"), (b"a09", TYPE_DELETION, b"")]),
+                 write_batch(62, [(b"b", TYPE_VALUE, big)])])]
+    write_db(str(tmp_path), tables=[(4, 1, old), (7, 0, new)], logs=logs, log_number=5)
+    db = LevelDB(str(tmp_path))
+
+    assert db.obfuscate_key is None
+    assert db.get(b"a01") == b"old 1"
+    assert db.get(b"a03") == b"new 3"
+    assert db.get(b"a05") is None
+    assert db.get(b"a07") == b"old 7"
+    assert db.get(b"a08") == b"log 8"
+    assert db.get(b"a09") is None
+    assert db.get(b"a99") is None
+    # The record spans two log blocks
+    assert db.get(b"b") == big
+
+    expected = {key: value for key, _, _, value in old}
+    expected.update({b"a03": b"new 3", b"a08": b"log 8"})
+    del expected[b"a05"], expected[b"a09"]
+    assert list(db.iterate(b"a")) == sorted(expected.items())
+    assert list(db.iterate(b"a1")) == [(k, v) for k, v in sorted(expected.items())
+                                       if k.startswith(b"a1")]
+
+
+def test_obfuscated_values(tmp_path):
+    key = bytes.fromhex("0102030405060708")
+    value = b"obfuscated value"
+    xored = bytes(b ^ key[i % 8] for i, b in enumerate(value))
+    write_db(str(tmp_path), logs=[(1, [write_batch(1, [(OBFUSCATE_KEY, TYPE_VALUE, b"\x08" + key),
+                                                       (b"c", TYPE_VALUE, xored)])])])
+    db = LevelDB(str(tmp_path))
+    assert db.obfuscate_key == key
+    assert db.get(b"c") == value
+    assert db.get(b"c", obfuscated=False) == xored
+    assert list(db.iterate(b"c")) == [(b"c", value)]
+
+
+def test_db_chain_matches_blk_files(tmp_path):
+    path = str(tmp_path / "blocks")
+    chain = build_chain(path, n_files=2, blocks_per_file=3, stale=(2,))
+    blockchain = bc.Blockchain(path)
+    rows = blockchain.get_chain()
+
+    # Block index entries of all blocks (stale ones included) and the
+    # txindex entries of the main chain, written to a table and a log
+    index, txindex, height = [], [], {}
+    for blk_file, blocks in blockchain.build_index().items():
+        nr = int(os.path.basename(blk_file)[3:8])
+        with open(blk_file, "rb") as f:
+            data = f.read()
+        for block in blocks:
+            prev = block["prev_hash"].tobytes()
+            height[block["hash"].tobytes()] = height.get(prev, -1) + 1
+            offset = int(block["offset"])
+            value = core_varint(190000) + core_varint(height[block["hash"].tobytes()]) \
+                + core_varint(8 | 5) + core_varint(int(block["n_tx"])) \
+                + core_varint(nr) + core_varint(offset) + data[offset:offset+80]
+            index.append((b"b" + block["hash"].tobytes(), value))
+    for block in chain:
+        for txid in block["txids"]:
+            txindex.append((b"t" + bytes.fromhex(txid)[::-1],
+                            core_varint(block["file"]) + core_varint(1234) + core_varint(81)))
+    entries = [(key, i + 1, TYPE_VALUE, value) for i, (key, value) in enumerate(sorted(index))]
+    write_db(path + "/index", tables=[(2, 0, entries)],
+             logs=[(3, [write_batch(1000, [(k, TYPE_VALUE, v) for k, v in txindex])])])
+
+    db_rows = blockchain.get_db_chain()
+    assert db_rows.tolist() == rows.tolist()
+    assert len(blockchain.get_db_block_index()) == len(index)
+
+    tx = blockchain.get_db_transaction(chain[4]["txids"][1])
+    assert (tx.blockfile_no, tx.file_offset, tx.block_offset) == (1, 1234, 81)
+    assert blockchain.get_db_transaction("00" * 32) is None
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+
+from bitcoin_graph.blockchain_parser import blockchain as bc
+from blockfiles import build_chain
+
+KEY = bytes.fromhex("a1b2c3d4e5f60718")
+
+
+@pytest.fixture
+def datadirs(tmp_path):
+    """Plain and obfuscated block directories with the same chain"""
+    plain, obfuscated = str(tmp_path / "plain" / "blocks"), str(tmp_path / "xor" / "blocks")
+    build_chain(plain, stale=(5,))
+    build_chain(obfuscated, stale=(5,))
+    for file in os.listdir(obfuscated):
+        path = os.path.join(obfuscated, file)
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(bc.deobfuscate(data, KEY))
+    with open(os.path.join(obfuscated, "xor.dat"), "wb") as f:
+        f.write(KEY)
+    return plain, obfuscated
+
+
+def test_deobfuscate_ranges():
+    data = bytes(range(256)) * 3
+    obfuscated = bytes(bc.deobfuscate(data, KEY))
+    assert obfuscated != data
+    assert bytes(bc.deobfuscate(obfuscated, KEY)) == data
+    # Ranges starting at any offset rotate the key
+    for start, end in ((0, 8), (3, 4), (5, 101), (13, 768), (767, 768)):
+        assert bytes(bc.deobfuscate(obfuscated[start:end], KEY, start)) == data[start:end]
+
+
+def test_obfuscated_file(datadirs):
+    plain, obfuscated = datadirs
+    with open(os.path.join(plain, "blk00001.dat"), "rb") as f:
+        data = f.read()
+    raw_data = bc.open_blk_file(os.path.join(obfuscated, "blk00001.dat"), ranges=True)
+    assert isinstance(raw_data, bc.ObfuscatedFile)
+    assert len(raw_data) == len(data)
+    assert bytes(raw_data[9:131]) == data[9:131]
+    assert bytes(raw_data[len(data) - 3:len(data) + 5]) == data[-3:]
+
+    # Matches across chunk borders are found
+    chunk_size = bc.XOR_CHUNK_SIZE
+    bc.XOR_CHUNK_SIZE = 16
+    try:
+        for start in range(0, len(data), 7):
+            assert raw_data.find(bc.BITCOIN_CONSTANT, start) == data.find(bc.BITCOIN_CONSTANT, start)
+    finally:
+        bc.XOR_CHUNK_SIZE = chunk_size
+    raw_data.close()
+
+
+def test_obfuscated_blocks(datadirs):
+    plain, obfuscated = datadirs
+    for nr in range(3):
+        file = "blk%05d.dat" % nr
+        plain_file, obfuscated_file = os.path.join(plain, file), os.path.join(obfuscated, file)
+        assert bc.read_headers(obfuscated_file).tobytes() == bc.read_headers(plain_file).tobytes()
+        index = bc.index_blocks(obfuscated_file)
+        assert index.tobytes() == bc.index_blocks(plain_file).tobytes()
+        assert [bytes(b) for b in bc.get_blocks(obfuscated_file)] \
+            == [bytes(b) for b in bc.get_blocks(plain_file)]
+        assert [bytes(b) for b in bc.get_blocks_at(obfuscated_file, index[1::2])] \
+            == [bytes(b) for b in bc.get_blocks_at(plain_file, index[1::2])]
+
+    chain = bc.Blockchain(obfuscated).get_chain()
+    assert chain.tobytes() == bc.Blockchain(plain).get_chain().tobytes()
+    order = np.arange(len(chain))[::-1]
+    assert [bytes(b) for b in bc.get_chain_blocks(obfuscated, chain[order])] \
+        == [bytes(b) for b in bc.get_chain_blocks(plain, chain[order])]
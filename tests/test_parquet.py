@@ -0,0 +1,71 @@
+import csv
+import glob
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from bitcoin_graph.btcTxParser import BtcTxParser
+from bitcoin_graph.parquetwriter import arrow_table, ParquetDataset
+from blockfiles import FIRST_TS
+
+
+SCHEMA = [{"name": "ts", "type": "INTEGER"}, {"name": "tx_id", "type": "STRING"},
+          {"name": "output_to", "type": "STRING"}, {"name": "value", "type": "INTEGER"}]
+
+
+def test_arrow_table():
+    rows = [(FIRST_TS, "aa", "1Address", 5), (FIRST_TS + 86400, "bb", "bc1q address!", None)]
+    table = arrow_table(rows, SCHEMA)
+    assert table.schema.field("ts").type == pa.int64()
+    assert table.schema.field("tx_id").type == pa.string()
+    # Repeated strings are dictionary encoded, other characters stripped
+    assert pa.types.is_dictionary(table.schema.field("output_to").type)
+    assert table.column("output_to").to_pylist() == ["1Address", "bc1qaddress"]
+    assert table.column("value").to_pylist() == [5, None]
+    columns = {"ts": [FIRST_TS], "tx_id": ["cc"], "output_to": ["x"], "value": [1]}
+    assert arrow_table(columns, SCHEMA).to_pylist() == \
+        [{"ts": FIRST_TS, "tx_id": "cc", "output_to": "x", "value": 1}]
+
+
+@pytest.mark.parametrize("partition,directories", [
+    ("blk", ["blk_range=0-99", "blk_range=200-299"]),
+    ("day", ["date=2017-07-14", "date=2017-07-15"]),
+    ("month", ["month=2017-07"])])
+def test_dataset_partitions(tmp_path, partition, directories):
+    dataset = ParquetDataset(str(tmp_path), partition=partition, row_group_size=1)
+    table = arrow_table([(FIRST_TS, "aa", "a", 1), (FIRST_TS + 86400, "bb", "b", 2)], SCHEMA)
+    dataset.write(table, "rawedges", 7)
+    dataset.write(table, "rawedges", 7)
+    # Files are completed once their blk file is
+    assert glob.glob(str(tmp_path / "rawedges" / "*" / "*.parquet")) == []
+    dataset.close()
+    dataset.write(table.slice(0, 1), "rawedges", 200)
+    dataset.close()
+    assert sorted(os.listdir(str(tmp_path / "rawedges"))) == directories
+    files = glob.glob(str(tmp_path / "rawedges" / "*" / "*.parquet"))
+    assert sum(pq.ParquetFile(f).metadata.num_rows for f in files) == 5
+    if partition == "blk":
+        metadata = pq.ParquetFile(str(tmp_path / "rawedges" / "blk_range=0-99" / "blk_7.parquet")).metadata
+        assert metadata.num_row_groups == 4
+
+
+@pytest.mark.parametrize("kwargs", [dict(), dict(columnar=True), dict(normalized=True)])
+def test_parse_to_parquet(blocks, tmp_path, kwargs):
+    directory, _ = blocks
+    BtcTxParser(dl=directory, targetpath=str(tmp_path / "csv"), cvalue=True, **kwargs) \
+        .parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+    BtcTxParser(dl=directory, targetpath=str(tmp_path / "parquet"), cvalue=True,
+                use_parquet=True, **kwargs).parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+
+    folders = glob.glob(str(tmp_path / "csv" / "output" / "*" / "*"))
+    assert len(folders) == (3 if kwargs.get("normalized") else 1)
+    for folder in folders:
+        expected = sorted(row for file in glob.glob(os.path.join(folder, "*.csv"))
+                          for row in csv.reader(open(file)))
+        name = os.path.basename(folder)
+        files = glob.glob(str(tmp_path / "parquet" / "output" / "*" / name / "*" / "*.parquet"))
+        rows = sorted(["" if v is None else str(v) for v in row.values()]
+                      for file in files for row in pq.read_table(file).to_pylist())
+        assert rows == expected and rows
@@ -0,0 +1,47 @@
+import pytest
+
+from bitcoin_graph.blockchain_parser.script import classify_script
+from bitcoin_graph.blockchain_parser.undo import spent_output
+from blockfiles import GX, GY
+
+
+H20 = bytes(range(20))
+H32 = bytes(range(32))
+SCRIPTS = {
+    "p2pkh": b"\x76\xa9\x14" + H20 + b"\x88\xac",
+    "p2sh": b"\xa9\x14" + H20 + b"\x87",
+    "p2wpkh": b"\x00\x14" + H20,
+    "p2wsh": b"\x00\x20" + H32,
+    "p2tr": b"\x51\x20" + H32,
+    "p2pk compressed": b"\x21\x02" + GX + b"\xac",
+    "p2pk uncompressed": b"\x41\x04" + GX + GY + b"\xac",
+    "OP_RETURN": b"\x6a\x04test",
+    "p2ms": b"\x51\x21\x02" + GX + b"\x21\x03" + GX + b"\x52\xae",
+    "invalid": b"\x76\xa9\x14" + H20[:10],
+    "incomplete p2pkh": b"\x76\xa9\x14" + H20,
+    "op_true": b"\x51",
+    "short push": b"\x76\xa9\x13" + H20[:19] + b"\x88\xac",
+}
+
+
+@pytest.mark.parametrize("name", sorted(SCRIPTS))
+def test_templates_match_tokenized_types(name):
+    script = SCRIPTS[name]
+    template = spent_output(1, script)
+    tokenized = spent_output(1, script)
+    tokenized._type = tokenized._tokenized_type()
+
+    assert template.type == tokenized.type
+    assert template._standard == (classify_script(script) is not None)
+    assert [a.address for a in template.addresses] == [a.address for a in tokenized.addresses]
+
+
+def test_classify_script():
+    assert [classify_script(SCRIPTS[n]) for n in ("p2pkh", "p2sh", "p2wpkh", "p2wsh", "p2tr")] \
+        == ["p2pkh", "p2sh", "p2wpkh", "p2wsh", "p2tr"]
+    assert classify_script(SCRIPTS["p2pk uncompressed"]) == "p2pk"
+    assert classify_script(SCRIPTS["OP_RETURN"]) == "OP_RETURN"
+    assert classify_script(SCRIPTS["invalid"]) == "invalid"
+    # Other scripts need the tokenization
+    assert classify_script(SCRIPTS["p2ms"]) is None
+    assert classify_script(b"") is None
@@ -0,0 +1,50 @@
+import csv
+import glob
+import os
+
+import pytest
+
+from bitcoin_graph.btcTxParser import BtcTxParser
+from blockfiles import FIRST_TS
+
+
+def parse(directory, target, **kwargs):
+    parser = BtcTxParser(dl=directory, targetpath=target, cvalue=True, **kwargs)
+    parser.parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+    return parser
+
+
+def edges(target):
+    rows = {}
+    for file in glob.glob(os.path.join(target, "output", "*", "rawedges", "*.csv")):
+        with open(file) as f:
+            rows[os.path.basename(file)] = list(csv.reader(f))
+    return rows
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_window_skipping_a_whole_file(blocks, tmp_path, columnar):
+    directory, chain = blocks
+    # Blocks 2 to 9 of 12, blk file 1 is completely inside, blk file 2
+    # only has blocks 8 and 9, then a window skipping blk file 1
+    for start, end, files in ((2, 9, ["raw_blk_0.csv", "raw_blk_1.csv", "raw_blk_2.csv"]),
+                              (9, 11, ["raw_blk_2.csv"]),
+                              (0, 2, ["raw_blk_0.csv"])):
+        target = str(tmp_path / "out_{}_{}".format(start, end))
+        parse(directory, target, columnar=columnar,
+              startTS=FIRST_TS + 600 * start, endTS=FIRST_TS + 600 * end)
+        rows = edges(target)
+        assert sorted(rows) == files
+        timestamps = {int(row[0]) for file in rows.values() for row in file}
+        assert timestamps == {block["timestamp"] for block in chain[start:end+1]}
+
+
+def test_window_engines_agree(blocks, tmp_path):
+    directory, _ = blocks
+    window = dict(startTS=FIRST_TS + 600 * 5, endTS=FIRST_TS + 600 * 6)
+    parse(directory, str(tmp_path / "object"), **window)
+    parse(directory, str(tmp_path / "columnar"), columnar=True, **window)
+    object_rows, columnar_rows = edges(str(tmp_path / "object")), edges(str(tmp_path / "columnar"))
+    assert list(object_rows) == ["raw_blk_1.csv"]
+    assert {k: sorted(v) for k, v in object_rows.items()} \
+        == {k: sorted(v) for k, v in columnar_rows.items()}
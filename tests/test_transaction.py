@@ -0,0 +1,60 @@
+import struct
+
+from bitcoin_graph.blockchain_parser.block import Block
+from bitcoin_graph.blockchain_parser.transaction import Transaction
+from blockfiles import block, coinbase, p2pkh, p2wpkh, sha256d, transaction, varint
+
+
+def segwit_transaction(inputs, outputs, witnesses):
+    """Returns a segwit transaction, the legacy serialization and the
+    `witnesses` (a list of stack items per input)"""
+    legacy = transaction(inputs, outputs)
+    raw = legacy[:4] + b"\x00\x01" + legacy[4:-4]
+    for stack in witnesses:
+        raw += varint(len(stack)) + b"".join(varint(len(item)) + item for item in stack)
+    return raw + legacy[-4:], legacy
+
+
+def test_legacy_transaction():
+    raw = transaction([(bytes(range(32)), 3)], [(5, p2pkh(b"a")), (7, p2wpkh(b"b"))])
+    tx = Transaction(raw)
+    assert tx.txid == tx.hash == sha256d(raw)[::-1].hex()
+    assert tx.size == tx.vsize == len(raw)
+    assert not tx.is_segwit and tx.version == 1 and tx.locktime == 0
+    assert tx.inputs[0].transaction_hash == bytes(range(32))[::-1].hex()
+    assert tx.inputs[0].transaction_index == 3
+    assert [o.value for o in tx.outputs] == [5, 7]
+    assert [o.type for o in tx.outputs] == ["p2pkh", "p2wpkh"]
+
+
+def test_segwit_transaction_in_a_buffer():
+    raw, legacy = segwit_transaction([(bytes(32), 0), (bytes([1] * 32), 1)],
+                                     [(10**8, p2wpkh(b"c"))],
+                                     [[b"\x30" * 71, b"\x02" * 33], [b""]])
+    # Transactions are decoded in place, e.g. within a block
+    data = b"\xff" * 5 + raw + b"\xff" * 3
+    tx = Transaction(memoryview(data), 5)
+    assert tx.size == len(raw) and bytes(tx.hex) == raw
+    assert tx.is_segwit
+    assert tx.txid == sha256d(legacy)[::-1].hex()
+    assert tx.hash == sha256d(raw)[::-1].hex()
+    assert tx.vsize == -(-(len(legacy) * 3 + len(raw)) // 4)
+    assert [i.transaction_index for i in tx.inputs] == [0, 1]
+    assert tx.outputs[0].value == 10**8
+
+    tx = Transaction(memoryview(data), 5, witnesses=True)
+    assert [i.witnesses for i in tx.inputs] == [[b"\x30" * 71, b"\x02" * 33], [b""]]
+
+
+def test_block_transactions():
+    txs = [coinbase(0, p2pkh(b"miner")),
+           segwit_transaction([(bytes(32), 0)], [(1, p2pkh(b"d"))], [[b"\x01"]])[0],
+           transaction([(bytes([2] * 32), 1)], [(2, p2pkh(b"e"))])]
+    raw = block(bytes(32), 1500000000, txs)
+    b = Block(raw)
+    assert b.hash == sha256d(raw[:80])[::-1].hex()
+    assert b.n_transactions == 3
+    assert [bytes(tx.hex) for tx in b.transactions] == txs
+    assert [tx.txid for tx in b.iter_transactions()] == [tx.txid for tx in b.transactions]
+    assert b.transactions[0].is_coinbase() and not b.transactions[2].is_coinbase()
+    assert struct.unpack("<I", raw[68:72])[0] == b.header.timestamp
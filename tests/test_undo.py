@@ -0,0 +1,110 @@
+import csv
+import glob
+import os
+import struct
+
+import pytest
+
+from bitcoin_graph.blockchain_parser import blockchain as bc
+from bitcoin_graph.blockchain_parser.undo import read_core_varint, decompress_amount, \
+    decompress_script, read_block_undo, match_undo, SECP256K1_P
+from bitcoin_graph.btcTxParser import BtcTxParser
+from blockfiles import GX, GY, MAGIC, build_chain, compress_amount, core_varint, p2pkh, sha256d
+
+
+# Bit patterns of bitcoin core's serialize_tests
+@pytest.mark.parametrize("value,encoded", [
+    (0, "00"), (0x7f, "7f"), (0x80, "8000"), (0x1234, "a334"), (0xffff, "82fe7f"),
+    (0x123456, "c7e756"), (0x80123456, "86ffc7e756"), (0xffffffff, "8efefefe7f")])
+def test_core_varint(value, encoded):
+    raw = bytes.fromhex(encoded)
+    assert read_core_varint(raw, 0) == (value, len(raw))
+    assert core_varint(value) == raw
+
+
+# Amounts of bitcoin core's compress_tests
+@pytest.mark.parametrize("amount,compressed", [
+    (0, 0x0), (1, 0x1), (10**6, 0x7), (10**8, 0x9), (50 * 10**8, 0x32),
+    (21000000 * 10**8, 0x1406f40)])
+def test_decompress_amount(amount, compressed):
+    assert compress_amount(amount) == compressed
+    assert decompress_amount(compressed) == amount
+
+
+def test_decompress_amount_round_trip():
+    for amount in list(range(100000)) + [n * 10**e for n in range(1, 100) for e in range(12)]:
+        assert decompress_amount(compress_amount(amount)) == amount
+
+
+def test_decompress_script():
+    h = bytes(range(20))
+    assert decompress_script(b"\x00" + h, 0) == (b"\x76\xa9\x14" + h + b"\x88\xac", 21)
+    assert decompress_script(b"\x01" + h, 0) == (b"\xa9\x14" + h + b"\x87", 21)
+    assert decompress_script(b"\x03" + GX, 0) == (b"\x21\x03" + GX + b"\xac", 33)
+    # Uncompressed public keys are restored from x and the parity of y
+    assert decompress_script(b"\x04" + GX, 0) == (b"\x41\x04" + GX + GY + b"\xac", 33)
+    odd_y = (SECP256K1_P - int.from_bytes(GY, "big")).to_bytes(32, "big")
+    assert decompress_script(b"\x05" + GX, 0) == (b"\x41\x04" + GX + odd_y + b"\xac", 33)
+    # Other scripts are stored with their size + 6
+    script = b"\x6a\x04test"
+    assert decompress_script(bytes([len(script) + 6]) + script, 0) == (script, 7)
+
+
+def test_undo_of_blocks(tmp_path, monkeypatch):
+    path = str(tmp_path / "blocks")
+    build_chain(path, n_files=2, blocks_per_file=4, stale=(2, 5), rev=True)
+    blockchain = bc.Blockchain(path)
+
+    opened = []
+    def open_blk_file(blockfile, ranges=False):
+        raw_data = open_blk_file.original(blockfile, ranges)
+        opened.append(raw_data)
+        return raw_data
+    open_blk_file.original = bc.open_blk_file
+    monkeypatch.setattr(bc, "open_blk_file", open_blk_file)
+
+    rows = blockchain.get_chain()
+    undo = blockchain.get_undo(rows)
+    assert all(raw_data.closed for raw_data in opened)
+    # The genesis block has no undo data
+    assert undo[0] is None
+    for height, data in enumerate(undo[1:], 1):
+        assert read_block_undo(data) == \
+            [[(height - 1, True, 50 * 10**8, p2pkh(b"miner %d" % (height - 1)))]]
+
+    # Stale blocks are only found in the index of the blk file
+    index = blockchain.get_index(os.path.join(path, "blk00001.dat"))
+    undo = blockchain.get_undo(index, os.path.join(path, "blk00001.dat"))
+    assert [data is not None for data in undo] == [True, False, True, True, True]
+
+
+def test_match_undo_same_content(tmp_path):
+    # Blocks with the coinbase only share the same undo data, the records
+    # are told apart by their checksum
+    path = str(tmp_path / "blocks")
+    build_chain(path, n_files=1, blocks_per_file=5)
+    index = bc.Blockchain(path).get_index(os.path.join(path, "blk00000.dat"))
+    index["n_tx"] = 1
+    raw = b""
+    for prev_hash in [p.tobytes() for p in index["prev_hash"][::-1]]:
+        raw += MAGIC + struct.pack("<I", 1) + b"\x00" + sha256d(prev_hash + b"\x00")
+    # A record of another block
+    raw += MAGIC + struct.pack("<I", 1) + b"\x00" + sha256d(bytes(32) + b"\x01")
+    assert match_undo(raw, index) == {offset: b"\x00" for offset in index["offset"].tolist()}
+    assert match_undo(raw[:4*41], index) == {offset: b"\x00" for offset in index["offset"][1:].tolist()}
+
+
+def test_parse_resolves_inputs_from_undo(tmp_path):
+    path = str(tmp_path / "blocks")
+    build_chain(path, rev=True)
+    results = []
+    for kwargs in (dict(prevouts=True), dict(prevouts=True, columnar=True), dict(utxo=True)):
+        target = str(tmp_path / "_".join(kwargs))
+        parser = BtcTxParser(dl=path, targetpath=target, cvalue=True, **kwargs)
+        parser.parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+        results.append(sorted(row for file in glob.glob(os.path.join(target, "output", "*",
+                                                                        "rawedges", "*.csv"))
+                              for row in csv.reader(open(file))))
+    # --utxo implies --ordered, which adds the block height
+    assert results[0] == results[1] == [row[:-1] for row in results[2]]
+    assert any(row[4] for row in results[0])
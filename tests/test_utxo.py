@@ -0,0 +1,73 @@
+import csv
+import glob
+import os
+
+import numpy as np
+
+from bitcoin_graph.blockchain_parser.address import Address
+from bitcoin_graph.blockchain_parser.utxo import UTXOStore, UTXO_DTYPE, EMPTY
+from bitcoin_graph.btcTxParser import BtcTxParser
+from blockfiles import p2pkh
+
+
+def outputs(keys, value=0):
+    rows = np.zeros(len(keys), dtype=UTXO_DTYPE)
+    rows["key"] = keys
+    rows["value"] = np.asarray(keys) * 10 + value
+    rows["script_type"] = 1
+    return rows
+
+
+def test_add_and_spend(tmp_path):
+    store = UTXOStore(str(tmp_path), capacity=16)
+    keys = np.arange(2, 2002, dtype=np.uint64)
+    store.add(outputs(keys))
+    assert len(store) == 2000
+    assert store.capacity >= 2000 / 0.75
+
+    spent = store.spend(np.concatenate([keys[::2], np.array([5000], dtype=np.uint64)]))
+    assert spent["value"][:-1].tolist() == (keys[::2] * 10).tolist()
+    assert spent["key"][-1] == EMPTY
+    assert len(store) == 1000
+
+    # Spent outputs are gone, the others are still there
+    assert (store.spend(keys[::2])["key"] == EMPTY).all()
+    assert (store.spend(keys[1::2])["value"] == keys[1::2] * 10).all()
+    assert len(store) == 0
+
+
+def test_add_replaces_duplicates(tmp_path):
+    store = UTXOStore(str(tmp_path), capacity=16)
+    store.add(outputs([7, 8]))
+    store.add(outputs([8, 8], value=1))
+    assert len(store) == 2
+    assert store.spend(np.array([8], dtype=np.uint64))["value"].tolist() == [81]
+
+
+def test_snapshot(tmp_path):
+    store = UTXOStore(str(tmp_path), capacity=16)
+    store.add(outputs(np.arange(2, 100, dtype=np.uint64)))
+    store.spend(np.array([2, 3], dtype=np.uint64))
+    store.height, store.tip = 42, b"\x01" * 32
+    assert store.save()
+
+    loaded = UTXOStore.load(str(tmp_path))
+    assert (loaded.height, loaded.tip, len(loaded)) == (42, b"\x01" * 32, 96)
+    assert loaded.spend(np.array([4], dtype=np.uint64))["value"].tolist() == [40]
+    assert UTXOStore.load(str(tmp_path / "missing")).height == -1
+
+
+def test_parse_resolves_inputs(blocks, tmp_path):
+    directory, chain = blocks
+    parser = BtcTxParser(dl=directory, targetpath=str(tmp_path), cvalue=True, utxo=True)
+    parser.parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+
+    rows = [row for file in glob.glob(os.path.join(str(tmp_path), "output", "*", "rawedges", "*.csv"))
+            for row in csv.reader(open(file))]
+    spending = [row for row in rows if row[2] != "0"]
+    assert len(spending) == 2 * (len(chain) - 1)
+    for row in spending:
+        height = [block["height"] for block in chain if row[1] in block["txids"]][0]
+        miner = Address.from_ripemd160(p2pkh(b"miner %d" % (height - 1))[3:23]).address
+        assert row[4:6] == [miner, str(50 * 10**8)]
+    assert os.path.isfile(os.path.join(directory, "..", ".utxo", "utxo.npz"))
@@ -0,0 +1,36 @@
+import re
+from multiprocessing import Process, Queue
+
+from bitcoin_graph.btcTxParser import BtcTxParser
+
+
+def progress(output):
+    """Returns the (completed, total) files of the printed stats rows"""
+    return [tuple(map(int, m)) for m in re.findall(r"\|\s*(\d+)/(\d+)\s*\|", output)]
+
+
+def test_sequential_progress(blocks, tmp_path, capfd):
+    directory, _ = blocks
+    parser = BtcTxParser(dl=directory, targetpath=str(tmp_path), cvalue=True)
+    for _ in range(2):
+        parser.parse("blk00000.dat", "blk00002.dat", None, None, process=0)
+        assert progress(capfd.readouterr().out) == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_work_queue_progress(blocks, tmp_path, capfd):
+    directory, _ = blocks
+    parser = BtcTxParser(dl=directory, targetpath=str(tmp_path), cvalue=True)
+    queue = Queue()
+    for blk_file in parser.schedule("blk00000.dat", "blk00002.dat"):
+        queue.put(blk_file)
+    workers = [Process(target=parser.parse, args=("blk00000.dat", "blk00002.dat", None, None, i, queue))
+               for i in (0, 2)]
+    for worker in workers:
+        queue.put(None)
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # The workers count the completed files together
+    assert parser.done.value == 3
+    assert sorted(progress(capfd.readouterr().out)) == [(1, 3), (2, 3), (3, 3)]